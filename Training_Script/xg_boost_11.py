@@ -2,27 +2,18 @@
 import pandas as pd
 import numpy as np
 import xgboost as xgb
-import joblib
 import os
-from sklearn.preprocessing import LabelEncoder
+import sys
+import time
+import resource
 from sklearn.impute import SimpleImputer
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, accuracy_score, f1_score, confusion_matrix
 import matplotlib.pyplot as plt
 
-### Label Encoder that handles unseen categories
-class LabelEncoderExt:
-    def __init__(self):
-        self.le = LabelEncoder()
-    def fit(self, data):
-        self.le = self.le.fit(list(data) + ['Unknown'])
-        self.classes_ = self.le.classes_
-        return self
-    def transform(self, data):
-        arr = []
-        for x in data:
-            arr.append(x if x in self.classes_ else 'Unknown')
-        return self.le.transform(arr)
+# Shared with inference, so addresses are encoded the same way in both
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.encoders import IPEncoder, LabelEncoderExt, save_ip_encoders
 
 ### Paths and Hyperparameters
 DATA_PATH   = 'NF-UQ-NIDS-v2.csv' 
@@ -55,11 +46,11 @@ DESIRED_FEATURES = [
 ]
 
 
-### Initialize encoder placeholders
-le_src, le_dst = LabelEncoderExt(), LabelEncoderExt()
-fitted_src = fitted_dst = False
+### IP encoders, grown chunk by chunk (existing codes never change)
+enc_src, enc_dst = IPEncoder(), IPEncoder()
 
 ### Training Loop
+start_time    = time.perf_counter()
 booster       = None
 chunk_id      = 0
 val_aucs      = []
@@ -83,15 +74,8 @@ for chunk in pd.read_csv(DATA_PATH, chunksize=CHUNK_SIZE, low_memory=False):
     chunk = chunk[feature_cols]
 
     # Encode IP addresses
-    if not fitted_src:
-        le_src.fit(chunk['IPV4_SRC_ADDR'])
-        fitted_src = True
-    if not fitted_dst:
-        le_dst.fit(chunk['IPV4_DST_ADDR'])
-        fitted_dst = True
-
-    chunk['IPV4_SRC_ADDR'] = le_src.transform(chunk['IPV4_SRC_ADDR'])
-    chunk['IPV4_DST_ADDR'] = le_dst.transform(chunk['IPV4_DST_ADDR'])
+    chunk['IPV4_SRC_ADDR'] = enc_src.partial_fit(chunk['IPV4_SRC_ADDR']).transform(chunk['IPV4_SRC_ADDR'])
+    chunk['IPV4_DST_ADDR'] = enc_dst.partial_fit(chunk['IPV4_DST_ADDR']).transform(chunk['IPV4_DST_ADDR'])
 
     # Handle any other categorical (unlikely)
     for col in chunk.select_dtypes(include='object'):
@@ -140,15 +124,17 @@ for chunk in pd.read_csv(DATA_PATH, chunksize=CHUNK_SIZE, low_memory=False):
 print(f"\nMean AUC:      {np.mean(val_aucs):.4f}")
 print(f"Mean Accuracy: {np.mean(val_accs):.4f}")
 print(f" Mean F1 Score: {np.mean(val_f1s):.4f}")
+print(f"Training time: {time.perf_counter() - start_time:.1f}s, "
+      f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
 
 ### Save model and encoders
 model_path = os.path.join(OUTPUT_DIR, "xgb_nids_model.json")
-encoders_path = os.path.join(OUTPUT_DIR, "ip_encoders.pkl")
+encoders_path = os.path.join(OUTPUT_DIR, "ip_encoders.npz")
 metrics_path = os.path.join(OUTPUT_DIR, "chunk_validation_metrics.csv")
 importance_path = os.path.join(OUTPUT_DIR, "feature_importance.png")
 
 booster.save_model(model_path)
-joblib.dump({'src': le_src, 'dst': le_dst}, encoders_path)
+save_ip_encoders(encoders_path, {'src': enc_src, 'dst': enc_dst})
 
 print(f"Model saved to: {model_path}")
 print(f"Encoders saved to: {encoders_path}")
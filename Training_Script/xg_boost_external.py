@@ -0,0 +1,220 @@
+"""Out-of-core training on NF-UQ-NIDS, as an alternative to xg_boost_11.py.
+
+Two steps:
+
+1. ``build_cache`` reads the CSV once, in chunks. It encodes the IPs with
+   one IPEncoder grown over the whole file and writes float32 features and
+   uint8 labels to flat NumPy memmap files. A seeded random 20% of the rows,
+   drawn from the whole file, goes to a separate holdout set.
+2. ``train`` streams the memmaps through an ``xgb.DataIter`` into a
+   QuantileDMatrix. On XGBoost 3 this is the external-memory
+   ExtMemQuantileDMatrix, so the dataset never has to fit in RAM. It then
+   trains one booster on all cores.
+
+Missing and infinite values are stored as NaN and left to XGBoost's
+missing-value handling. That is what the scorer feeds the model at
+serving time. The per-chunk SimpleImputer is not used here.
+
+    python Training_Script/xg_boost_external.py NF-UQ-NIDS-v2.csv --cache ./nids_cache
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import roc_auc_score, accuracy_score, f1_score, confusion_matrix
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.encoders import IPEncoder, save_ip_encoders
+from utils.features import MODEL_FEATURES, predict_batches
+
+CHUNK_SIZE    = 200_000
+BATCH_ROWS    = 1 << 20       # rows per DataIter batch
+HOLDOUT       = 0.2
+SEED          = 42
+CLIP          = 1e6           # same bound xg_boost_11.py applies to the counters
+IP_FEATURES   = ('IPV4_SRC_ADDR', 'IPV4_DST_ADDR')
+SPLITS        = ('train', 'holdout')
+
+XGB_PARAMS = {
+    "objective":    "binary:logistic",
+    "eval_metric":  "auc",
+    "tree_method":  "hist",
+    "max_depth":    6,
+    "eta":          0.1,
+    "nthread":      os.cpu_count(),
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+### 1) CSV -> memmap cache
+def _paths(cache_dir: str, split: str):
+    return os.path.join(cache_dir, f"{split}_X.f32"), os.path.join(cache_dir, f"{split}_y.u8")
+
+
+def build_cache(csv_path: str, cache_dir: str, chunk_size: int=CHUNK_SIZE,
+                holdout: float=HOLDOUT, seed: int=SEED) -> dict:
+    """Convert the CSV into the memmap cache; returns the cache's metadata."""
+    os.makedirs(cache_dir, exist_ok=True)
+    encoders = {'src': IPEncoder(), 'dst': IPEncoder()}
+    rng = np.random.default_rng(seed)
+    rows = dict.fromkeys(SPLITS, 0)
+    files = {split: [open(p, 'wb') for p in _paths(cache_dir, split)] for split in SPLITS}
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size, usecols=MODEL_FEATURES + ['Label'],
+                                 low_memory=False):
+            X = np.empty((len(chunk), len(MODEL_FEATURES)), dtype=np.float32)
+            for j, col in enumerate(MODEL_FEATURES):
+                if col in IP_FEATURES:
+                    enc = encoders['src' if col == 'IPV4_SRC_ADDR' else 'dst']
+                    X[:, j] = enc.partial_fit(chunk[col]).transform(chunk[col])
+                else:
+                    values = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                    X[:, j] = np.clip(np.where(np.isinf(values), np.nan, values), -CLIP, CLIP)
+            y = pd.to_numeric(chunk['Label'], errors='coerce').fillna(0).to_numpy().astype(np.uint8)
+
+            is_holdout = rng.random(len(chunk)) < holdout
+            for split, mask in (('train', ~is_holdout), ('holdout', is_holdout)):
+                fx, fy = files[split]
+                X[mask].tofile(fx)
+                y[mask].tofile(fy)
+                rows[split] += int(mask.sum())
+    finally:
+        for fx, fy in files.values():
+            fx.close()
+            fy.close()
+
+    save_ip_encoders(os.path.join(cache_dir, 'ip_encoders.npz'), encoders)
+    meta = {'features': MODEL_FEATURES, 'rows': rows, 'source': os.path.abspath(csv_path),
+            'holdout': holdout, 'seed': seed}
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh, indent=2)
+    return meta
+
+
+def open_cache(cache_dir: str, split: str):
+    """Read-only (X, y) memmaps of one split; nothing is loaded until sliced."""
+    with open(os.path.join(cache_dir, 'meta.json')) as fh:
+        meta = json.load(fh)
+    n = meta['rows'][split]
+    x_path, y_path = _paths(cache_dir, split)
+    if n == 0:
+        return np.empty((0, len(meta['features'])), np.float32), np.empty(0, np.uint8)
+    return (np.memmap(x_path, dtype=np.float32, mode='r', shape=(n, len(meta['features']))),
+            np.memmap(y_path, dtype=np.uint8, mode='r', shape=(n,)))
+
+
+### 2) memmap cache -> QuantileDMatrix -> booster
+class MemmapBatches(xgb.DataIter):
+    """Feeds a memmap split to XGBoost ``batch_rows`` rows at a time."""
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, batch_rows: int=BATCH_ROWS,
+                 cache_prefix: str=None):
+        self.X, self.y = X, y
+        self.batch_rows = batch_rows
+        self._pos = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._pos >= len(self.X):
+            return False
+        stop = self._pos + self.batch_rows
+        input_data(data=np.ascontiguousarray(self.X[self._pos:stop]),
+                   label=np.asarray(self.y[self._pos:stop], dtype=np.float32),
+                   feature_names=MODEL_FEATURES)
+        self._pos = stop
+        return True
+
+    def reset(self):
+        self._pos = 0
+
+
+def quantile_matrix(X, y, cache_dir: str, name: str, ref=None, batch_rows: int=BATCH_ROWS):
+    """External-memory QuantileDMatrix where XGBoost has one, else the
+    in-memory one (only the quantized bins are kept, not the float data)."""
+    ext = getattr(xgb, 'ExtMemQuantileDMatrix', None)
+    if ext is not None:
+        it = MemmapBatches(X, y, batch_rows, cache_prefix=os.path.join(cache_dir, f"xgb-{name}"))
+        return ext(it, ref=ref, nthread=XGB_PARAMS['nthread'])
+    return xgb.QuantileDMatrix(MemmapBatches(X, y, batch_rows), ref=ref, nthread=XGB_PARAMS['nthread'])
+
+
+def train(cache_dir: str, rounds: int=300, batch_rows: int=BATCH_ROWS):
+    """Train one booster on the cached train split; returns (booster, timings)."""
+    timings = {}
+    start = time.perf_counter()
+    X_train, y_train = open_cache(cache_dir, 'train')
+    X_val, y_val = open_cache(cache_dir, 'holdout')
+    dtrain = quantile_matrix(X_train, y_train, cache_dir, 'train', batch_rows=batch_rows)
+    dval = quantile_matrix(X_val, y_val, cache_dir, 'holdout', ref=dtrain, batch_rows=batch_rows)
+    timings['dmatrix_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    booster = xgb.train(XGB_PARAMS, dtrain, num_boost_round=rounds,
+                        evals=[(dval, 'holdout')], verbose_eval=50)
+    timings['train_s'] = time.perf_counter() - start
+    return booster, timings
+
+
+def evaluate(booster: xgb.Booster, cache_dir: str) -> dict:
+    """Holdout metrics, predicting straight from the memmap in slices."""
+    X_val, y_val = open_cache(cache_dir, 'holdout')
+    preds = predict_batches(booster, X_val)
+    y_pred_bin = (preds > 0.5).astype(int)
+    return {
+        'auc': roc_auc_score(y_val, preds),
+        'accuracy': accuracy_score(y_val, y_pred_bin),
+        'f1': f1_score(y_val, y_pred_bin),
+        'confusion_matrix': confusion_matrix(y_val, y_pred_bin).tolist(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', nargs='?', default='NF-UQ-NIDS-v2.csv')
+    parser.add_argument('--cache', default='./nids_cache', help="memmap cache directory")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the cache even if it exists")
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser.add_argument('--output', default='./')
+    args = parser.parse_args(argv)
+
+    timings = {}
+    start = time.perf_counter()
+    if args.rebuild or not os.path.exists(os.path.join(args.cache, 'meta.json')):
+        meta = build_cache(args.csv, args.cache)
+        timings['cache_s'] = time.perf_counter() - start
+        print(f"Cached {meta['rows']} rows to {args.cache} in {timings['cache_s']:.1f}s")
+
+    booster, train_timings = train(args.cache, args.rounds, args.batch_rows)
+    timings.update(train_timings)
+    metrics = evaluate(booster, args.cache)
+    timings['total_s'] = time.perf_counter() - start
+
+    print(f"\nHoldout AUC: {metrics['auc']:.4f}, Accuracy: {metrics['accuracy']:.4f}, F1: {metrics['f1']:.4f}")
+    print("Confusion Matrix:\n", np.array(metrics['confusion_matrix']))
+    print("Time: " + ", ".join(f"{k} {v:.1f}s" for k, v in timings.items())
+          + f"; peak RSS {peak_rss_mb():.0f} MB")
+
+    os.makedirs(args.output, exist_ok=True)
+    model_path = os.path.join(args.output, "xgb_nids_model.json")
+    encoders_path = os.path.join(args.output, "ip_encoders.npz")
+    booster.save_model(model_path)
+    shutil.copyfile(os.path.join(args.cache, 'ip_encoders.npz'), encoders_path)
+    print(f"Model saved to: {model_path}")
+    print(f"Encoders saved to: {encoders_path}")
+    return booster, metrics, timings
+
+
+if __name__ == '__main__':
+    main()
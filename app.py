@@ -1,3 +1,6 @@
+import os
+import threading
+
 from flask import Flask
 from routes.dashboard import dashboard_bp
 from routes.ml_inference import ml_bp
@@ -6,6 +9,10 @@ from routes.behavior import behavior_bp
 from routes.temporal import temporal_bp
 from routes.geomap import geomap_bp
 from routes.app_identification import app_ident
+from routes.health import health_bp
+from routes.sketch_api import sketch_bp
+from routes.alerts import alerts_bp, start_alert_listener
+from cache import start_invalidation_listener
 
 app = Flask(__name__)
 
@@ -17,6 +24,31 @@ app.register_blueprint(behavior_bp)
 app.register_blueprint(temporal_bp)
 app.register_blueprint(geomap_bp)
 app.register_blueprint(app_ident)
+app.register_blueprint(health_bp)
+app.register_blueprint(sketch_bp)
+app.register_blueprint(alerts_bp)
+
+_listeners_pid = None
+_listeners_lock = threading.Lock()
+
+
+@app.before_request
+def start_listeners():
+    """Start the LISTEN threads in each process that serves requests.
+
+    Not at import: under ``gunicorn --preload`` they would stay in the
+    master, and the debug reloader would start them twice.
+    """
+    global _listeners_pid
+    if _listeners_pid == os.getpid():
+        return
+    with _listeners_lock:
+        if _listeners_pid != os.getpid():
+            # Drop cached API results whenever the collector commits a batch
+            start_invalidation_listener()
+            # Relay detector alerts to /alerts/stream
+            start_alert_listener()
+            _listeners_pid = os.getpid()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""Booster.inplace_predict vs utils.compiled_model.CompiledModel.
+
+Uses the throwaway model from bench_scoring. Checks the compiled model gives
+the Booster's probabilities, including for missing values. Then times both
+per batch and compares model size and what importing each costs a fresh
+process.
+
+    python -m benchmarks.bench_compiled_model [batch rows ...]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_scoring import sample, toy_model
+from utils.compiled_model import CompiledModel
+from utils.features import build_feature_matrix
+
+
+def import_cost(module: str) -> str:
+    """Wall time and peak RSS (VmHWM) of a fresh interpreter that imports ``module``."""
+    code = (f"import time; t = time.perf_counter(); import {module}; dt = time.perf_counter() - t; "
+            f"hwm = [l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')][0]; "
+            f"print(f'{{dt:.2f}}s, {{int(hwm) / 1024:.0f}} MB')")
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          check=True).stdout.strip()
+
+
+def best_of(fn, X, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    booster = toy_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, npz_path = os.path.join(tmp, "model.json"), os.path.join(tmp, "model.npz")
+        booster.save_model(json_path)
+        CompiledModel.from_xgboost_json(json_path).save(npz_path)
+        compiled = CompiledModel.load(npz_path)
+        print(f"{compiled.num_trees} trees, depth {compiled.depth}; "
+              f"JSON {os.path.getsize(json_path) / 2**10:.0f} KiB, npz {os.path.getsize(npz_path) / 2**10:.0f} KiB")
+
+    X = build_feature_matrix(sample(max(sizes)))
+    X[np.random.default_rng(1).random(X.shape) < 0.05] = np.nan
+    np.testing.assert_allclose(compiled.inplace_predict(X), booster.inplace_predict(X), atol=1e-6)
+
+    print(f"{'rows':>8}  {'Booster ms':>10}  {'compiled ms':>11}  {'ratio':>6}")
+    for n in sizes:
+        t_xgb = best_of(booster.inplace_predict, X[:n])
+        t_cmp = best_of(compiled.inplace_predict, X[:n])
+        print(f"{n:>8}  {t_xgb * 1e3:>10.2f}  {t_cmp * 1e3:>11.2f}  {t_xgb / t_cmp:>5.2f}x")
+
+    print(f"import xgboost:              {import_cost('xgboost')}")
+    print(f"import utils.compiled_model: {import_cost('utils.compiled_model')}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1, 100, 1_000, 10_000, 100_000])
@@ -0,0 +1,71 @@
+"""Ingest throughput of CopyWriter vs the old ``to_sql(method="multi")`` path.
+
+Needs a reachable PostgreSQL (the DB_* settings from .env); the rows go into a
+scratch table that is dropped afterwards.
+
+    python -m benchmarks.bench_db_writer [rows ...]
+"""
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+from benchmarks.synthetic import make_caches
+from config import get_database_url
+from flow_parser import parse_flow_cache
+from flow_writer import CopyWriter, FLOW_COLUMNS
+from scraper import build_flow_frame
+
+TABLE = "network_flows_bench"
+DDL = f"""
+    CREATE TABLE {TABLE} (
+        ipv4_src_addr TEXT, ipv4_dst_addr TEXT,
+        l4_src_port INTEGER, l4_dst_port INTEGER, protocol INTEGER, tcp_flags INTEGER,
+        in_bytes BIGINT, in_pkts BIGINT,
+        flow_duration_ms DOUBLE PRECISION, bytes_per_second DOUBLE PRECISION,
+        avg_throughput_bps DOUBLE PRECISION,
+        application_name TEXT, ingress_if INTEGER, egress_if INTEGER,
+        direction TEXT, flow_monitor TEXT,
+        time TIMESTAMPTZ, time_first TIMESTAMPTZ, time_last TIMESTAMPTZ
+    )
+"""
+
+
+def reset(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(DDL))
+
+
+def main(sizes):
+    engine = create_engine(get_database_url())
+    print(f"{'rows':>8}  {'to_sql rows/s':>13}  {'COPY rows/s':>11}  {'speedup':>7}")
+    try:
+        for n in sizes:
+            main_raw, flag_raw = make_caches(n)
+            df = build_flow_frame(parse_flow_cache(main_raw), parse_flow_cache(flag_raw))
+
+            reset(engine)
+            start = time.perf_counter()
+            df.to_sql(TABLE, con=engine, if_exists="append", index=False, method="multi")
+            t_insert = time.perf_counter() - start
+
+            reset(engine)
+            writer = CopyWriter(engine, table=TABLE, columns=FLOW_COLUMNS, max_delay=0)
+            start = time.perf_counter()
+            writer.write(df)
+            t_copy = time.perf_counter() - start
+
+            with engine.connect() as conn:
+                assert conn.execute(text(f"SELECT COUNT(*) FROM {TABLE}")).scalar() == len(df)
+            print(f"{n:>8}  {n / t_insert:>13,.0f}  {n / t_copy:>11,.0f}  {t_insert / t_copy:>6.1f}x")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,72 @@
+"""Payload and cost of /data over long ranges: every flow vs the point budget.
+
+Generates ``rows`` flows spread over a week and serializes them the way /data
+does. It compares all of them (what a week-long range would pull into the
+browser without a budget) with the server-side path: the largest flow per
+slot (what PEAK_FLOWS_QUERY returns, here done in pandas), then LTTB down to
+``max_points``. It also reports how far the biggest spike in the reduced
+series is from the true peak, which should be zero.
+
+    python -m benchmarks.bench_downsample [rows ...]
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from routes.dashboard import CANDIDATES_PER_POINT
+from utils.downsample import DEFAULT_MAX_POINTS, lttb
+
+SPAN = pd.Timedelta(days=7)
+
+
+def make_flows(n: int, seed: int=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp.now(tz="UTC").floor("1min") - SPAN
+    offsets = np.sort(rng.integers(0, int(SPAN.total_seconds() * 1000), n))
+    return pd.DataFrame({
+        "time_first": start + pd.to_timedelta(offsets, unit="ms"),
+        "ipv4_src_addr": "10.0.0.1",
+        "in_bytes": rng.lognormal(7, 2, n).astype(np.int64),
+        "avg_throughput_bps": rng.lognormal(10, 1, n),
+    })
+
+
+def to_json(df: pd.DataFrame) -> str:
+    out = df.copy()
+    out["time_first"] = out["time_first"].astype(str)
+    return json.dumps(out.where(pd.notnull(out), None).to_dict(orient="records"))
+
+
+def reduce(df: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    candidates = max_points * CANDIDATES_PER_POINT
+    slot_seconds = SPAN.total_seconds() / candidates
+    slot = ((df["time_first"] - df["time_first"].iloc[0]).dt.total_seconds() // slot_seconds).astype(np.int64)
+    peaks = df.loc[df["in_bytes"].groupby(slot).idxmax()].reset_index(drop=True)
+    x = peaks["time_first"].astype("int64").to_numpy()
+    return peaks.iloc[lttb(x, peaks["in_bytes"].to_numpy(dtype=float), max_points)]
+
+
+def main(sizes, max_points: int=DEFAULT_MAX_POINTS):
+    print(f"one week of flows, max_points={max_points}")
+    print(f"{'flows':>10}  {'all KB':>9}  {'all s':>7}  {'budget KB':>9}  {'reduce s':>8}  {'lttb s':>7}  "
+          f"{'points':>6}  {'peak kept':>9}")
+    for n in sizes:
+        df = make_flows(n)
+        t = time.perf_counter(); full = to_json(df); t_full = time.perf_counter() - t
+
+        t = time.perf_counter(); small = reduce(df, max_points); t_reduce = time.perf_counter() - t
+        x = df["time_first"].astype("int64").to_numpy()
+        t = time.perf_counter(); lttb(x[:max_points * CANDIDATES_PER_POINT],
+                                      df["in_bytes"].to_numpy(dtype=float)[:max_points * CANDIDATES_PER_POINT],
+                                      max_points)
+        t_lttb = time.perf_counter() - t
+        body = to_json(small)
+        print(f"{n:>10,}  {len(full) / 1024:>9.0f}  {t_full:>7.2f}  {len(body) / 1024:>9.0f}  {t_reduce:>8.3f}  "
+              f"{t_lttb:>7.4f}  {len(small):>6}  {str(small['in_bytes'].max() == df['in_bytes'].max()):>9}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100_000, 1_000_000])
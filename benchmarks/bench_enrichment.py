@@ -0,0 +1,34 @@
+"""Time enrichment.enrich_flows against the original row-wise steps.
+
+Both are checked for equal output in tests/test_enrichment.py.
+
+    python -m benchmarks.bench_enrichment [rows ...]
+"""
+import sys
+import time
+
+from enrichment import enrich_flows
+from tests.test_enrichment import TODAY, rowwise, sample
+
+
+def best_of(fn, df, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        frame = df.copy()
+        start = time.perf_counter()
+        fn(frame, "FLOW-MONITOR")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    print(f"{'rows':>8}  {'row-wise s':>10}  {'vectorized s':>12}  {'speedup':>7}")
+    for n in sizes:
+        df = sample(n)
+        t_row = best_of(rowwise, df)
+        t_vec = best_of(lambda frame, m: enrich_flows(frame, m, today=TODAY), df)
+        print(f"{n:>8}  {t_row:>10.3f}  {t_vec:>12.3f}  {t_row / t_vec:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,78 @@
+"""Compare the flow-key hash join with the old pd.merge on five columns.
+
+    python -m benchmarks.bench_flow_join [rows ...]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_caches
+from flow_key import KEY_COLUMNS, flow_keys, hash_join, ipv4_to_uint32
+from flow_parser import parse_flow_cache
+
+RENAME = {"trns_src_port": "l4_src_port", "trns_dst_port": "l4_dst_port", "ip_prot": "protocol"}
+
+
+def legacy_merge(df_main: pd.DataFrame, df_flag: pd.DataFrame) -> np.ndarray:
+    for df in (df_main, df_flag):
+        df["l4_src_port"] = pd.to_numeric(df["l4_src_port"], errors="coerce")
+        df["l4_dst_port"] = pd.to_numeric(df["l4_dst_port"], errors="coerce")
+        df["protocol"]    = pd.to_numeric(df["protocol"],    errors="coerce")
+    df = pd.merge(df_main, df_flag[KEY_COLUMNS + ["tcp_flags"]], on=KEY_COLUMNS, how="left")
+    return df["tcp_flags"].to_numpy(dtype=np.float64)
+
+
+def key_join(df_main: pd.DataFrame, df_flag: pd.DataFrame) -> np.ndarray:
+    match = hash_join(flow_keys(df_main), flow_keys(df_flag))
+    return df_flag["tcp_flags"].reset_index(drop=True).reindex(match).to_numpy(dtype=np.float64)
+
+
+def join_only(keys_main: np.ndarray, keys_flag: np.ndarray) -> np.ndarray:
+    return hash_join(keys_main, keys_flag)
+
+
+def measure(fn, df_main, df_flag, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        a, b = (df_main.copy(), df_flag.copy()) if fn is not join_only else (df_main, df_flag)
+        start = time.perf_counter()
+        fn(a, b)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(df_main.copy(), df_flag.copy())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(sizes):
+    print("merge: pd.merge on 5 columns | keys+join: flow_keys on both sides + hash_join"
+          " | join: hash_join on prebuilt keys (how the state table reuses them)")
+    print(f"{'rows':>8}  {'merge s':>8}  {'keys+join s':>11}  {'join s':>7}  "
+          f"{'merge MB':>8}  {'keys+join MB':>12}")
+    for n in sizes:
+        main_raw, flag_raw = make_caches(n)
+        df_main = parse_flow_cache(main_raw).rename(columns=RENAME)
+        # Flag monitor in a different order and missing some flows
+        df_flag = parse_flow_cache(flag_raw).rename(columns=RENAME).sample(frac=0.9, random_state=1)
+
+        expected = legacy_merge(df_main.copy(), df_flag.copy())
+        actual = key_join(df_main.copy(), df_flag.copy())
+        np.testing.assert_array_equal(actual, expected)
+
+        addrs = df_main["ipv4_src_addr"].to_numpy(dtype=object)
+        reference = np.array([int.from_bytes(bytes(map(int, a.split("."))), "big") for a in addrs[:1000]])
+        np.testing.assert_array_equal(ipv4_to_uint32(addrs[:1000]), reference)
+
+        t_old, m_old = measure(legacy_merge, df_main, df_flag)
+        t_new, m_new = measure(key_join, df_main, df_flag)
+        t_join, _ = measure(join_only, flow_keys(df_main), flow_keys(df_flag))
+        print(f"{n:>8}  {t_old:>8.3f}  {t_new:>11.3f}  {t_join:>7.3f}  "
+              f"{m_old / 2**20:>8.1f}  {m_new / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
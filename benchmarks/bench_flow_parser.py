@@ -0,0 +1,54 @@
+"""Compare flow_parser.parse_flow_cache against scraper.parse_header_and_rows.
+
+    python -m benchmarks.bench_flow_parser [rows ...]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+os.environ.setdefault("DB_PASSWORD", "benchmark")
+
+from benchmarks.synthetic import make_caches
+from flow_parser import parse_flow_cache
+from scraper import parse_header_and_rows
+
+
+def legacy(raw: str) -> pd.DataFrame:
+    _, rows = parse_header_and_rows(raw)
+    return pd.DataFrame(rows)
+
+
+def measure(fn, raw: str, repeat: int=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(sizes):
+    print(f"{'rows':>8}  {'legacy s':>9}  {'new s':>7}  {'speedup':>7}  {'legacy MB':>9}  {'new MB':>7}")
+    for n in sizes:
+        raw, _ = make_caches(n)
+        old = legacy(raw)
+        new = parse_flow_cache(raw)
+        assert list(old.columns) == [c for c in new.columns if not c.endswith("_u32")]
+        assert (old["ipv4_src_addr"].to_numpy() == new["ipv4_src_addr"].to_numpy()).all()
+        assert (pd.to_numeric(old["bytes"]).to_numpy() == new["bytes"].to_numpy()).all()
+
+        t_old, m_old = measure(legacy, raw)
+        t_new, m_new = measure(parse_flow_cache, raw)
+        print(f"{n:>8}  {t_old:>9.3f}  {t_new:>7.3f}  {t_old / t_new:>6.1f}x  "
+              f"{m_old / 2**20:>9.1f}  {m_new / 2**20:>7.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
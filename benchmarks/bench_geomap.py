@@ -0,0 +1,114 @@
+"""Per-flow GeoIP lookups vs distinct-address lookups aggregated per location.
+
+Builds ``rows`` flows from a few thousand source addresses. The old path
+resolves every flow with ``apply`` and emits one point per flow with
+``iterrows``. The new path gets one row per address (what SOURCES_QUERY
+returns), resolves each distinct address through GeoLocator and aggregates
+per location. The second request runs with a warm cache. Uses the real
+GeoLite2 reader when geoip2 and GEOIP_PATH are available. Otherwise it uses
+an in-memory table, which makes per-lookup cost (and so the speedup) a lower
+bound.
+
+    python -m benchmarks.bench_geomap [rows ...]
+"""
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from config import get_resource_config
+from routes.geomap import aggregate_by_location
+from utils.geo import GeoLocator
+
+ADDRESSES = 3_000
+
+
+class TableReader:
+    """``reader.city(ip)`` over a dict, shaped like geoip2's City record."""
+
+    def __init__(self, ips):
+        rng = np.random.default_rng(0)
+        cities = [(float(lat), float(lon), f"City {i}", "AE")
+                  for i, (lat, lon) in enumerate(rng.uniform(-60, 60, (200, 2)))]
+        self.table = {ip: cities[i % len(cities)] for i, ip in enumerate(ips) if i % 10}
+
+    def city(self, ip):
+        lat, lon, name, country = self.table[ip]
+        return SimpleNamespace(location=SimpleNamespace(latitude=lat, longitude=lon),
+                               city=SimpleNamespace(name=name), country=SimpleNamespace(iso_code=country))
+
+
+def open_reader(ips):
+    path = get_resource_config()['geoip_path']
+    try:
+        import geoip2.database
+        if os.path.exists(path):
+            return geoip2.database.Reader(path), "GeoLite2"
+    except ImportError:
+        pass
+    return TableReader(ips), "in-memory table"
+
+
+def old_path(reader, flows: pd.DataFrame) -> str:
+    """geomap_data before: lookup per flow, then one record per flow."""
+    def lookup(ip):
+        try:
+            rec = reader.city(ip)
+            return {'lat': rec.location.latitude, 'lon': rec.location.longitude}
+        except Exception:
+            return {'lat': None, 'lon': None}
+
+    df = flows.copy()
+    df['geo'] = df['ipv4_src_addr'].apply(lookup)
+    records = []
+    for idx, row in df.iterrows():
+        geo = row['geo']
+        if geo['lat'] is not None and geo['lon'] is not None:
+            records.append({'ip': row['ipv4_src_addr'], 'time': row['time_first'].isoformat(),
+                            'lat': geo['lat'], 'lon': geo['lon']})
+    return json.dumps(records)
+
+
+def sources_of(flows: pd.DataFrame) -> pd.DataFrame:
+    """What SOURCES_QUERY returns for these flows."""
+    return (flows.groupby('ipv4_src_addr')
+                 .agg(flows=('time_first', 'size'), bytes=('in_bytes', 'sum'),
+                      first_seen=('time_first', 'min'), last_seen=('time_first', 'max'))
+                 .rename_axis('ip').reset_index())
+
+
+def new_path(reader, locator: GeoLocator, sources: pd.DataFrame) -> str:
+    return json.dumps(aggregate_by_location(sources, locator.locate(reader, sources['ip'])))
+
+
+def main(sizes):
+    rng = np.random.default_rng(1)
+    ips = np.array([f"{a}.{b}.{c}.{d}" for a, b, c, d in rng.integers(1, 255, (ADDRESSES, 4))], dtype=object)
+    reader, kind = open_reader(ips)
+    print(f"reader: {kind}, {ADDRESSES} distinct source addresses")
+    print(f"{'flows':>8}  {'old s':>7}  {'old KB':>8}  {'new cold s':>10}  {'new warm s':>10}  {'new KB':>7}")
+    for n in sizes:
+        start = pd.Timestamp.now(tz='UTC') - pd.Timedelta(minutes=5)
+        flows = pd.DataFrame({
+            'ipv4_src_addr': ips[(rng.zipf(1.3, n) - 1) % ADDRESSES],
+            'time_first': start + pd.to_timedelta(rng.integers(0, 300_000, n), unit='ms'),
+            'in_bytes': rng.integers(40, 1_000_000, n),
+        })
+        t = time.perf_counter(); old = old_path(reader, flows); t_old = time.perf_counter() - t
+        sources = sources_of(flows)
+        locator = GeoLocator()
+        t = time.perf_counter(); new = new_path(reader, locator, sources); t_cold = time.perf_counter() - t
+        t = time.perf_counter(); new_path(reader, locator, sources); t_warm = time.perf_counter() - t
+
+        # same flows land on the map either way
+        assert sum(loc['flows'] for loc in json.loads(new)['locations']) == len(json.loads(old))
+        print(f"{n:>8}  {t_old:>7.3f}  {len(old) / 1024:>8.0f}  {t_cold:>10.4f}  {t_warm:>10.4f}  "
+              f"{len(new) / 1024:>7.0f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 500_000])
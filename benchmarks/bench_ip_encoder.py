@@ -0,0 +1,71 @@
+"""Per-element LabelEncoderExt.transform vs utils.encoders.IPEncoder.
+
+The old transform tests ``x in classes_`` once per address, against a NumPy
+array, so it is only timed up to LEGACY_MAX rows. Every size checks that
+IPEncoder.from_label_encoder gives the legacy codes, including for unseen
+addresses, then times fit and transform.
+
+    python -m benchmarks.bench_ip_encoder [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.encoders import IPEncoder, LabelEncoderExt
+
+LEGACY_MAX = 20_000
+VOCABULARY = 50_000
+
+
+def legacy_transform(encoder: LabelEncoderExt, data) -> np.ndarray:
+    """LabelEncoderExt.transform as the training script had it."""
+    arr = []
+    for x in data:
+        arr.append(x if x in encoder.classes_ else 'Unknown')
+    return encoder.le.transform(arr)
+
+
+def addresses(n: int, vocabulary: int, seed: int=0) -> pd.Series:
+    """``n`` dotted quads drawn from ``vocabulary`` distinct 10.x.x.x hosts."""
+    rng = np.random.default_rng(seed)
+    hosts = rng.choice(1 << 24, size=vocabulary, replace=False) + (10 << 24)
+    packed = hosts[rng.integers(0, vocabulary, n)].astype(np.uint32)
+    octets = [(packed >> s) & 0xFF for s in (24, 16, 8, 0)]
+    return pd.Series(octets[0].astype(str)).str.cat([o.astype(str) for o in octets[1:]], sep='.')
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main(sizes):
+    train = addresses(VOCABULARY * 4, VOCABULARY)
+    legacy = LabelEncoderExt().fit(train)
+    encoder = IPEncoder.from_label_encoder(legacy)
+    _, t_fit = timed(IPEncoder().fit, train)
+    print(f"vocabulary {len(encoder)} addresses; IPEncoder.fit over {len(train)} rows: {t_fit:.3f}s")
+
+    print(f"{'rows':>10}  {'legacy s':>9}  {'IPEncoder s':>11}  {'rows/s':>12}  {'speedup':>7}")
+    for n in sizes:
+        # a quarter of the rows come from hosts the encoder has never seen
+        data = pd.concat([addresses(n - n // 4, VOCABULARY), addresses(n // 4, 1000, seed=1)],
+                         ignore_index=True)
+        codes, t_new = timed(encoder.transform, data)
+
+        if n <= LEGACY_MAX:
+            expected, t_old = timed(legacy_transform, legacy, data)
+            speedup = f"{t_old / t_new:>6.0f}x"
+        else:
+            head = data[:LEGACY_MAX]
+            expected, codes = legacy_transform(legacy, head), codes[:LEGACY_MAX]
+            t_old, speedup = float("nan"), "    n/a"
+        np.testing.assert_array_equal(codes, expected)
+        print(f"{n:>10}  {t_old:>9.3f}  {t_new:>11.3f}  {n / t_new:>12,.0f}  {speedup}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 1_000_000, 5_000_000])
@@ -0,0 +1,83 @@
+"""Row-wise feature building + DMatrix vs utils.features + inplace_predict.
+
+Trains a small throwaway booster on random data with the production feature
+names, so it runs without the model files. Checks both paths give the same
+probabilities, then times them.
+
+    python -m benchmarks.bench_scoring [rows ...]
+"""
+import sys
+import time
+import socket
+import struct
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from benchmarks.synthetic import make_caches
+from flow_parser import parse_flow_cache
+from scraper import build_flow_frame
+from utils.features import MODEL_FEATURES, FEATURE_COLUMNS, build_feature_matrix, predict_batches
+
+
+def ip_to_int(ip_str):
+    try:
+        return struct.unpack("!I", socket.inet_aton(ip_str))[0]
+    except Exception:
+        return 0
+
+
+def rowwise(booster, df: pd.DataFrame) -> np.ndarray:
+    """Scoring exactly as /flows_with_predictions used to do it."""
+    def preprocess_row(row):
+        return [ip_to_int(row["ipv4_src_addr"]), ip_to_int(row["ipv4_dst_addr"])] + \
+               [row[c] for c in list(FEATURE_COLUMNS)[2:]]
+
+    X_df = pd.DataFrame(df.apply(preprocess_row, axis=1).tolist(), columns=MODEL_FEATURES)
+    return booster.predict(xgb.DMatrix(X_df, feature_names=MODEL_FEATURES))
+
+
+def vectorized(booster, df: pd.DataFrame) -> np.ndarray:
+    return predict_batches(booster, build_feature_matrix(df))
+
+
+def toy_model(seed: int=0) -> xgb.Booster:
+    rng = np.random.default_rng(seed)
+    X = rng.random((5_000, len(MODEL_FEATURES))) * [2**32, 2**32, 65535, 65535, 17, 63,
+                                                    1e8, 1e5, 3e5, 1e7, 1e8]
+    y = rng.integers(0, 2, len(X))
+    dtrain = xgb.DMatrix(X, label=y, feature_names=MODEL_FEATURES)
+    return xgb.train({"objective": "binary:logistic", "max_depth": 6, "tree_method": "hist"},
+                     dtrain, num_boost_round=50)
+
+
+def sample(n: int) -> pd.DataFrame:
+    main_raw, flag_raw = make_caches(n)
+    df = build_flow_frame(parse_flow_cache(main_raw), parse_flow_cache(flag_raw))
+    return df.astype({"tcp_flags": "float64"})
+
+
+def best_of(fn, booster, df, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(booster, df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    booster = toy_model()
+    print(f"{'rows':>8}  {'row-wise s':>10}  {'vectorized s':>12}  {'speedup':>7}")
+    for n in sizes:
+        df = sample(n)
+        np.testing.assert_allclose(vectorized(booster, df), rowwise(booster, df), rtol=1e-6)
+
+        t_row = best_of(rowwise, booster, df)
+        t_vec = best_of(vectorized, booster, df)
+        print(f"{n:>8}  {t_row:>10.3f}  {t_vec:>12.3f}  {t_row / t_vec:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 10_000, 100_000])
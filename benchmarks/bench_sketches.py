@@ -0,0 +1,124 @@
+"""Heavy-hitter sketches vs exact GROUP BYs over a 30-minute window.
+
+Models what the collector writes. ``batches_per_minute`` COPY batches of
+``batch_rows`` delta rows arrive each minute for 30 minutes. Each batch's
+time_first spreads over the 30 minutes before it, as delta rows keep their
+flow's original start. Every batch is sketched once (build_sketches) and
+merged into the row of its ingest minute, the way write_sketches does it:
+load the stored sketch, merge, serialize. The old layout's write cost,
+one sketch per minute of time_first in each batch, is timed on one batch
+for comparison.
+
+The window is then merged back the way load_window does, and each panel is
+compared with the exact pandas answer over every ingested row: top-10 keys
+found, largest relative error of their counts, and the HyperLogLog distinct
+count. The exact column times the value_counts / groupby that /behavior and
+/metrics ran over the fetched rows. That is a lower bound for the old path,
+which also had to fetch every row from the database.
+
+    python -m benchmarks.bench_sketches [batch_rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from sketches import FlowSketch, build_sketches, dimension_keys
+
+ADDRESSES = 50_000
+MINUTES = 30
+BATCHES_PER_MINUTE = 3
+PANELS = [("src", "bytes"), ("dst", "flows"), ("dst_port", "flows"), ("pair", "flows")]
+
+
+def make_batch(rng: np.random.Generator, ips: np.ndarray, n: int, ingested: pd.Timestamp) -> pd.DataFrame:
+    return pd.DataFrame({
+        "ipv4_src_addr": ips[(rng.zipf(1.2, n) - 1) % ADDRESSES],
+        "ipv4_dst_addr": ips[(rng.zipf(1.4, n) - 1) % ADDRESSES],
+        "l4_dst_port": (rng.zipf(1.3, n) * 7) % 65536,
+        "in_bytes": rng.lognormal(8, 2, n).astype(np.int64),
+        "time_first": ingested - pd.to_timedelta(rng.integers(0, MINUTES * 60_000, n), unit="ms"),
+        "flow_monitor": "FLOW-MONITOR",
+    })
+
+
+def exact_top(df: pd.DataFrame, dimension: str, weight: str, n: int=10) -> pd.Series:
+    keys = dimension_keys(df, dimension)
+    values = df.loc[keys.index, "in_bytes"] if weight == "bytes" else pd.Series(1, index=keys.index)
+    return values.groupby(keys).sum().nlargest(n)
+
+
+def old_layout_write(batch: pd.DataFrame) -> int:
+    """One sketch per minute of time_first, each serialized; returns how many."""
+    parts = batch.groupby(batch["time_first"].dt.floor("1min"))
+    for _, minute in parts:
+        sketch = FlowSketch.from_config()
+        sketch.add(minute)
+        sketch.to_bytes()
+    return parts.ngroups
+
+
+def main(sizes):
+    print(f"sketch parameters (cms width, depth, top k, hll precision): {FlowSketch.from_config().params}")
+    for batch_rows in sizes:
+        rng = np.random.default_rng(0)
+        ips = np.array([f"10.{a}.{b}.{c}" for a, b, c in rng.integers(0, 255, (ADDRESSES, 3))], dtype=object)
+        start = pd.Timestamp.now(tz="UTC").floor("1min") - pd.Timedelta(minutes=MINUTES)
+
+        stored = {}   # (ingest minute, monitor) -> bytes, like flow_sketches
+        batches, t_build, t_merge = [], [], []
+        for minute in range(MINUTES):
+            for i in range(BATCHES_PER_MINUTE):
+                ingested = start + pd.Timedelta(minutes=minute, seconds=60 * i / BATCHES_PER_MINUTE)
+                batch = make_batch(rng, ips, batch_rows, ingested)
+                batches.append(batch)
+
+                t = time.perf_counter()
+                sketches = build_sketches(batch)
+                t_build.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                for monitor, sketch in sketches.items():
+                    key = (minute, monitor)
+                    if key in stored:
+                        sketch = FlowSketch.from_bytes(stored[key]).merge(sketch)
+                    stored[key] = sketch.to_bytes()
+                t_merge.append(time.perf_counter() - t)
+        df = pd.concat(batches, ignore_index=True)
+
+        t = time.perf_counter()
+        old_rows = old_layout_write(batches[-1])
+        t_old = time.perf_counter() - t
+
+        t = time.perf_counter()
+        window = FlowSketch.merge_all([FlowSketch.from_bytes(b) for b in stored.values()])
+        t_load = time.perf_counter() - t
+        t = time.perf_counter()
+        for dimension, weight in PANELS:
+            window.top(dimension, weight, 10)
+        t_cold = time.perf_counter() - t
+
+        size = sum(map(len, stored.values()))
+        print(f"\n{len(batches)} batches of {batch_rows:,} rows ({len(df):,} flows) over {MINUTES} minutes")
+        print(f"  per batch: build {np.median(t_build):.3f}s (outside the transaction), "
+              f"merge into the minute's row {np.median(t_merge):.3f}s; "
+              f"old layout: {old_rows} sketches in {t_old:.2f}s")
+        print(f"  window: {len(stored)} rows, {size / 1024:.0f} KB (old layout: about "
+              f"{old_rows * len(batches)} rows); load + merge {t_load:.3f}s, "
+              f"top-10 of {len(PANELS)} panels {t_cold * 1e3:.2f} ms")
+        print(f"  {'panel':<17}  {'exact s':>8}  {'top-10 found':>12}  {'max rel err':>11}  "
+              f"{'distinct':>9}  {'estimated':>9}")
+        for dimension, weight in PANELS:
+            t = time.perf_counter()
+            exact = exact_top(df, dimension, weight)
+            t_exact = time.perf_counter() - t
+            estimated = dict(window.top(dimension, weight, 10))
+            found = [k for k in exact.index if k in estimated]
+            error = max((abs(estimated[k] - exact[k]) / exact[k] for k in found), default=float("nan"))
+            distinct = dimension_keys(df, dimension).nunique()
+            print(f"  {dimension + ' by ' + weight:<17}  {t_exact:>8.3f}  {len(found):>9}/10  {error:>11.2e}  "
+                  f"{distinct:>9}  {window.distinct(dimension):>9}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000])
@@ -0,0 +1,56 @@
+"""Cold start of the web app, and what the old eager imports used to add.
+
+Each measurement is a fresh interpreter: wall time of the import and its
+peak RSS (VmHWM). ``import app`` no longer loads the model, encoders or
+GeoIP database. The rows below it time what the blueprints used to do at
+import: load xgboost, sklearn and joblib, and open the GeoLite2 reader.
+The reader is only opened when the database file exists.
+
+    python -m benchmarks.bench_startup [repeat]
+"""
+import os
+import subprocess
+import sys
+
+from config import get_resource_config
+
+PEAK_RSS = ("hwm = [l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')][0]; "
+            "print(time.perf_counter() - t, int(hwm) / 1024)")
+
+
+def measure(statement: str, repeat: int):
+    """Best wall time and its peak RSS over ``repeat`` fresh interpreters (None if it fails)."""
+    best = None
+    for _ in range(repeat):
+        code = f"import time; t = time.perf_counter(); {statement}; {PEAK_RSS}"
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None
+        seconds, rss = map(float, proc.stdout.split()[-2:])
+        if best is None or seconds < best[0]:
+            best = (seconds, rss)
+    return best
+
+
+def main(repeat: int):
+    geoip = get_resource_config()['geoip_path']
+    cases = [
+        ("import app", "import app"),
+        ("import xgboost", "import xgboost"),
+        ("import sklearn + joblib", "import sklearn.preprocessing, joblib"),
+        ("import geoip2", "import geoip2.database"),
+    ]
+    if os.path.exists(geoip):
+        cases.append(("open GeoLite2 reader", f"import geoip2.database; geoip2.database.Reader({geoip!r})"))
+
+    print(f"{'':<26}  {'seconds':>8}  {'peak RSS MB':>11}")
+    for label, statement in cases:
+        result = measure(statement, repeat)
+        if result is None:
+            print(f"{label:<26}  {'unavailable':>8}")
+        else:
+            print(f"{label:<26}  {result[0]:>8.3f}  {result[1]:>11.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
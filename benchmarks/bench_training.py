@@ -0,0 +1,139 @@
+"""Chunked xg_boost_11.py training vs the out-of-core xg_boost_external.py.
+
+Writes a synthetic NF-UQ-NIDS-shaped CSV, then trains on it both ways. Each
+run is in a fresh process so its peak RSS is its own. Both build the same
+number of trees (50 per chunk for the chunked loop).
+
+    python -m benchmarks.bench_training [rows] [--keep DIR]
+"""
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from Training_Script import xg_boost_external as external
+from utils.encoders import IPEncoder
+from utils.features import MODEL_FEATURES
+
+CHUNK_SIZE = 200_000
+ROUNDS_PER_CHUNK = 50
+
+
+def make_csv(path: str, n: int, seed: int=0):
+    """NF-UQ-like rows: the model features, a few unused columns and a Label
+    that depends on ports, bytes and a set of 'attacker' hosts."""
+    rng = np.random.default_rng(seed)
+    hosts = np.array([f"10.{a}.{b}.{c}" for a, b, c in rng.integers(0, 255, (20_000, 3))])
+    rows = 0
+    with open(path, "w") as fh:
+        while rows < n:
+            m = min(CHUNK_SIZE, n - rows)
+            src = rng.integers(0, len(hosts), m)
+            df = pd.DataFrame({
+                "IPV4_SRC_ADDR": hosts[src],
+                "L4_SRC_PORT": rng.integers(1024, 65535, m),
+                "IPV4_DST_ADDR": hosts[rng.integers(0, len(hosts), m)],
+                "L4_DST_PORT": rng.choice([22, 53, 80, 443, 3389, 8080], m),
+                "PROTOCOL": rng.choice([6, 17, 1], m),
+                "L7_PROTO": rng.random(m) * 200,
+                "IN_BYTES": rng.lognormal(7, 2, m).astype(int),
+                "IN_PKTS": rng.integers(1, 500, m),
+                "OUT_BYTES": rng.lognormal(7, 2, m).astype(int),
+                "TCP_FLAGS": rng.integers(0, 63, m),
+                "FLOW_DURATION_MILLISECONDS": rng.integers(0, 300_000, m),
+                "SRC_TO_DST_SECOND_BYTES": rng.lognormal(5, 2, m),
+                "SRC_TO_DST_AVG_THROUGHPUT": rng.lognormal(8, 2, m),
+            })
+            df.loc[rng.random(m) < 0.01, "SRC_TO_DST_SECOND_BYTES"] = np.inf
+            score = ((src % 17 == 0) * 2 + (df["L4_DST_PORT"] == 3389) + (df["IN_BYTES"] < 200)
+                     + rng.normal(0, 0.7, m))
+            df["Label"] = (score > 1.5).astype(int)
+            df["Attack"] = np.where(df["Label"] == 1, "scan", "Benign")
+            df.to_csv(fh, header=rows == 0, index=False)
+            rows += m
+
+
+def chunked(csv_path: str, workdir: str) -> dict:
+    """The xg_boost_11.py training loop, without the plotting and file output."""
+    enc_src, enc_dst = IPEncoder(), IPEncoder()
+    booster, aucs = None, []
+    params = {"objective": "binary:logistic", "eval_metric": "auc", "tree_method": "hist",
+              "max_depth": 6, "eta": 0.1}
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_SIZE, low_memory=False):
+        chunk.replace([np.inf, -np.inf], np.nan, inplace=True)
+        chunk.fillna(0, inplace=True)
+        chunk = chunk[MODEL_FEATURES + ["Label"]]
+        chunk["IPV4_SRC_ADDR"] = enc_src.partial_fit(chunk["IPV4_SRC_ADDR"]).transform(chunk["IPV4_SRC_ADDR"])
+        chunk["IPV4_DST_ADDR"] = enc_dst.partial_fit(chunk["IPV4_DST_ADDR"]).transform(chunk["IPV4_DST_ADDR"])
+        y = chunk["Label"].astype(int)
+        X = chunk.drop(columns=["Label"])
+        X = pd.DataFrame(SimpleImputer(strategy="mean").fit_transform(X), columns=X.columns)
+        X = X.clip(-1e6, 1e6)
+        X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        dtrain, dval = xgb.DMatrix(X_train, label=y_train), xgb.DMatrix(X_val, label=y_val)
+        booster = xgb.train(params, dtrain, num_boost_round=ROUNDS_PER_CHUNK, xgb_model=booster,
+                            evals=[(dval, "validation")], verbose_eval=False)
+        aucs.append(roc_auc_score(y_val, booster.predict(dval)))
+    return {"auc": float(np.mean(aucs)), "auc_on": "mean per-chunk split", "trees": booster.num_boosted_rounds()}
+
+
+def out_of_core(csv_path: str, workdir: str) -> dict:
+    cache = os.path.join(workdir, "cache")
+    external.build_cache(csv_path, cache)
+    rows = sum(pd.read_json(os.path.join(cache, "meta.json"), typ="series")["rows"].values())
+    rounds = ROUNDS_PER_CHUNK * -(-rows // CHUNK_SIZE)
+    booster, _ = external.train(cache, rounds=rounds)
+    return {"auc": external.evaluate(booster, cache)["auc"], "auc_on": "global holdout",
+            "trees": booster.num_boosted_rounds()}
+
+
+def _run(name, csv_path, workdir, queue):
+    start = time.perf_counter()
+    result = globals()[name](csv_path, workdir)
+    result["seconds"] = time.perf_counter() - start
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put(result)
+
+
+def main(rows: int, workdir: str):
+    csv_path = os.path.join(workdir, "nf_uq_synthetic.csv")
+    start = time.perf_counter()
+    make_csv(csv_path, rows)
+    print(f"{rows} rows, {os.path.getsize(csv_path) / 2**20:.0f} MB CSV "
+          f"in {time.perf_counter() - start:.1f}s; {os.cpu_count()} cores")
+
+    ctx = mp.get_context("spawn")
+    print(f"{'method':>12}  {'seconds':>8}  {'peak RSS MB':>11}  {'trees':>5}  {'AUC':>6}  AUC on")
+    for name in ("chunked", "out_of_core"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(name, csv_path, workdir, queue))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0:
+            print(f"{name:>12}  failed (exit code {proc.exitcode})")
+            continue
+        r = queue.get()
+        print(f"{name:>12}  {r['seconds']:>8.1f}  {r['peak_rss_mb']:>11.0f}  {r['trees']:>5}  "
+              f"{r['auc']:>6.4f}  {r['auc_on']}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    keep = args[args.index("--keep") + 1] if "--keep" in args else None
+    args = [a for a in args if not a.startswith("--") and a != keep]
+    n = int(args[0]) if args else 1_000_000
+    if keep:
+        os.makedirs(keep, exist_ok=True)
+        main(n, keep)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            main(n, tmp)
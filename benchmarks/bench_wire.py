@@ -0,0 +1,96 @@
+"""Payload size and serialization time of the /data encodings.
+
+Builds ``rows`` flows shaped like get_data's frame. Each one is encoded the
+way /data responds: the legacy records path (data_records + jsonify), then
+columnar JSON with orjson and with the standard json fallback, then Arrow
+IPC when pyarrow is installed. Each body is also compressed with gzip, and
+with brotli when it is installed. Times are the best of ``repeat`` runs and
+include compression.
+
+    python -m benchmarks.bench_wire [rows ...]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+
+import utils.wire as wire
+from routes.dashboard import data_records
+
+REPEAT = 3
+
+
+def make_frame(n: int, seed: int=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp.now(tz="UTC")
+    first = now - pd.to_timedelta(np.sort(rng.integers(0, 300_000_000, n))[::-1], unit="us")
+    return pd.DataFrame({
+        "scrape_time": now.floor("1min"),
+        "time_first": first,
+        "time_last": first + pd.to_timedelta(rng.integers(0, 60_000, n), unit="ms"),
+        "ipv4_src_addr": [f"10.0.{a}.{b}" for a, b in rng.integers(0, 255, (n, 2))],
+        "ipv4_dst_addr": [f"192.168.{a}.{b}" for a, b in rng.integers(0, 255, (n, 2))],
+        "l4_src_port": rng.integers(1024, 65535, n),
+        "l4_dst_port": rng.choice([53, 80, 443, 8080], n),
+        "protocol": rng.choice([6, 17], n),
+        "tcp_flags": rng.integers(0, 64, n),
+        "in_bytes": rng.integers(40, 1_000_000, n),
+        "in_pkts": rng.integers(1, 1000, n),
+        "flow_duration_ms": rng.integers(0, 60_000, n).astype(float),
+        "bytes_per_second": np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(8, 2, n)),
+        "avg_throughput_bps": np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(10, 2, n)),
+        "flow_monitor": "FLOW-MONITOR",
+        "application_name": rng.choice(["layer7 http", "layer7 ssl", "port dns", None], n),
+        "ingress_if": rng.integers(1, 4, n),
+        "egress_if": rng.integers(1, 4, n),
+        "direction": rng.choice(["inbound", "outbound"], n),
+    })
+
+
+def best(fn):
+    times = []
+    for _ in range(REPEAT):
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    return min(times), out
+
+
+def encoders(df: pd.DataFrame):
+    def columns(orjson: bool):
+        def run():
+            saved, wire.HAS_ORJSON = wire.HAS_ORJSON, orjson and wire.HAS_ORJSON
+            try:
+                return wire.encode_columns(df)
+            finally:
+                wire.HAS_ORJSON = saved
+        return run
+
+    yield "records (before)", lambda: jsonify(data_records(df)).get_data()
+    if wire.HAS_ORJSON:
+        yield "columns, orjson", columns(True)
+    yield "columns, json", columns(False)
+    if wire.HAS_ARROW:
+        yield "arrow", lambda: wire.encode_arrow(df)
+
+
+def main(sizes):
+    app = Flask(__name__)
+    encodings = ["identity"] + wire.available_encodings()
+    print(f"encodings: {', '.join(encodings)}; pyarrow {'found' if wire.HAS_ARROW else 'not installed'}")
+    with app.app_context():
+        for n in sizes:
+            df = make_frame(n)
+            print(f"\n{n:,} rows")
+            print(f"  {'format':<18}  {'encoding':<8}  {'KB':>9}  {'ms':>9}")
+            for name, encode in encoders(df):
+                t_encode, body = best(encode)
+                for encoding in encodings:
+                    t_zip, (out, used) = best(lambda: wire.compress(body, encoding))
+                    print(f"  {name:<18}  {used:<8}  {len(out) / 1024:>9.1f}  {(t_encode + t_zip) * 1e3:>9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 100_000])
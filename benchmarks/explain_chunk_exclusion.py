@@ -0,0 +1,152 @@
+"""Check that every dashboard query only touches the network_flows chunks it needs.
+
+Runs ``EXPLAIN (ANALYZE, FORMAT JSON)`` for each query the blueprints issue
+and counts the chunks actually scanned against the chunks the hypertable
+has. Needs a reachable TimescaleDB with some days of data; ``--fill DAYS``
+first inserts that many days of synthetic flows into network_flows, so only
+use it against a scratch database.
+
+    python -m benchmarks.explain_chunk_exclusion [--fill DAYS]
+"""
+import sys
+import json
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+
+from db import get_engine
+from schema import migrate
+
+# The raw-table and rollup queries behind each page, with the same filters
+QUERIES = {
+    "/data": """
+        SELECT * FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '5 minutes'
+        ORDER BY time_first DESC LIMIT 1000
+    """,
+    "/metrics timeseries": """
+        SELECT bucket, SUM(bytes) FROM flows_1m
+        WHERE bucket >= time_bucket('1 minute', NOW() - interval '30 minutes')
+        GROUP BY bucket
+    """,
+    "/metrics top talkers (no sketches)": """
+        SELECT ipv4_src_addr, SUM(in_bytes) AS total_bytes FROM network_flows
+        WHERE time_first > NOW() - interval '30 minutes'
+        GROUP BY ipv4_src_addr ORDER BY total_bytes DESC LIMIT 10
+    """,
+    "/bytes_by_direction": """
+        SELECT bucket, direction, SUM(bytes) FROM flows_30s
+        WHERE bucket >= time_bucket('30 seconds', NOW() - INTERVAL '15 minutes')
+        GROUP BY bucket, direction
+    """,
+    "/api/traffic_by_application": """
+        SELECT bucket, application_name, SUM(bytes) FROM flows_5m
+        WHERE bucket >= time_bucket('5 minutes', NOW() - INTERVAL '1 HOUR')
+          AND application_name IS NOT NULL
+        GROUP BY bucket, application_name
+    """,
+    "/api/geomap_data": """
+        SELECT ipv4_src_addr, COUNT(*), SUM(in_bytes), MIN(time_first), MAX(time_first)
+        FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '5 minutes'
+        GROUP BY ipv4_src_addr
+    """,
+    "/performance summary": """
+        SELECT COUNT(*), AVG(flow_duration_ms), STDDEV_POP(flow_duration_ms),
+               PERCENTILE_CONT(ARRAY[0.5, 0.9, 0.99]) WITHIN GROUP (ORDER BY flow_duration_ms)
+        FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '30 minutes'
+    """,
+    "/performance histogram": """
+        SELECT width_bucket(flow_duration_ms, 0, 300001, 50) AS bin, COUNT(*) FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '30 minutes'
+        GROUP BY bin
+    """,
+    "/behavior protocols": """
+        SELECT protocol, COUNT(*) FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '30 minutes'
+        GROUP BY protocol
+    """,
+    "/behavior pairs (no sketches)": """
+        SELECT ipv4_src_addr, ipv4_dst_addr, COUNT(*) AS flows FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '30 minutes'
+        GROUP BY ipv4_src_addr, ipv4_dst_addr ORDER BY flows DESC LIMIT 10
+    """,
+    "/temporal": """
+        SELECT EXTRACT(ISODOW FROM bucket), EXTRACT(HOUR FROM bucket), SUM(flows) FROM flows_1h
+        WHERE bucket >= time_bucket('1 hour', NOW() - INTERVAL '7 days')
+        GROUP BY 1, 2
+    """,
+    "/flows_with_predictions": """
+        SELECT * FROM network_flows
+        WHERE time_first > NOW() - INTERVAL '1 day'
+        ORDER BY time DESC LIMIT 100
+    """,
+}
+
+FILL_SQL = """
+    INSERT INTO network_flows (ipv4_src_addr, ipv4_dst_addr, l4_src_port, l4_dst_port,
+                               protocol, in_bytes, in_pkts, application_name,
+                               ingress_if, egress_if, direction, time, time_first, time_last)
+    SELECT '10.0.' || (i % 250) || '.' || (i % 200), '192.168.1.' || (i % 50),
+           1024 + i % 50000, 443, 6, 100 + i % 5000, 1 + i % 20, 'https',
+           1, 3, 'outbound', ts, ts, ts
+    FROM generate_series(1, :rows) AS i,
+         LATERAL (SELECT NOW() - (i * INTERVAL '1 day' * :days / :rows)) AS t(ts)
+"""
+
+
+def scanned_chunks(plan: dict) -> set:
+    """Names of chunk relations the executor actually ran a scan on."""
+    found = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        relation = node.get("Relation Name", "")
+        if relation.startswith("_hyper_") or relation.startswith("compress_hyper_"):
+            if node.get("Actual Loops", 0) > 0:
+                found.add(relation)
+        stack.extend(node.get("Plans", []))
+    return found
+
+
+def main(fill_days: int=0):
+    engine = get_engine()
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        if fill_days:
+            conn.execute(text(FILL_SQL), {"rows": fill_days * 50_000, "days": fill_days})
+        chunks = {
+            row.chunk_name: row.hypertable_name for row in conn.execute(text(
+                "SELECT hypertable_name, chunk_name FROM timescaledb_information.chunks"))
+        }
+
+    flow_chunks = {c for c, h in chunks.items() if h == "network_flows"}
+    print(f"network_flows has {len(flow_chunks)} chunks\n")
+    print(f"{'query':<30} {'flow chunks':>11} {'other chunks':>12} {'ms':>8}")
+    failures = []
+    for name, query in QUERIES.items():
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            (explained,) = conn.execute(text("EXPLAIN (ANALYZE, FORMAT JSON) " + query)).one()
+        explained = json.loads(explained) if isinstance(explained, str) else explained
+        scanned = scanned_chunks(explained[0]["Plan"])
+        raw = scanned & flow_chunks
+        print(f"{name:<30} {len(raw):>5}/{len(flow_chunks):<5} {len(scanned - raw):>12} "
+              f"{explained[0]['Execution Time']:>8.1f}")
+        # Windows here are at most 7 days, so with more chunks than that some must be skipped
+        if len(flow_chunks) > 8 and len(raw) == len(flow_chunks):
+            failures.append(name)
+
+    if failures:
+        print(f"\nNo chunk exclusion for: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nEvery query excluded the chunks outside its window")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[args.index("--fill") + 1]) if "--fill" in args else 0)
@@ -0,0 +1,64 @@
+"""Synthetic ``show flow monitor ... cache`` output for the benchmarks."""
+import numpy as np
+
+MAIN_COLUMNS = [
+    ("IPV4 SRC ADDR", 15), ("IPV4 DST ADDR", 15), ("TRNS SRC PORT", 13),
+    ("TRNS DST PORT", 13), ("IP PROT", 7), ("intf input", 10), ("intf output", 11),
+    ("bytes", 12), ("pkts", 10), ("time first", 12), ("time last", 12), ("app name", 24),
+]
+FLAG_COLUMNS = MAIN_COLUMNS[:5] + [("tcp flags", 9)]
+NUMERIC = {"TRNS SRC PORT", "TRNS DST PORT", "IP PROT", "bytes", "pkts"}
+
+INTERFACES = np.array(["Gi1", "Gi2", "Gi3", "Null"])
+APPS = np.array(["layer7 http", "layer7 ssl", "port dns", "prot icmp", "unknown"])
+
+
+def flow_fields(n: int, seed: int=0) -> dict:
+    """Random field values for ``n`` flows; same seed -> same flow keys."""
+    rng = np.random.default_rng(seed)
+    src = [f"10.{a}.{b}.{c}" for a, b, c in rng.integers(0, 255, (n, 3))]
+    dst = [f"192.168.{a}.{b}" for a, b in rng.integers(0, 255, (n, 2))]
+    secs = rng.integers(0, 86_000, n)
+    dur = rng.integers(0, 300, n)
+
+    def clock(s):
+        return [f"{x // 3600:02d}:{x // 60 % 60:02d}:{x % 60:02d}.{x % 1000:03d}" for x in s]
+
+    return {
+        "IPV4 SRC ADDR": src,
+        "IPV4 DST ADDR": dst,
+        "TRNS SRC PORT": rng.integers(1024, 65535, n).astype(str),
+        "TRNS DST PORT": rng.choice([22, 53, 80, 443, 3389], n).astype(str),
+        "IP PROT": rng.choice([1, 6, 17], n).astype(str),
+        "intf input": rng.choice(INTERFACES, n),
+        "intf output": rng.choice(INTERFACES, n),
+        "bytes": rng.integers(40, 10**8, n).astype(str),
+        "pkts": rng.integers(1, 10**5, n).astype(str),
+        "time first": clock(secs),
+        "time last": clock(secs + dur),
+        "app name": rng.choice(APPS, n),
+        "tcp flags": [f"0x{x:02X}" for x in rng.integers(0, 64, n)],
+    }
+
+
+def render_cache(fields: dict, columns=MAIN_COLUMNS) -> str:
+    lines = [
+        "  Cache type:                               Normal (Platform cache)",
+        f"  Current entries:                          {len(fields['IPV4 SRC ADDR'])}",
+        "",
+        "  ".join(h.ljust(w) for h, w in columns).rstrip(),
+        "  ".join("=" * w for _, w in columns),
+    ]
+    cells = [
+        [str(v).rjust(w) if h in NUMERIC else str(v).ljust(w) for v in fields[h]]
+        for h, w in columns
+    ]
+    lines.extend("  ".join(row).rstrip() for row in zip(*cells))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def make_caches(n: int, seed: int=0):
+    """Main and tcp-flag monitor output describing the same ``n`` flows."""
+    fields = flow_fields(n, seed)
+    return render_cache(fields, MAIN_COLUMNS), render_cache(fields, FLAG_COLUMNS)
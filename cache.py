@@ -0,0 +1,144 @@
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import current_app, request
+
+from config import get_cache_config
+from db import NotificationListener
+
+
+class ResultCache:
+    """Size-bounded LRU cache of computed results, each with its own TTL.
+
+    Concurrent misses on the same key are collapsed: the first caller
+    computes, the others wait for its result (single flight). :meth:`clear`
+    bumps a generation counter, so a computation that started before the
+    clear can't store its possibly stale result afterwards.
+    """
+
+    def __init__(self, ttl: float=60.0, max_bytes: int=64 * 2**20):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._bytes = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "clears": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any],
+                       ttl: Optional[float]=None,
+                       size: Callable[[Any], int]=lambda v: 1,
+                       cacheable: Callable[[Any], bool]=lambda v: True) -> Tuple[Any, bool]:
+        """Return ``(value, hit)`` for ``key``, computing it at most once at a time."""
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[2], True
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    done = self._inflight[key] = threading.Event()
+                    generation = self._generation
+                    self.stats["misses"] += 1
+                    break
+                self.stats["coalesced"] += 1
+            # Someone else is computing it; take their result (or retry if they failed)
+            waiting.wait()
+
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if generation == self._generation and cacheable(value):
+                self._store(key, value, size(value), self.ttl if ttl is None else ttl)
+        done.set()
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.stats["clears"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: Hashable, value: Any, nbytes: int, ttl: float):
+        if nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (time.monotonic() + ttl, nbytes, value)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.stats["evictions"] += 1
+
+
+_settings = get_cache_config()
+result_cache = ResultCache(ttl=_settings['ttl'], max_bytes=_settings['max_bytes'])
+
+
+# Response headers kept with a cached body; the rest are rebuilt per response
+CACHED_HEADERS = ("Content-Encoding", "Vary")
+
+
+def cached(ttl: Optional[float]=None, vary: Optional[Callable[[], Hashable]]=None):
+    """Cache a Flask view's successful responses, keyed by path and query string.
+
+    ``vary`` adds to the key whatever else the response depends on, such as
+    the format and encoding negotiated from request headers (utils.wire.negotiated).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            if vary is not None:
+                key += (vary(),)
+
+            def render():
+                resp = current_app.make_response(view(*args, **kwargs))
+                headers = [(h, resp.headers[h]) for h in CACHED_HEADERS if h in resp.headers]
+                return resp.status_code, resp.mimetype, resp.get_data(), headers
+
+            (status, mimetype, body, headers), hit = result_cache.get_or_compute(
+                key, render, ttl,
+                size=lambda v: len(v[2]),
+                cacheable=lambda v: v[0] == 200,
+            )
+            resp = current_app.response_class(body, status=status, mimetype=mimetype, headers=headers)
+            resp.headers["X-Cache"] = "HIT" if hit else "MISS"
+            return resp
+        return wrapper
+    return decorator
+
+
+# ======================================
+# Invalidation on committed batches
+# ======================================
+def start_invalidation_listener() -> NotificationListener:
+    """Clear the cache on every committed batch, and after each (re)connect,
+    since notifications sent while disconnected are lost."""
+    listener = NotificationListener(
+        _settings['channel'],
+        on_notify=lambda payload: result_cache.clear(),
+        on_connect=result_cache.clear,
+        name="cache-invalidation",
+    )
+    listener.start()
+    return listener
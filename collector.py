@@ -0,0 +1,199 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from config import get_inventory, validate_inventory, get_pipeline_config, get_cache_config, get_scoring_config, get_sketch_config
+from scraper import fetch_caches, build_flow_frame, write_to_csv, TSDB_ENGINE
+from session_pool import SessionPool
+from flow_writer import CopyWriter, FLOW_COLUMNS
+from pipeline import FlowPipeline, SpillBuffer
+from flow_state import FlowStateTable
+from schema import migrate
+from scoring import FlowScorer
+
+# Keys in an inventory entry that are ours rather than netmiko's
+SCHEDULE_KEYS = ("main_monitor", "flag_monitor", "interval", "timeout")
+
+MAX_BACKOFF_S = 900.0   # never wait longer than 15 min between retries
+TICK_S        = 0.5     # scheduler resolution
+
+
+@dataclass
+class DeviceState:
+    """Schedule and health of one polled device."""
+    device: Dict[str, Any]
+    next_run: float = 0.0
+    failures: int = 0
+    running: bool = False
+    last_duration: Optional[float] = None
+    last_error: Optional[str] = None
+
+    @property
+    def host(self) -> str:
+        return self.device["host"]
+
+    @property
+    def interval(self) -> float:
+        return float(self.device.get("interval", 60))
+
+    @property
+    def timeout(self) -> float:
+        return float(self.device.get("timeout", 30))
+
+    def connection_params(self) -> Dict[str, Any]:
+        params = {k: v for k, v in self.device.items() if k not in SCHEDULE_KEYS}
+        params.setdefault("conn_timeout", self.timeout)
+        params.setdefault("auth_timeout", self.timeout)
+        params.setdefault("banner_timeout", self.timeout)
+        return params
+
+
+def poll_device(state: DeviceState, pool: SessionPool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Fetch and parse both caches of one device over a pooled session."""
+    with pool.session(state.connection_params(), timeout=state.timeout) as conn:
+        return fetch_caches(
+            conn,
+            state.device["main_monitor"],
+            state.device["flag_monitor"],
+            read_timeout=state.timeout,
+        )
+
+
+class Collector:
+    """Polls many devices concurrently, each on its own schedule.
+
+    Every device gets its own ``interval``; a poll that fails is retried with
+    exponential backoff (capped at ``max_backoff``) instead of waiting for the
+    next slot, and a device that is still busy is simply skipped, so a slow or
+    unreachable router never delays the others.
+    """
+
+    def __init__(self, devices: List[Dict[str, Any]],
+                 handle_caches: Callable[[DeviceState, pd.DataFrame, pd.DataFrame], None],
+                 max_workers: Optional[int]=None,
+                 max_backoff: float=MAX_BACKOFF_S,
+                 pool: Optional[SessionPool]=None):
+        self.states = [DeviceState(device=d) for d in devices]
+        self.handle_caches = handle_caches
+        self.pool = pool or SessionPool()
+        self.max_backoff = max_backoff
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(32, len(self.states)),
+            thread_name_prefix="collector",
+        )
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # Spread the first polls over one interval so devices don't all fire at once
+        now = time.monotonic()
+        for state in self.states:
+            state.next_run = now + random.uniform(0, min(state.interval, 5.0))
+
+    def run_forever(self):
+        try:
+            while not self._stop.is_set():
+                self._dispatch_due()
+                self._stop.wait(TICK_S)
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.pool.close_all()
+
+    def stop(self):
+        self._stop.set()
+
+    def _dispatch_due(self):
+        now = time.monotonic()
+        with self._lock:
+            for state in self.states:
+                if state.running or state.next_run > now:
+                    continue
+                state.running = True
+                self.executor.submit(self._run_poll, state)
+
+    def _run_poll(self, state: DeviceState):
+        started = time.monotonic()
+        try:
+            df_main, df_flag = poll_device(state, self.pool)
+            self.handle_caches(state, df_main, df_flag)
+        except Exception as e:
+            self._finish(state, started, error=e)
+        else:
+            self._finish(state, started)
+
+    def _finish(self, state: DeviceState, started: float, error: Optional[Exception]=None):
+        now = time.monotonic()
+        with self._lock:
+            state.running = False
+            state.last_duration = now - started
+            if error is None:
+                state.failures = 0
+                state.last_error = None
+                # Stay on the device's own grid; skip slots missed by a long poll
+                state.next_run += state.interval
+                while state.next_run <= now:
+                    state.next_run += state.interval
+            else:
+                state.failures += 1
+                state.last_error = str(error)
+                backoff = min(state.interval * 2 ** (state.failures - 1), self.max_backoff)
+                state.next_run = now + backoff * random.uniform(0.8, 1.2)
+
+        if error is None:
+            print(f"[{state.host}] polled in {state.last_duration:.1f}s")
+        else:
+            print(f"[{state.host}] poll failed ({state.failures} in a row), "
+                  f"retrying in {state.next_run - now:.0f}s: {error}")
+
+
+# ======================================
+# Main loop
+# ======================================
+if __name__ == "__main__":
+    load_dotenv()
+    devices = get_inventory()
+    validate_inventory(devices)
+    migrate(TSDB_ENGINE)
+
+    settings = get_pipeline_config()
+    _csv_lock = threading.Lock()
+
+    def log_to_csv(df: pd.DataFrame):
+        # CSV appends from several enrich workers must not interleave
+        with _csv_lock:
+            write_to_csv(df[FLOW_COLUMNS])
+
+    # Per-device memory of written flows, so only new flows and deltas are stored
+    flow_states: Dict[str, FlowStateTable] = {h: FlowStateTable() for h in (d["host"] for d in devices)}
+
+    scorer = FlowScorer(**get_scoring_config())
+
+    def enrich(host: str, monitor: str, df_main: pd.DataFrame, df_flag: pd.DataFrame) -> pd.DataFrame:
+        df = build_flow_frame(df_main, df_flag, monitor)
+        new = flow_states[host].diff(df)
+        # Each written row is scored once, on the cumulative record of its flow
+        return scorer.score(new, features=df)
+
+    pipeline = FlowPipeline(
+        writer=CopyWriter(TSDB_ENGINE, notify_channel=get_cache_config()['channel'],
+                          sketches=get_sketch_config()['enabled']),
+        enrich=enrich,
+        spill=SpillBuffer(settings['spill_dir'], settings['spill_max_mb'] * 2**20),
+        queue_size=settings['queue_size'],
+        enrich_workers=settings['enrich_workers'],
+        sink_workers=settings['sink_workers'],
+        on_enriched=log_to_csv,
+    ).start()
+
+    def hand_off(state: DeviceState, df_main: pd.DataFrame, df_flag: pd.DataFrame):
+        pipeline.submit(state.host, state.device["main_monitor"], df_main, df_flag)
+
+    try:
+        Collector(devices, hand_off).run_forever()
+    finally:
+        pipeline.stop()
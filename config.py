@@ -1,5 +1,6 @@
 import os
-from typing import Dict, Any
+import json
+from typing import Dict, Any, List
 
 def get_device_config() -> Dict[str, Any]:
     """Get network device configuration from environment variables."""
@@ -20,6 +21,67 @@ def get_database_url() -> str:
     
     return f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}"
 
+def get_pool_config() -> Dict[str, int]:
+    """Get database connection pool settings from environment variables."""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'statement_timeout_ms': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '15000')),
+    }
+
+def get_cache_config() -> Dict[str, Any]:
+    """Get dashboard result cache settings from environment variables.
+
+    The TTL defaults to the poll interval: results can't change more often
+    than the collector writes, and a committed batch invalidates them anyway.
+    """
+    return {
+        'ttl': float(os.getenv('CACHE_TTL', os.getenv('POLL_INTERVAL', '60'))),
+        'max_bytes': int(os.getenv('CACHE_MAX_MB', '64')) * 2**20,
+        'channel': os.getenv('CACHE_NOTIFY_CHANNEL', 'network_flows_committed'),
+    }
+
+def get_scoring_config() -> Dict[str, Any]:
+    """Get the model used to score flows at ingest from environment variables."""
+    return {
+        'model_path': os.getenv('MODEL_PATH', os.path.join('models', 'xgb_nids_model_11.json')),
+        'encoders_path': os.getenv('ENCODERS_PATH', os.path.join('models', 'ip_encoders_11.pkl')),
+        'threshold': float(os.getenv('SCORE_THRESHOLD', '0.5')),
+        'compiled': os.getenv('SCORE_COMPILED', 'false').lower() in ('1', 'true', 'yes'),
+    }
+
+def get_alert_config() -> Dict[str, Any]:
+    """Get detector alerting settings from environment variables."""
+    return {
+        'channel': os.getenv('ALERT_CHANNEL', 'nids_alerts'),
+        'dedup_seconds': float(os.getenv('ALERT_DEDUP_SECONDS', '300')),
+        'rate_per_minute': float(os.getenv('ALERT_RATE_PER_MINUTE', '60')),
+    }
+
+def get_resource_config() -> Dict[str, Any]:
+    """Get lazily loaded file resources (see resources.py) from environment variables."""
+    return {
+        'geoip_path': os.getenv('GEOIP_PATH', os.path.join('data', 'GeoLite2-City.mmdb')),
+        'check_interval': float(os.getenv('RESOURCE_CHECK_INTERVAL', '30')),
+        'geoip_cache_entries': int(os.getenv('GEOIP_CACHE_ENTRIES', '65536')),
+    }
+
+def get_sketch_config() -> Dict[str, Any]:
+    """Get the heavy-hitter sketches written at ingest (see sketches.py) from environment variables.
+
+    Changing a size only affects sketches written afterwards; windows merge
+    the ones that match the current sizes.
+    """
+    return {
+        'enabled': os.getenv('SKETCHES_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+        'cms_width': int(os.getenv('SKETCH_CMS_WIDTH', '1024')),
+        'cms_depth': int(os.getenv('SKETCH_CMS_DEPTH', '4')),
+        'top_k': int(os.getenv('SKETCH_TOP_K', '100')),
+        'hll_precision': int(os.getenv('SKETCH_HLL_PRECISION', '12')),
+    }
+
 def get_monitor_config() -> Dict[str, str]:
     """Get flow monitor configuration from environment variables."""
     return {
@@ -27,6 +89,38 @@ def get_monitor_config() -> Dict[str, str]:
         'flag_monitor': os.getenv('FLAG_MONITOR', 'dat_Gi1_885011376')
     }
 
+def get_inventory() -> List[Dict[str, Any]]:
+    """Get the list of devices to poll.
+
+    Reads the JSON file named by INVENTORY_FILE (a list of device objects).
+    Credentials, monitors and schedule fall back to the single-device
+    environment variables, so an entry can be as small as ``{"host": "..."}``.
+    Without an inventory file the single device from get_device_config() is used.
+    """
+    defaults = {
+        **get_device_config(),
+        **get_monitor_config(),
+        'interval': float(os.getenv('POLL_INTERVAL', '60')),
+        'timeout': float(os.getenv('POLL_TIMEOUT', '30')),
+    }
+    path = os.getenv('INVENTORY_FILE')
+    if not path:
+        return [defaults]
+
+    with open(path) as fh:
+        entries = json.load(fh)
+    return [{**defaults, **entry} for entry in entries]
+
+def get_pipeline_config() -> Dict[str, Any]:
+    """Get collector pipeline sizing from environment variables."""
+    return {
+        'queue_size': int(os.getenv('PIPELINE_QUEUE_SIZE', '8')),
+        'enrich_workers': int(os.getenv('PIPELINE_ENRICH_WORKERS', '2')),
+        'sink_workers': int(os.getenv('PIPELINE_SINK_WORKERS', '1')),
+        'spill_dir': os.getenv('PIPELINE_SPILL_DIR', 'spill'),
+        'spill_max_mb': int(os.getenv('PIPELINE_SPILL_MAX_MB', '1024')),
+    }
+
 def validate_config():
     """Validate that required environment variables are set."""
     required_vars = [
@@ -40,3 +134,13 @@ def validate_config():
     
     if missing_vars:
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+def validate_inventory(devices: List[Dict[str, Any]]):
+    """Validate that every inventory entry can be connected to."""
+    if not os.getenv('DB_PASSWORD'):
+        raise ValueError("Missing required environment variables: DB_PASSWORD")
+
+    for idx, device in enumerate(devices):
+        missing = [k for k in ('host', 'username', 'password') if not device.get(k)]
+        if missing:
+            raise ValueError(f"Inventory entry {idx} is missing: {', '.join(missing)}")
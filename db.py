@@ -0,0 +1,192 @@
+import time
+import select
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from config import get_database_url, get_pool_config
+
+load_dotenv()
+
+LISTEN_RETRY_S = 5.0
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+class PoolMetrics:
+    """Counters fed by pool events; read with :meth:`snapshot`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.waits = 0                 # checkouts that found the pool at capacity
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.invalidated = 0
+        self._born: Dict[int, float] = {}   # id(connection record) -> connect time
+
+    def on_connect(self, dbapi_conn, record):
+        with self._lock:
+            self.connects += 1
+            self._born[id(record)] = time.monotonic()
+
+    def on_close(self, dbapi_conn, record):
+        with self._lock:
+            self._born.pop(id(record), None)
+
+    def on_checkout(self, dbapi_conn, record, proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def on_invalidate(self, dbapi_conn, record, exception):
+        with self._lock:
+            self.invalidated += 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - born for born in self._born.values()]
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 3),
+                "wait_seconds_max": round(self.max_wait_seconds, 3),
+                "invalidated": self.invalidated,
+                "open_connections": len(ages),
+                "oldest_connection_age_s": round(max(ages), 1) if ages else 0.0,
+                "mean_connection_age_s": round(sum(ages) / len(ages), 1) if ages else 0.0,
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times checkouts made while every connection is in use."""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        capacity = self.size() + max(self._max_overflow, 0)
+        if self._max_overflow < 0 or self.checkedout() < capacity or self.metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+def create_pooled_engine(url: str=None, settings: Dict[str, int]=None) -> Engine:
+    """Build an engine with the configured pool size, overflow and statement timeout."""
+    settings = settings or get_pool_config()
+    metrics = PoolMetrics()
+    engine = create_engine(
+        url or get_database_url(),
+        poolclass=MeteredQueuePool,
+        pool_size=settings['pool_size'],
+        max_overflow=settings['max_overflow'],
+        pool_timeout=settings['pool_timeout'],
+        pool_recycle=settings['pool_recycle'],
+        pool_pre_ping=True,
+        connect_args={'options': f"-c statement_timeout={settings['statement_timeout_ms']}"},
+    )
+    engine.pool.metrics = metrics
+    event.listen(engine.pool, "connect", metrics.on_connect)
+    event.listen(engine.pool, "close", metrics.on_close)
+    event.listen(engine.pool, "checkout", metrics.on_checkout)
+    event.listen(engine.pool, "invalidate", metrics.on_invalidate)
+    return engine
+
+
+def get_engine() -> Engine:
+    """The application-wide engine, created on first use and shared by every blueprint."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_pooled_engine()
+    return _engine
+
+
+def pool_status() -> Dict[str, Any]:
+    """Pool occupancy plus the event counters, for the /health/db endpoint."""
+    if _engine is None:
+        return {"engine": "not created"}
+    pool = _engine.pool
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    status.update(pool.metrics.snapshot())
+    return status
+
+
+def dispose_engine():
+    """Close every pooled connection, e.g. after forking a worker process."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+class NotificationListener(threading.Thread):
+    """LISTENs on a channel and hands each NOTIFY payload to ``on_notify``.
+
+    Uses a connection detached from the shared pool, so it never holds a
+    slot the request handlers need, and reconnects after errors.
+    ``on_connect`` runs after every (re)connect, for callers that need to
+    catch up on notifications missed while disconnected.
+    """
+
+    def __init__(self, channel: str, on_notify: Callable[[str], None],
+                 on_connect: Optional[Callable[[], None]]=None, name: str=None):
+        super().__init__(name=name or f"listen-{channel}", daemon=True)
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                raw = get_engine().raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                if self.on_connect is not None:
+                    self.on_connect()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.on_notify(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Listener on {self.channel} failed: {e}")
+                self._stop.wait(LISTEN_RETRY_S)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
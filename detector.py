@@ -0,0 +1,186 @@
+import json
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from config import get_alert_config, get_cache_config, get_scoring_config
+from db import get_engine, NotificationListener
+from scoring import FlowScorer, MALICIOUS
+
+CATCH_UP = pd.Timedelta(minutes=10)   # ingested this recently: re-checked after every (re)connect
+MAX_ROWS_PER_BATCH = 10_000
+
+ALERT_QUERY = f"""
+    SELECT ipv4_src_addr, ipv4_dst_addr, l4_src_port, l4_dst_port, protocol,
+           tcp_flags, in_bytes, in_pkts, flow_duration_ms, bytes_per_second,
+           avg_throughput_bps, application_name, flow_monitor, time, time_first,
+           ml_probability, ml_label, model_version
+    FROM network_flows
+    WHERE ingested_at BETWEEN :lo AND :hi{{time_first}}
+      AND (ml_label = '{MALICIOUS}' OR ml_label IS NULL)
+    ORDER BY ml_probability DESC NULLS FIRST
+    LIMIT {MAX_ROWS_PER_BATCH}
+"""
+# One committed batch: its ingested_at, with its time_first range so only
+# the chunks it wrote to are searched
+BATCH_QUERY = text(ALERT_QUERY.format(time_first=" AND time_first BETWEEN :first_lo AND :first_hi"))
+# Everything ingested in a time range, whatever its time_first
+INGESTED_QUERY = text(ALERT_QUERY.format(time_first=""))
+
+
+class AlertGate:
+    """Decides which malicious verdicts become alerts.
+
+    * dedup: one alert per (src, dst, dst port, protocol) per ``dedup_seconds``;
+    * rate limit: a token bucket of ``rate_per_minute`` alerts, bursting to
+      the same amount. Alerts over the limit are counted, and the count is
+      reported on the next alert that gets through.
+    """
+
+    def __init__(self, dedup_seconds: float=300.0, rate_per_minute: float=60.0):
+        self.dedup_seconds = dedup_seconds
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(rate_per_minute, 1.0)
+        self.tokens = self.burst
+        self.suppressed = 0
+        self._seen: Dict[Hashable, float] = {}
+        self._last = time.monotonic()
+
+    def admit(self, key: Hashable, now: Optional[float]=None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self._last) * self.rate)
+        self._last = now
+        if len(self._seen) > 100_000:
+            self._seen = {k: t for k, t in self._seen.items() if now - t < self.dedup_seconds}
+
+        seen = self._seen.get(key)
+        if seen is not None and now - seen < self.dedup_seconds:
+            return False
+        if self.tokens < 1:
+            self.suppressed += 1
+            return False
+        self.tokens -= 1
+        self._seen[key] = now
+        return True
+
+    def take_suppressed(self) -> int:
+        count, self.suppressed = self.suppressed, 0
+        return count
+
+
+def alert_payload(row: pd.Series, suppressed: int) -> str:
+    return json.dumps({
+        "src": row["ipv4_src_addr"], "dst": row["ipv4_dst_addr"],
+        "src_port": _int(row["l4_src_port"]), "dst_port": _int(row["l4_dst_port"]),
+        "protocol": _int(row["protocol"]),
+        "application": row["application_name"], "flow_monitor": row["flow_monitor"],
+        "in_bytes": _int(row["in_bytes"]), "in_pkts": _int(row["in_pkts"]),
+        "probability": round(float(row["ml_probability"]), 4),
+        "model_version": row["model_version"],
+        "time_first": pd.Timestamp(row["time_first"]).isoformat(),
+        "time": None if pd.isna(row["time"]) else pd.Timestamp(row["time"]).isoformat(),
+        "suppressed_before": suppressed,
+    })
+
+
+def _int(value) -> Optional[int]:
+    return None if pd.isna(value) else int(value)
+
+
+class Detector:
+    """Turns each committed batch into alerts within seconds of the scrape.
+
+    Listens on the collector's commit channel; every notification carries
+    the batch's ``ingested_at`` and time_first range, and the malicious
+    flows of that batch (and only those: delta rows of older flows were
+    checked with their own batches) are pushed through the
+    :class:`AlertGate` and published with ``NOTIFY`` on the alert channel,
+    where the web app relays them to browsers. Rows the collector couldn't
+    score are scored here with the same model, once, with their batch.
+    """
+
+    def __init__(self, scorer: FlowScorer, gate: AlertGate, alert_channel: str):
+        self.scorer = scorer
+        self.gate = gate
+        self.alert_channel = alert_channel
+        self.stats = {"batches": 0, "flagged": 0, "published": 0}
+
+    def on_batch(self, payload: str):
+        try:
+            batch = json.loads(payload)
+        except ValueError:
+            return
+        if batch.get("ingested_at") and batch.get("time_first_min") and batch.get("time_first_max"):
+            ingested_at = pd.Timestamp(batch["ingested_at"]).to_pydatetime()
+            self.check(BATCH_QUERY, {"lo": ingested_at, "hi": ingested_at,
+                                     "first_lo": pd.Timestamp(batch["time_first_min"]).to_pydatetime(),
+                                     "first_hi": pd.Timestamp(batch["time_first_max"]).to_pydatetime()})
+
+    def catch_up(self):
+        now = pd.Timestamp.now(tz="UTC")
+        self.check(INGESTED_QUERY, {"lo": (now - CATCH_UP).to_pydatetime(), "hi": now.to_pydatetime()})
+
+    def check(self, query, params: dict):
+        start = time.perf_counter()
+        with get_engine().connect() as conn:
+            df = pd.read_sql(query, conn, params=params)
+        self.stats["batches"] += 1
+
+        unscored = df["ml_label"].isna()
+        if unscored.any():
+            scored = self.scorer.score(df[unscored].drop(columns=["ml_probability", "ml_label", "model_version"]))
+            if "ml_label" in scored:
+                df = pd.concat([df[~unscored], scored])
+            else:
+                df = df[~unscored]
+        df = df[df["ml_label"] == MALICIOUS].sort_values("ml_probability", ascending=False)
+        self.stats["flagged"] += len(df)
+
+        payloads = self._admit(df)
+        if payloads:
+            self._publish(payloads)
+            print(f"Published {len(payloads)} alert(s) for {len(df)} malicious flow(s) "
+                  f"in {time.perf_counter() - start:.2f}s")
+
+    def _admit(self, df: pd.DataFrame) -> List[str]:
+        payloads = []
+        for _, row in df.iterrows():
+            key: Tuple = (row["ipv4_src_addr"], row["ipv4_dst_addr"],
+                          _int(row["l4_dst_port"]), _int(row["protocol"]))
+            if self.gate.admit(key):
+                payloads.append(alert_payload(row, self.gate.take_suppressed()))
+        return payloads
+
+    def _publish(self, payloads: List[str]):
+        with get_engine().begin() as conn:
+            for payload in payloads:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": self.alert_channel, "payload": payload})
+        self.stats["published"] += len(payloads)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    alerts = get_alert_config()
+    detector = Detector(
+        scorer=FlowScorer(**get_scoring_config()),
+        gate=AlertGate(alerts['dedup_seconds'], alerts['rate_per_minute']),
+        alert_channel=alerts['channel'],
+    )
+    # Batches and catch-up run one at a time on the listener thread
+    listener = NotificationListener(
+        get_cache_config()['channel'],
+        on_notify=detector.on_batch,
+        on_connect=detector.catch_up,
+        name="detector",
+    )
+    listener.start()
+    print(f"Detector listening for committed batches, alerting on '{alerts['channel']}'")
+    try:
+        while listener.is_alive():
+            listener.join(1.0)
+    except KeyboardInterrupt:
+        listener.stop()
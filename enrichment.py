@@ -0,0 +1,119 @@
+import datetime as dt
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pytz
+
+IF_MAP = {"Gi1": 1, "Gi2": 2, "Gi3": 3, "Null": 0}
+DUBAI_TZ = pytz.timezone("Asia/Dubai")
+CLOCK_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def compute_direction(ing: int, egr: int) -> str:
+    if ing == 0 and egr in (1,2,3):           return 'local-origin'
+    if ing in (1,2) and egr == 3:            return 'outbound'
+    if ing == 3 and egr in (1,2):            return 'inbound'
+    if ing in (1,2) and egr in (1,2) and ing != egr:
+        return 'lateral'
+    if egr == 0:                             return 'dropped'
+    return 'unknown'
+
+# ======================================
+# Vectorized steps
+# ======================================
+def direction_table(size: int) -> np.ndarray:
+    """``table[ing, egr]`` holds compute_direction(ing, egr) for 0 <= ing, egr < size."""
+    return np.array(
+        [[compute_direction(i, e) for e in range(size)] for i in range(size)],
+        dtype=object,
+    )
+
+_DIRECTIONS = direction_table(max(IF_MAP.values()) + 1)
+
+def compute_directions(ingress: np.ndarray, egress: np.ndarray) -> np.ndarray:
+    """compute_direction for whole columns by indexing a lookup table."""
+    ingress = np.asarray(ingress, dtype=np.int64)
+    egress = np.asarray(egress, dtype=np.int64)
+    table = _DIRECTIONS
+    if len(ingress) and (ingress.min() < 0 or egress.min() < 0):
+        raise ValueError("Interface indexes must be non-negative")
+    top = max(ingress.max(initial=0), egress.max(initial=0)) + 1
+    if top > len(table):
+        table = direction_table(top)
+    return table[ingress, egress]
+
+def _hex_or_nan(value) -> float:
+    if not (isinstance(value, str) and value.startswith("0x")):
+        return np.nan
+    try:
+        return int(value, 16)
+    except ValueError:                   # "0x", "0xZZ"...
+        return np.nan
+
+def decode_hex_flags(flags: pd.Series) -> pd.Series:
+    """``"0x1B"`` -> 27 for a whole column; anything else becomes NA.
+
+    Flag columns hold only a handful of distinct values, so each unique
+    string is decoded once and the result broadcast back.
+    """
+    if pd.api.types.is_numeric_dtype(flags):
+        return flags
+    codes, uniques = pd.factorize(flags)
+    decoded = np.array(
+        [_hex_or_nan(u) for u in uniques] + [np.nan],   # slot for code -1 (missing)
+        dtype=np.float64,
+    )
+    values = pd.Series(decoded[codes], index=flags.index)
+    return values.astype("Int64")
+
+def parse_clock(today: str, clock: pd.Series) -> pd.Series:
+    """Device ``HH:MM:SS.fff`` clock strings -> naive datetimes on ``today``."""
+    stamps = today + " " + clock
+    try:
+        return pd.to_datetime(stamps, format=CLOCK_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(stamps)
+
+def add_times_and_rates(df: pd.DataFrame, today: str=None) -> pd.DataFrame:
+    """Timestamps, duration and both rates in one vectorized pass."""
+    today = today or dt.date.today().isoformat()
+    first = parse_clock(today, df["time_first"])
+    last  = parse_clock(today, df["time_last"])
+    last  = last.where(last>=first, last + pd.Timedelta(days=1))
+
+    dur_ms = (last - first).dt.total_seconds() * 1000
+    dur_s  = dur_ms / 1000.0
+    moving = dur_s.where(dur_s != 0)          # NaN where the flow has no duration
+    in_bytes = df["in_bytes"].astype(np.float64)
+
+    df["time_first"]         = first.dt.tz_localize("UTC").dt.tz_convert(DUBAI_TZ)
+    df["time_last"]          = last.dt.tz_localize("UTC").dt.tz_convert(DUBAI_TZ)
+    df["flow_duration_ms"]   = dur_ms
+    df["bytes_per_second"]   = (in_bytes / moving).where(dur_s != 0, 0.0)
+    df["avg_throughput_bps"] = (in_bytes * 8 / moving).where(dur_s != 0, 0.0)
+    return df
+
+def map_interfaces(names: pd.Series, if_map: Dict[str, int]=IF_MAP) -> np.ndarray:
+    return names.map(if_map).fillna(0).astype(int).to_numpy()
+
+def enrich_flows(df: pd.DataFrame, monitor: str, today: str=None) -> pd.DataFrame:
+    """Steps 7-11 of the scrape: casts, times and rates, interfaces, direction."""
+    # 7) Cast bytes/packets and tcp_flags
+    df["in_bytes"]  = pd.to_numeric(df["in_bytes"], errors="coerce")
+    df["in_pkts"]   = pd.to_numeric(df["in_pkts"],  errors="coerce")
+    df["tcp_flags"] = decode_hex_flags(df["tcp_flags"])
+
+    # 8) Timestamps, durations & rates
+    add_times_and_rates(df, today)
+
+    # 9) Scrape timestamp
+    df["time"] = df["time_last"]
+
+    # 10) Interfaces & direction
+    df["ingress_if"] = map_interfaces(df["intf_input"])
+    df["egress_if"]  = map_interfaces(df["intf_output"])
+    df["direction"]  = compute_directions(df["ingress_if"].to_numpy(), df["egress_if"].to_numpy())
+
+    # 11) Tag monitor
+    df["flow_monitor"] = monitor
+    return df
@@ -0,0 +1,145 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# A flow's 5-tuple packed into two unsigned 64-bit words:
+#   addrs = src_ip << 32 | dst_ip
+#   ports = src_port << 24 | dst_port << 8 | protocol
+FLOW_KEY_DTYPE = np.dtype([("addrs", "<u8"), ("ports", "<u8")])
+KEY_COLUMNS = ["ipv4_src_addr","ipv4_dst_addr","l4_src_port","l4_dst_port","protocol"]
+
+
+def ipv4_to_uint32(addrs: Sequence) -> np.ndarray:
+    """Dotted-quad strings -> host-order uint32, for a whole column at once.
+
+    Distinct addresses are parsed once; their raw bytes are scanned in
+    parallel one character position at a time. Anything that isn't a
+    well-formed dotted quad maps to 0, the same fallback ``ip_to_int`` uses.
+    """
+    codes, uniques = pd.factorize(np.asarray(addrs, dtype=object), use_na_sentinel=True)
+    parsed = np.append(parse_dotted_quads(np.asarray(uniques, dtype=object)), np.uint32(0))
+    return parsed[codes]          # code -1 (missing) picks the trailing 0
+
+
+def parse_dotted_quads(addrs: np.ndarray) -> np.ndarray:
+    """Element-wise dotted-quad -> uint32 for str/bytes arrays (invalid -> 0)."""
+    n = len(addrs)
+    if addrs.dtype.kind == "S" and addrs.itemsize <= 16:
+        raw = addrs.astype("S16")
+    else:
+        try:
+            raw = addrs.astype("S16")
+        except UnicodeEncodeError:
+            raw = np.array([a.encode("ascii", "replace") if isinstance(a, str) else b""
+                            for a in addrs], dtype="S16")
+    # One contiguous row per character position
+    positions = np.ascontiguousarray(raw.view(np.uint8).reshape(n, 16).T)
+
+    addr   = np.zeros(n, dtype=np.uint32)
+    octet  = np.zeros(n, dtype=np.uint32)
+    digits = np.zeros(n, dtype=np.uint8)
+    dots   = np.zeros(n, dtype=np.uint8)
+    bad    = np.zeros(n, dtype=bool)
+    for c in positions:
+        if not c.any():
+            break
+        d = c - np.uint8(48)                   # wraps around for non-digits
+        is_digit = d < 10
+        is_dot = c == 46
+        bad |= ~(is_digit | is_dot | (c == 0))
+        octet = octet * np.where(is_digit, 10, 1).astype(np.uint32) + np.where(is_digit, d, 0)
+        digits += is_digit
+        bad |= digits > 3
+        if is_dot.any():
+            # A dot closes the current octet
+            bad |= is_dot & ((digits == 0) | (octet > 255))
+            addr = np.where(is_dot, (addr << 8) | octet, addr)
+            octet[is_dot] = 0
+            digits[is_dot] = 0
+            dots += is_dot
+
+    bad |= (dots != 3) | (digits == 0) | (octet > 255)
+    addr = (addr << 8) | octet
+    addr[bad] = 0
+    return addr
+
+
+def _addresses(df: pd.DataFrame, column: str) -> np.ndarray:
+    # Prefer the packed copy flow_parser emits next to each address column
+    packed = df.get(column + "_u32")
+    if packed is None:
+        packed = ipv4_to_uint32(df[column])
+    return np.asarray(packed, dtype=np.uint64)
+
+
+def _as_uint(values, bits: int) -> np.ndarray:
+    """Numeric column -> uint64, with NaN/out-of-range marked by -1 (all ones)."""
+    num = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    ok = ~np.isnan(num) & (num >= 0) & (num < 2 ** bits)
+    out = np.full(len(num), np.iinfo(np.uint64).max, dtype=np.uint64)
+    out[ok] = num[ok].astype(np.uint64)
+    return out
+
+
+def flow_keys(df: pd.DataFrame) -> np.ndarray:
+    """Pack the 5-tuple of every row of ``df`` into a FLOW_KEY_DTYPE array.
+
+    Packed ``<address>_u32`` columns are used when present. Rows with a
+    missing or malformed field get the all-ones key in ``ports``,
+    which no real flow can produce; see :func:`valid_keys`.
+    """
+    keys = np.empty(len(df), dtype=FLOW_KEY_DTYPE)
+    src = _addresses(df, "ipv4_src_addr")
+    dst = _addresses(df, "ipv4_dst_addr")
+    keys["addrs"] = src << np.uint64(32) | dst
+
+    sport = _as_uint(df["l4_src_port"], 16)
+    dport = _as_uint(df["l4_dst_port"], 16)
+    proto = _as_uint(df["protocol"], 8)
+    bad = (sport == np.iinfo(np.uint64).max) | (dport == np.iinfo(np.uint64).max) \
+        | (proto == np.iinfo(np.uint64).max)
+    ports = sport << np.uint64(24) | dport << np.uint64(8) | proto
+    ports[bad] = np.iinfo(np.uint64).max
+    keys["ports"] = ports
+    return keys
+
+
+def valid_keys(keys: np.ndarray) -> np.ndarray:
+    return keys["ports"] != np.iinfo(np.uint64).max
+
+
+def flow_ids(*key_arrays: np.ndarray) -> Sequence[np.ndarray]:
+    """Dense int64 ids for the keys, consistent across all given arrays.
+
+    Equal flows get equal ids, so the result can be fed to any hash-based
+    pandas/NumPy routine (``Index``, ``unique``, ``bincount``...).
+    """
+    keys = np.concatenate(key_arrays)
+    hi, hi_uniq = pd.factorize(keys["addrs"])
+    lo, lo_uniq = pd.factorize(keys["ports"])
+    ids = hi.astype(np.int64) * len(lo_uniq) + lo
+    bounds = np.cumsum([len(k) for k in key_arrays])[:-1]
+    return np.split(ids, bounds)
+
+
+def hash_join(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """For each key in ``left``, the position of its match in ``right`` or -1.
+
+    This is a left join on the flow key: ``right`` is hashed once and probed
+    with every left key. If a key occurs more than once in ``right`` the last
+    occurrence wins, so each left row matches at most one right row.
+    """
+    left_ids, right_ids = flow_ids(left, right)
+    keep = ~pd.Index(right_ids).duplicated(keep="last") & valid_keys(right)
+    positions = np.append(np.flatnonzero(keep), -1)
+    matched = pd.Index(right_ids[keep]).get_indexer(left_ids)
+    indexer = positions[matched]  # -1 (no match) picks the trailing -1
+    indexer[~valid_keys(left)] = -1
+    return indexer
+
+
+def duplicated_flows(keys: np.ndarray, keep: str="last") -> np.ndarray:
+    """Boolean mask of rows whose flow key already occurs elsewhere."""
+    (ids,) = flow_ids(keys)
+    return pd.Index(ids).duplicated(keep=keep)
@@ -0,0 +1,203 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from flow_key import parse_dotted_quads
+
+HEADER_MARKER = "IPV4 SRC ADDR"
+_SPLIT = re.compile(r"\s{2,}")        # header cells are separated by 2+ spaces
+_RULE  = re.compile(r"[=\-]+")        # the ===== line under the header
+
+# Typed columns, by normalized header name; everything else stays text
+INT_COLUMNS = {
+    "trns_src_port", "trns_dst_port", "ip_prot", "ip_tos",
+    "bytes", "pkts", "bytes_long", "pkts_long",
+}
+HEX_COLUMNS = {"tcp_flags"}
+# Address columns additionally get a packed uint32 copy named <column>_u32
+IP_COLUMNS  = {"ipv4_src_addr", "ipv4_dst_addr"}
+IP_SUFFIX   = "_u32"
+
+
+def normalize_header(name: str) -> str:
+    return name.lower().replace(" ", "_")
+
+
+def column_spans(header: str, rule: Optional[str]) -> List[Tuple[int, int]]:
+    """Fixed-width [start, end) offsets of every column.
+
+    The ``=====`` rule printed under the header gives the exact field widths;
+    when it is missing we fall back to where each header cell starts.
+    """
+    if rule is not None and rule.strip() and not rule.replace("=", "").replace("-", "").strip():
+        starts = [m.start() for m in _RULE.finditer(rule)]
+    else:
+        starts = [m.start() for m in re.finditer(r"(?:^|(?<=\s{2}))\S", header)]
+    ends = starts[1:] + [None]
+    return list(zip(starts, ends))
+
+
+class FlowCacheParser:
+    """Streaming parser for ``show flow monitor <name> cache`` output.
+
+    Text can be fed in arbitrary chunks as it is read off the SSH channel.
+    Column offsets are worked out once from the header; data lines are only
+    buffered, and :meth:`close` slices every field for all rows at once out of
+    a single fixed-width byte matrix, producing one typed array per column
+    (ints, hex flags decoded to ints, text) without building per-row dicts.
+    IPv4 address columns also come back packed as uint32 (``<name>_u32``).
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._start: Optional[int] = None        # offset of the first column
+        self._header: Optional[str] = None
+        self.headers: List[str] = []
+        self._spans: List[Tuple[int, int]] = []
+        self._lines: List[str] = []
+        self._done = False
+
+    def feed(self, text: str):
+        if self._done:
+            return
+        self._pending += text
+        *complete, self._pending = self._pending.split("\n")
+
+        # Preamble, header and rule line by line ...
+        idx = 0
+        while idx < len(complete) and not self._spans and not self._done:
+            self._consume(complete[idx].rstrip("\r"))
+            idx += 1
+        if self._done or idx == len(complete):
+            return
+
+        # ... then the data rows in bulk, up to the blank line that ends the table
+        start = self._start
+        parts = [ln[start:].rstrip() for ln in complete[idx:]]
+        try:
+            end = parts.index("")
+            self._done = True
+        except ValueError:
+            end = len(parts)
+        self._lines.extend(parts[:end])
+
+    def close(self, flush_partial: bool=True) -> pd.DataFrame:
+        """Finish parsing and return the flows as a DataFrame.
+
+        ``flush_partial=False`` drops a trailing unterminated line, which is
+        how the device prompt arrives when reading straight off the channel.
+        """
+        if flush_partial and self._pending:
+            self._consume(self._pending.rstrip("\r"))
+        self._pending = ""
+        self._done = True
+        if self._header is None:
+            raise RuntimeError("Header not found in flow output")
+        return pd.DataFrame(self.columns())
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        n = len(self._lines)
+        if n == 0:
+            cols = {h: np.array([], dtype=object) for h in self.headers}
+            cols.update({h + IP_SUFFIX: np.array([], dtype=np.uint32)
+                         for h in self.headers if h in IP_COLUMNS})
+            return cols
+
+        width = max(max(len(ln) for ln in self._lines), self._spans[-1][0] + 1)
+        blob = "".join([ln.ljust(width) for ln in self._lines]).encode("latin-1", "replace")
+        matrix = np.frombuffer(blob, dtype="S1").reshape(n, width)
+
+        cols = {}
+        for name, (a, b) in zip(self.headers, self._spans):
+            b = width if b is None else b
+            field = np.ascontiguousarray(matrix[:, a:b]).view(f"S{b - a}").ravel()
+            field = np.char.strip(field)
+            cols[name] = _decode_column(name, field)
+            if name in IP_COLUMNS:
+                cols[name + IP_SUFFIX] = parse_dotted_quads(field)
+        return cols
+
+    def _consume(self, line: str):
+        if self._start is None:
+            if HEADER_MARKER in line:
+                self._start = line.index(HEADER_MARKER)
+                self._header = line[self._start:].rstrip()
+                self.headers = [normalize_header(h) for h in _SPLIT.split(self._header.strip())]
+            return
+        part = line[self._start:].rstrip()
+        if not self._spans:
+            # First line after the header is the ===== rule (or, rarely, data)
+            self._spans = column_spans(self._header, part)
+            if len(self._spans) != len(self.headers):
+                self._spans = column_spans(self._header, None)
+            if _RULE.fullmatch(part.replace(" ", "")):
+                return
+        if not part:
+            self._done = True
+            return
+        self._lines.append(part)
+
+
+def _decode_column(name: str, raw: np.ndarray) -> np.ndarray:
+    blank = raw == b""
+    if name in INT_COLUMNS:
+        try:
+            values = np.where(blank, b"0", raw).astype(np.int64)
+        except ValueError:
+            values = pd.to_numeric(pd.Series(raw).str.decode("latin-1"), errors="coerce").to_numpy()
+            return values
+        return np.where(blank, np.nan, values) if blank.any() else values
+    if name in HEX_COLUMNS:
+        # Few distinct flag values: decode the uniques and scatter back
+        uniq, inverse = np.unique(raw, return_inverse=True)
+        decoded = np.array([_hex_or_nan(u) for u in uniq], dtype=np.float64)[inverse]
+        return decoded.astype(np.int64) if not np.isnan(decoded).any() else decoded
+    text = raw.astype(f"U{max(raw.itemsize, 1)}").astype(object)
+    text[blank] = None
+    return text
+
+
+def _hex_or_nan(value: bytes) -> float:
+    if value.startswith(b"0x"):
+        try:
+            return int(value, 16)
+        except ValueError:
+            pass
+    return np.nan
+
+
+def parse_flow_cache(raw: str) -> pd.DataFrame:
+    """Parse a complete cache dump already held in memory."""
+    parser = FlowCacheParser()
+    parser.feed(raw)
+    return parser.close()
+
+
+def stream_command(conn, command: str, read_timeout: float=10.0) -> pd.DataFrame:
+    """Run ``command`` on a netmiko session, parsing output as it arrives.
+
+    Output is fed to a :class:`FlowCacheParser` chunk by chunk instead of
+    being accumulated into one string first. ``read_timeout`` is the longest
+    the device may stay silent before we give up.
+    """
+    prompt = re.compile(re.escape(conn.base_prompt) + r"[>#]\s*$")
+    parser = FlowCacheParser()
+    tail = ""
+    conn.write_channel(conn.normalize_cmd(command))
+    deadline = time.monotonic() + read_timeout
+    while True:
+        chunk = conn.read_channel()
+        if chunk:
+            parser.feed(chunk)
+            tail = (tail + chunk)[-256:]
+            if prompt.search(tail):
+                break
+            deadline = time.monotonic() + read_timeout
+        elif time.monotonic() > deadline:
+            raise TimeoutError(f"No prompt after '{command}' within {read_timeout}s")
+        else:
+            time.sleep(0.02)
+    return parser.close(flush_partial=False)
@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from flow_key import flow_keys, valid_keys
+
+DAY_NS = 86_400 * 10**9
+MAX_MISSED_POLLS = 2   # evict flows absent from this many consecutive caches
+
+
+class FlowStateTable:
+    """Remembers what was already written for each flow in a device's cache.
+
+    The router's cache reports cumulative ``bytes``/``pkts`` for as long as a
+    flow stays in it, so writing every entry on every poll inserts long-lived
+    flows again and again. :meth:`diff` compares a freshly enriched frame with
+    the previous polls and keeps only
+
+    * flows seen for the first time, with their full counters, and
+    * known flows whose counters grew, with ``in_bytes``/``in_pkts`` replaced
+      by the growth since the last poll.
+
+    A flow is identified by its packed 5-tuple plus ``time_first``, so a new
+    flow reusing the same ports is not mistaken for the old one. Only the
+    time of day of ``time_first`` is used, because the scraper dates device
+    clock times with the current date and that shifts at midnight. Flows
+    missing from ``max_missed`` consecutive caches have aged out on the
+    device and are forgotten.
+    """
+
+    def __init__(self, max_missed: int=MAX_MISSED_POLLS):
+        self.max_missed = max_missed
+        self._state = self._empty()
+        self._poll = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def diff(self, df: pd.DataFrame) -> pd.DataFrame:
+        if df.empty:
+            with self._lock:
+                self._poll += 1
+                self._evict()
+            return df
+
+        keys = flow_keys(df)
+        first = pd.DatetimeIndex(df["time_first"]).as_unit("ns").asi8 % DAY_NS
+        index = pd.MultiIndex.from_arrays([keys["addrs"], keys["ports"], first],
+                                          names=["addrs", "ports", "first"])
+        in_bytes = pd.to_numeric(df["in_bytes"], errors="coerce").fillna(0).to_numpy(np.int64)
+        in_pkts  = pd.to_numeric(df["in_pkts"],  errors="coerce").fillna(0).to_numpy(np.int64)
+
+        # Rows we can't identify are always passed through, as before
+        identifiable = valid_keys(keys) & ~index.duplicated(keep="last")
+
+        with self._lock:
+            self._poll += 1
+            pos = self._state.index.get_indexer(index)
+            known = (pos >= 0) & identifiable
+            # -1 (unknown) reindexes to NaN, masked out by `known` anyway
+            prev_bytes = np.where(known, self._previous("bytes", pos), 0).astype(np.int64)
+            prev_pkts  = np.where(known, self._previous("pkts", pos), 0).astype(np.int64)
+
+            # A counter that went backwards means the entry was recycled: start over
+            reset = known & ((in_bytes < prev_bytes) | (in_pkts < prev_pkts))
+            prev_bytes[reset] = 0
+            prev_pkts[reset] = 0
+            d_bytes = in_bytes - prev_bytes
+            d_pkts  = in_pkts - prev_pkts
+            emit = ~identifiable | ~known | reset | (d_bytes > 0) | (d_pkts > 0)
+
+            seen = pd.DataFrame(
+                {"bytes": in_bytes[identifiable], "pkts": in_pkts[identifiable],
+                 "seen": self._poll},
+                index=index[identifiable],
+            )
+            stale = self._state.index.isin(seen.index)
+            self._state = pd.concat([self._state[~stale], seen])
+            self._evict()
+
+        out = df[emit].copy()
+        out["in_bytes"] = d_bytes[emit]
+        out["in_pkts"]  = d_pkts[emit]
+        return out
+
+    def _previous(self, column: str, pos: np.ndarray) -> np.ndarray:
+        return self._state[column].reset_index(drop=True).reindex(pos).to_numpy()
+
+    def _evict(self):
+        alive = self._poll - self._state["seen"].to_numpy() < self.max_missed
+        if not alive.all():
+            self._state = self._state[alive]
+
+    @staticmethod
+    def _empty() -> pd.DataFrame:
+        index = pd.MultiIndex.from_arrays(
+            [np.array([], np.uint64), np.array([], np.uint64), np.array([], np.int64)],
+            names=["addrs", "ports", "first"],
+        )
+        return pd.DataFrame({"bytes": np.array([], np.int64), "pkts": np.array([], np.int64),
+                             "seen": np.array([], np.int64)}, index=index)
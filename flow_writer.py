@@ -0,0 +1,232 @@
+import io
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+import psycopg2
+from sqlalchemy import exc as sa_exc
+
+from sketches import build_sketches, write_sketches
+
+# The database being unreachable, restarting or timing out: nothing wrong
+# with the rows, so they are retried for as long as the outage lasts
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError,
+                    sa_exc.OperationalError, sa_exc.InterfaceError,
+                    sa_exc.DisconnectionError, sa_exc.TimeoutError)
+
+# Column order of network_flows rows as produced by scraper.build_flow_frame
+FLOW_COLUMNS = [
+    "ipv4_src_addr","ipv4_dst_addr","l4_src_port","l4_dst_port",
+    "protocol","tcp_flags","in_bytes","in_pkts",
+    "flow_duration_ms","bytes_per_second","avg_throughput_bps",
+    "application_name","ingress_if","egress_if","direction",
+    "flow_monitor","time","time_first","time_last"
+]
+# Filled in by scoring.FlowScorer; NULL for frames that weren't scored
+SCORE_COLUMNS = ["ml_probability","ml_label","model_version"]
+TABLE_COLUMNS = FLOW_COLUMNS + SCORE_COLUMNS
+INTEGER_COLUMNS = [
+    "l4_src_port","l4_dst_port","protocol","tcp_flags",
+    "in_bytes","in_pkts","ingress_if","egress_if"
+]
+
+
+def frame_to_csv(df: pd.DataFrame, columns: List[str]) -> io.StringIO:
+    """Serialize ``df`` as headerless CSV in the layout COPY expects.
+
+    Integer columns that picked up NaNs (and so became floats) are cast back
+    to nullable ints, otherwise "6.0" would be rejected by an integer column.
+    Columns the frame doesn't have are written as NULL.
+    """
+    out = df.reindex(columns=columns)
+    for col in INTEGER_COLUMNS:
+        if col in out.columns and pd.api.types.is_float_dtype(out[col]):
+            out[col] = out[col].round().astype("Int64")
+    buf = io.StringIO()
+    out.to_csv(buf, header=False, index=False, na_rep="")
+    buf.seek(0)
+    return buf
+
+
+def batch_summary(df: pd.DataFrame, ingested_at: Optional[datetime]=None) -> dict:
+    """Row count, time_first range and ``ingested_at`` of a batch, for NOTIFY payloads."""
+    first = pd.to_datetime(df["time_first"]) if "time_first" in df else pd.Series(dtype="datetime64[ns]")
+    bounds = (first.min(), first.max()) if first.notna().any() else (None, None)
+    return {
+        "rows": len(df),
+        "time_first_min": None if bounds[0] is None else bounds[0].isoformat(),
+        "time_first_max": None if bounds[1] is None else bounds[1].isoformat(),
+        "ingested_at": None if ingested_at is None else ingested_at.isoformat(),
+    }
+
+
+class CopyWriter:
+    """Buffers flow frames and bulk-loads them with ``COPY ... FROM STDIN``.
+
+    Frames from several polls (or devices) are accumulated until either
+    ``batch_rows`` rows are waiting or the oldest one has waited ``max_delay``
+    seconds, then written in one COPY. Thread-safe, so all collector workers
+    can share one writer.
+
+    With ``notify_channel`` set, every COPY also issues ``NOTIFY`` on that
+    channel in the same transaction, so listeners such as the dashboard cache
+    and the detector hear about a batch exactly when it commits. The payload
+    is :func:`batch_summary` as JSON; its ``ingested_at`` is the
+    transaction's ``now()``, which every copied row also gets as its
+    ``ingested_at`` (see schema migration 0006).
+
+    With ``sketches`` set, the heavy-hitter sketches of every batch are
+    built before the connection is taken and merged into ``flow_sketches``
+    (sketches.write_sketches) in that transaction too, so they always
+    describe exactly the committed flows.
+
+    A buffered batch that fails to COPY stays buffered for the next flush,
+    frame by frame. During an outage (:data:`TRANSIENT_ERRORS`) the buffer
+    keeps at most ``max_buffered_rows`` rows and drops the oldest frames
+    beyond that. Any other failure is retried one frame at a time, so the
+    frames that are fine go through. A frame that fails ``max_attempts``
+    times is handed to ``dead_letter`` (for example
+    pipeline.SpillBuffer.dead_letter), or dropped with an error if there is
+    none.
+    """
+
+    def __init__(self, engine, table: str="network_flows",
+                 columns: List[str]=TABLE_COLUMNS,
+                 batch_rows: int=50_000, max_delay: float=5.0,
+                 notify_channel: Optional[str]=None, sketches: bool=False,
+                 max_buffered_rows: int=500_000, max_attempts: int=5,
+                 dead_letter: Optional[Callable[[pd.DataFrame, int], str]]=None):
+        self.engine = engine
+        self.table = table
+        self.columns = columns
+        self.batch_rows = batch_rows
+        self.max_delay = max_delay
+        self.notify_channel = notify_channel
+        self.sketches = sketches
+        self.max_buffered_rows = max_buffered_rows
+        self.max_attempts = max_attempts
+        self.dead_letter = dead_letter
+        self._frames: List[Tuple[pd.DataFrame, int]] = []   # (frame, failed attempts)
+        self._rows = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.total_rows = 0
+        self.total_seconds = 0.0
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        with self._lock:
+            self._frames.append((df, 0))
+            self._rows += len(df)
+            if self._rows < self.batch_rows:
+                if self._timer is None and self.max_delay > 0:
+                    self._timer = threading.Timer(self.max_delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                if self.max_delay > 0:
+                    return
+        self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered; returns the number of rows copied.
+
+        Raises the last COPY error if anything is still buffered afterwards.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            frames, self._frames, self._rows = self._frames, [], 0
+            if not frames:
+                return 0
+
+            dfs = [df for df, _ in frames]
+            try:
+                return self.write_batch(pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0])
+            except TRANSIENT_ERRORS:
+                # Nothing wrong with the rows: keep them all for the next attempt
+                self._keep(frames)
+                raise
+            except Exception as e:
+                if len(frames) == 1:
+                    self._keep_failed(frames[0], e)
+                    raise
+                error = e
+
+            # Find the frame(s) the table rejects; write the rest
+            copied = 0
+            for frame in frames:
+                try:
+                    copied += self.write_batch(frame[0])
+                except TRANSIENT_ERRORS as e:
+                    self._keep([frame])
+                    error = e
+                except Exception as e:
+                    self._keep_failed(frame, e)
+                    error = e
+            if self._frames:
+                raise error
+            return copied
+
+    def _keep(self, frames: List[Tuple[pd.DataFrame, int]]):
+        """Buffer ``frames`` again, dropping the oldest beyond ``max_buffered_rows``."""
+        self._frames += frames
+        self._rows += sum(len(df) for df, _ in frames)
+        while len(self._frames) > 1 and self._rows > self.max_buffered_rows:
+            df, _ = self._frames.pop(0)
+            self._rows -= len(df)
+            print(f"Error: write buffer over {self.max_buffered_rows} rows, dropped {len(df)} flows")
+
+    def _keep_failed(self, frame: Tuple[pd.DataFrame, int], error: Exception):
+        df, attempts = frame[0], frame[1] + 1
+        if attempts < self.max_attempts:
+            self._keep([(df, attempts)])
+            return
+        where = self.dead_letter(df, attempts) if self.dead_letter is not None else None
+        print(f"Error writing {len(df)} flows, giving up after {attempts} attempts"
+              f"{f' and moving them to {where}' if where else ' and dropping them'}: {error}")
+
+    def write_batch(self, df: pd.DataFrame) -> int:
+        """COPY ``df`` right away, bypassing the buffer; errors are the caller's."""
+        start = time.perf_counter()
+        self.copy_frame(df)
+        elapsed = time.perf_counter() - start
+
+        self.total_rows += len(df)
+        self.total_seconds += elapsed
+        print(f"Copied {len(df)} flows into {self.table} in {elapsed:.2f}s "
+              f"({len(df) / max(elapsed, 1e-9):,.0f} rows/s)")
+        return len(df)
+
+    def copy_frame(self, df: pd.DataFrame):
+        buf = frame_to_csv(df, self.columns)
+        sql = (f"COPY {self.table} ({', '.join(self.columns)}) "
+               f"FROM STDIN WITH (FORMAT csv, NULL '')")
+        sketches = build_sketches(df) if self.sketches else {}
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cur:
+                cur.copy_expert(sql, buf)
+                if sketches:
+                    write_sketches(cur, sketches)
+                if self.notify_channel:
+                    cur.execute("SELECT now()")
+                    summary = batch_summary(df, ingested_at=cur.fetchone()[0])
+                    cur.execute("SELECT pg_notify(%s, %s)", (self.notify_channel, json.dumps(summary)))
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.total_rows / self.total_seconds if self.total_seconds else 0.0
+
+    def close(self):
+        self.flush()
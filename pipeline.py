@@ -0,0 +1,238 @@
+import os
+import glob
+import time
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from flow_writer import CopyWriter, TRANSIENT_ERRORS
+
+SINK_BATCH_ROWS   = 100_000   # most rows one sink worker copies at once
+SINK_RETRY_S      = 5.0       # pause after a failed COPY before trying again
+SINK_MAX_ATTEMPTS = 5         # failures (not counting outages) before a spilled frame is set aside
+DEAD_LETTER_DIR   = "dead"    # under the spill directory
+
+
+class SpillBuffer:
+    """On-disk overflow for enriched frames the database can't take yet.
+
+    Frames are pickled one file each, named by arrival time and the number
+    of failed attempts to write them, and read back oldest first. When the
+    directory grows beyond ``max_bytes`` the oldest files are dropped, so a
+    long outage can't fill the disk. Frames that can't be written at all
+    are moved to the ``dead`` subdirectory (:meth:`dead_letter`), which is
+    never replayed or trimmed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.dead_directory = os.path.join(directory, DEAD_LETTER_DIR)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def push(self, df: pd.DataFrame, attempts: int=0):
+        with self._lock:
+            self._write(self.directory, df, attempts)
+            self._enforce_limit()
+
+    def pop(self) -> Optional[Tuple[pd.DataFrame, int]]:
+        """The oldest frame and its failed attempts so far, or None when empty."""
+        with self._lock:
+            files = self._files()
+            if not files:
+                return None
+            df = pd.read_pickle(files[0])
+            os.remove(files[0])
+            return df, self._attempts(files[0])
+
+    def dead_letter(self, df: pd.DataFrame, attempts: int) -> str:
+        """Set ``df`` aside for a human; returns the file it was written to."""
+        with self._lock:
+            os.makedirs(self.dead_directory, exist_ok=True)
+            return self._write(self.dead_directory, df, attempts)
+
+    def __len__(self) -> int:
+        return len(self._files())
+
+    def _files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "*.pkl")))
+
+    @staticmethod
+    def _write(directory: str, df: pd.DataFrame, attempts: int) -> str:
+        path = os.path.join(directory, f"{time.time_ns()}-{attempts}.pkl")
+        df.to_pickle(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return path
+
+    @staticmethod
+    def _attempts(path: str) -> int:
+        # <time_ns>-<attempts>.pkl; files spilled before attempts were counted have none
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return int(stem.partition("-")[2] or 0)
+
+    def _enforce_limit(self):
+        files = self._files()
+        total = sum(os.path.getsize(f) for f in files)
+        while files and total > self.max_bytes:
+            oldest = files.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            print(f"Spill buffer over {self.max_bytes // 2**20} MB, dropped {oldest}")
+
+
+class FlowPipeline:
+    """collect -> enrich -> sink, connected by bounded queues.
+
+    Collector workers hand raw parsed caches to :meth:`submit`, which blocks
+    only while its enrich queue is full (backpressure on a device whose data
+    can't be processed). Enrich workers build the final frame and pass it to
+    the sink queue without ever blocking: when the sink is behind, the frame
+    is spilled to disk instead, and sink workers drain the spill buffer once
+    they catch up. A slow or unavailable database therefore never delays the
+    next poll.
+
+    Each source is pinned to one enrich worker, which has its own queue, so
+    the polls of a device are enriched one at a time and in the order they
+    were submitted. ``enrich`` may therefore keep per-source state (such as
+    flow_state.FlowStateTable) that depends on seeing every poll in order.
+    """
+
+    def __init__(self, writer: CopyWriter,
+                 enrich: Callable[[str, str, pd.DataFrame, pd.DataFrame], pd.DataFrame],
+                 spill: SpillBuffer,
+                 queue_size: int=8, enrich_workers: int=2, sink_workers: int=1,
+                 on_enriched: Optional[Callable[[pd.DataFrame], None]]=None):
+        self.writer = writer
+        self.enrich = enrich
+        self.spill = spill
+        self.on_enriched = on_enriched
+        self.enrich_qs: "List[queue.Queue[Tuple]]" = [queue.Queue(maxsize=queue_size)
+                                                      for _ in range(enrich_workers)]
+        self._assigned: Dict[str, int] = {}
+        self._assign_lock = threading.Lock()
+        self.sink_q: "queue.Queue[pd.DataFrame]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = (
+            [threading.Thread(target=self._enrich_loop, args=(q,), name=f"enrich-{i}", daemon=True)
+             for i, q in enumerate(self.enrich_qs)] +
+            [threading.Thread(target=self._sink_loop, name=f"sink-{i}", daemon=True)
+             for i in range(sink_workers)]
+        )
+        self.stats = {"enriched": 0, "spilled": 0, "sink_failures": 0, "dead_lettered": 0}
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float=30.0):
+        """Stop accepting work and flush what is queued (or spill it)."""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        while not self.sink_q.empty():
+            self.spill.push(self.sink_q.get_nowait())
+
+    def submit(self, source: str, monitor: str, df_main: pd.DataFrame, df_flag: pd.DataFrame):
+        """Queue one poll of device ``source``; ``enrich`` gets the same arguments."""
+        self.enrich_qs[self._worker_for(source)].put((source, monitor, df_main, df_flag))
+
+    def _worker_for(self, source: str) -> int:
+        """The enrich worker of ``source``; new sources are dealt out round-robin."""
+        with self._assign_lock:
+            if source not in self._assigned:
+                self._assigned[source] = len(self._assigned) % len(self.enrich_qs)
+            return self._assigned[source]
+
+    def _enrich_loop(self, enrich_q: "queue.Queue[Tuple]"):
+        while not (self._stop.is_set() and enrich_q.empty()):
+            try:
+                job = enrich_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                df = self.enrich(*job)
+                if self.on_enriched is not None:
+                    self.on_enriched(df)
+            except Exception as e:
+                print(f"Error enriching flows: {e}")
+                continue
+            finally:
+                enrich_q.task_done()
+            if df.empty:
+                continue
+            self.stats["enriched"] += len(df)
+            try:
+                self.sink_q.put_nowait(df)
+            except queue.Full:
+                self.spill.push(df)
+                self.stats["spilled"] += len(df)
+
+    def _sink_loop(self):
+        while not (self._stop.is_set() and self.sink_q.empty()):
+            backlog = len(self.spill) > 0
+            frames = self._take_batch(wait=not backlog)
+            if frames:
+                self._write_frames(frames)
+            elif backlog:
+                # Queue idle: replay spilled frames, oldest first
+                self._replay_spilled()
+
+    def _write_frames(self, frames: List[pd.DataFrame]):
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        try:
+            self.writer.write_batch(df)
+        except Exception as e:
+            self.stats["sink_failures"] += 1
+            transient = isinstance(e, TRANSIENT_ERRORS)
+            print(f"Error writing {len(df)} flows, spilling to disk: {e}")
+            # One file per frame, so a bad frame is retried (and set aside) on its own
+            for frame in frames:
+                self.spill.push(frame, attempts=0 if transient else 1)
+            if transient:
+                self._stop.wait(SINK_RETRY_S)
+
+    def _replay_spilled(self):
+        """Write the oldest spilled frame, on its own.
+
+        Outages don't count against it. Any other failure does, and after
+        SINK_MAX_ATTEMPTS of them the frame is moved to the dead-letter
+        directory so the frames behind it can go through.
+        """
+        popped = self.spill.pop()
+        if popped is None:
+            return
+        df, attempts = popped
+        try:
+            self.writer.write_batch(df)
+        except Exception as e:
+            self.stats["sink_failures"] += 1
+            if not isinstance(e, TRANSIENT_ERRORS):
+                attempts += 1
+            if attempts >= SINK_MAX_ATTEMPTS:
+                path = self.spill.dead_letter(df, attempts)
+                self.stats["dead_lettered"] += len(df)
+                print(f"Error writing {len(df)} spilled flows, giving up after {attempts} "
+                      f"attempts and moving them to {path}: {e}")
+                return
+            print(f"Error writing {len(df)} spilled flows (attempt {attempts}), keeping them: {e}")
+            self.spill.push(df, attempts)
+            self._stop.wait(SINK_RETRY_S)
+
+    def _take_batch(self, wait: bool=True) -> List[pd.DataFrame]:
+        """Block briefly for one frame, then grab whatever else is queued."""
+        try:
+            frames = [self.sink_q.get(timeout=0.5) if wait else self.sink_q.get_nowait()]
+        except queue.Empty:
+            return []
+        rows = len(frames[0])
+        while rows < SINK_BATCH_ROWS:
+            try:
+                frames.append(self.sink_q.get_nowait())
+            except queue.Empty:
+                break
+            rows += len(frames[-1])
+        return frames
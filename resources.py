@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from config import get_resource_config
+
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def file_signature(paths: Iterable[str]) -> Signature:
+    """(mtime_ns, size) of each path, None for a missing file."""
+    out = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+
+class Resource:
+    """A file-backed object (model, GeoIP database, ...) loaded on first use.
+
+    :meth:`get` loads it on the first call, then at most every
+    ``check_interval`` seconds compares the backing files' mtime and size
+    and loads them again if they changed. A failed load is not retried
+    until the files change, and ``get`` returns None in the meantime (or the
+    previous object, when a reload fails).
+
+    Resources with a ``close`` must be used through :meth:`lease`: a
+    replaced object is closed only once the last lease on it has ended, so
+    a reload never pulls it out from under a caller. Objects from
+    :meth:`get` carry no such guarantee and may be closed at any time.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], paths: Iterable[str]=(),
+                 close: Optional[Callable[[Any], None]]=None, check_interval: float=30.0):
+        self.name = name
+        self.loader = loader
+        self.paths = tuple(paths)
+        self.close = close
+        self.check_interval = check_interval
+        self._value: Any = None
+        self._signature: Optional[Signature] = None   # of the last load attempt
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        # id(object) -> active leases; replaced objects wait in _retired until theirs end
+        self._leases: Dict[int, int] = {}
+        self._retired: Dict[int, Any] = {}
+        self._lease_lock = threading.Lock()
+        self.stats = {"loads": 0, "failures": 0, "load_seconds_last": None,
+                      "load_seconds_total": 0.0, "loaded_at": None, "last_error": None}
+
+    def get(self) -> Any:
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked < self.check_interval:
+            return self._value
+        with self._lock:
+            if self._signature is None or now - self._checked >= self.check_interval:
+                self._checked = now
+                signature = file_signature(self.paths)
+                if signature != self._signature:
+                    self._load(signature)
+            return self._value
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """:meth:`get`, with the object kept open until the ``with`` block ends."""
+        self.get()
+        with self._lease_lock:
+            value = self._value
+            if value is not None:
+                self._leases[id(value)] = self._leases.get(id(value), 0) + 1
+        try:
+            yield value
+        finally:
+            if value is not None:
+                self._release(value)
+
+    def _release(self, value: Any):
+        with self._lease_lock:
+            left = self._leases[id(value)] - 1
+            if left:
+                self._leases[id(value)] = left
+                return
+            del self._leases[id(value)]
+            if self._retired.pop(id(value), None) is None:
+                return
+        self._close(value)
+
+    def _retire(self, old: Any):
+        """Close ``old`` now if nobody holds a lease on it, else when the last one ends."""
+        with self._lease_lock:
+            if self._leases.get(id(old)):
+                self._retired[id(old)] = old
+                return
+        self._close(old)
+
+    def _close(self, value: Any):
+        try:
+            self.close(value)
+        except Exception:
+            pass
+
+    def reload(self) -> Any:
+        """Load again now, whether or not the files changed."""
+        with self._lock:
+            self._checked = time.monotonic()
+            self._load(file_signature(self.paths))
+            return self._value
+
+    def _load(self, signature: Signature):
+        start = time.perf_counter()
+        self._signature = signature
+        try:
+            value = self.loader()
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            print(f"Could not load {self.name}: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        with self._lease_lock:
+            old, self._value = self._value, value
+        self.stats.update(loads=self.stats["loads"] + 1, load_seconds_last=round(elapsed, 4),
+                          load_seconds_total=round(self.stats["load_seconds_total"] + elapsed, 4),
+                          loaded_at=datetime.now(timezone.utc).isoformat(), last_error=None)
+        if old is not None and self.close is not None:
+            self._retire(old)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"paths": list(self.paths), "loaded": self._value is not None, **self.stats}
+
+
+class ResourceRegistry:
+    """Named :class:`Resource` objects shared by everything in the process."""
+
+    def __init__(self, check_interval: float=30.0):
+        self.check_interval = check_interval
+        self._resources: Dict[str, Resource] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], paths: Iterable[str]=(),
+                 close: Optional[Callable[[Any], None]]=None) -> Resource:
+        """Register ``name`` unless it already is; either way return its Resource."""
+        with self._lock:
+            if name not in self._resources:
+                self._resources[name] = Resource(name, loader, paths, close, self.check_interval)
+            return self._resources[name]
+
+    def get(self, name: str) -> Any:
+        return self._resources[name].get()
+
+    def reload(self, name: str) -> Any:
+        return self._resources[name].reload()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: r.snapshot() for name, r in self._resources.items()}
+
+
+registry = ResourceRegistry(get_resource_config()['check_interval'])
+
+
+def _open_geoip(path: str):
+    import geoip2.database
+    return geoip2.database.Reader(path)
+
+
+def geoip_reader():
+    """A lease on the shared GeoLite2 City reader (None if the database can't be opened).
+
+    Use as ``with geoip_reader() as reader:``; the reader stays open until
+    the block ends, even if a newer file is loaded meanwhile.
+    """
+    path = get_resource_config()['geoip_path']
+    return registry.register("geoip", lambda: _open_geoip(path), [path],
+                             close=lambda reader: reader.close()).lease()
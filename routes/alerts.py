@@ -0,0 +1,105 @@
+import json
+import queue
+import threading
+from collections import deque
+from typing import List, Tuple
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from config import get_alert_config
+from db import NotificationListener
+
+alerts_bp = Blueprint('alerts', __name__)
+
+KEEPALIVE_S = 15
+RECENT_ALERTS = 50
+
+
+class AlertHub:
+    """Fans detector alerts out to every open /alerts/stream connection.
+
+    Each alert gets a sequence number, sent as the SSE event id, so a
+    browser that reconnects (EventSource sends Last-Event-ID) is replayed
+    only the recent alerts it missed. A client that falls behind loses
+    alerts rather than blocking the others.
+    """
+
+    def __init__(self, recent: int=RECENT_ALERTS, backlog: int=256):
+        self.backlog = backlog
+        self._recent: "deque[Tuple[int, str]]" = deque(maxlen=recent)
+        self._subscribers: List[queue.Queue] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def publish(self, payload: str):
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, payload)
+            self._recent.append(event)
+            for q in self._subscribers:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    self.dropped += 1
+
+    def subscribe(self, last_id: int=0) -> Tuple[queue.Queue, List[Tuple[int, str]]]:
+        q: queue.Queue = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            self._subscribers.append(q)
+            missed = [e for e in self._recent if e[0] > last_id]
+        return q, missed
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.remove(q)
+
+    def recent(self) -> List[dict]:
+        with self._lock:
+            return [json.loads(payload) for _, payload in self._recent]
+
+
+hub = AlertHub()
+
+
+def _sse(seq: int, payload: str) -> str:
+    return f"id: {seq}\nevent: alert\ndata: {payload}\n\n"
+
+
+# -------------------
+# Server-Sent Events stream of detector alerts
+# -------------------
+@alerts_bp.route("/alerts/stream")
+def alert_stream():
+    last_id = request.headers.get("Last-Event-ID", 0, type=int)
+
+    def events():
+        q, missed = hub.subscribe(last_id)
+        try:
+            for seq, payload in missed:
+                yield _sse(seq, payload)
+            while True:
+                try:
+                    seq, payload = q.get(timeout=KEEPALIVE_S)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(seq, payload)
+        finally:
+            hub.unsubscribe(q)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@alerts_bp.route("/alerts/recent")
+def recent_alerts():
+    return jsonify(hub.recent())
+
+
+def start_alert_listener() -> NotificationListener:
+    """Relay the detector's NOTIFY messages into the hub."""
+    listener = NotificationListener(get_alert_config()['channel'], on_notify=hub.publish,
+                                    name="alert-relay")
+    listener.start()
+    return listener
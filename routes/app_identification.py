@@ -2,35 +2,32 @@
 
 from flask import Blueprint, render_template, jsonify, current_app
 import pandas as pd
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-from config import get_database_url
-
-load_dotenv()
+from db import get_engine
+from cache import cached
 
 app_ident = Blueprint('app_ident', __name__)
-engine = create_engine(get_database_url())
 
 @app_ident.route("/traffic_by_application")
 def traffic_by_application():
     return render_template("traffic_by_application.html")
 
 @app_ident.route("/api/traffic_by_application")
+@cached()
 def api_traffic_by_application():
     try:
         query = """
             SELECT
-              time_bucket('5 minutes', time_first) AT TIME ZONE 'Asia/Dubai' AS interval_start,
+              bucket AT TIME ZONE 'Asia/Dubai' AS interval_start,
               application_name,
-              SUM(in_bytes)    AS total_bytes,
-              COUNT(*)         AS flow_count
-            FROM network_flows
-            WHERE time_first > NOW() - INTERVAL '1 HOUR'
+              SUM(bytes)       AS total_bytes,
+              SUM(flows)       AS flow_count
+            FROM flows_5m
+            WHERE bucket >= time_bucket('5 minutes', NOW() - INTERVAL '1 HOUR')
               AND application_name IS NOT NULL
-            GROUP BY interval_start, application_name
+            GROUP BY bucket, application_name
             ORDER BY interval_start, application_name
         """
-        df = pd.read_sql_query(query, engine)
+        df = pd.read_sql_query(query, get_engine())
 
         # Format for JSON
         df['interval_start'] = (
@@ -1,48 +1,74 @@
 from flask import Blueprint, render_template
-import psycopg2
 import pandas as pd
 
+from db import get_engine
+from cache import cached
+from sketches import load_window, split_pair
+
 behavior_bp = Blueprint('behavior', __name__)
 
+WINDOW_MINUTES = 30
+
+# Exact fallbacks, used when no sketches were written for the window
+PAIRS_QUERY = """
+    SELECT ipv4_src_addr, ipv4_dst_addr, COUNT(*) AS flows
+    FROM network_flows
+    WHERE time_first > NOW() - INTERVAL '30 minutes'
+    GROUP BY ipv4_src_addr, ipv4_dst_addr
+    ORDER BY flows DESC
+    LIMIT 10
+"""
+
+PORTS_QUERY = """
+    SELECT l4_dst_port, COUNT(*) AS flows
+    FROM network_flows
+    WHERE time_first > NOW() - INTERVAL '30 minutes' AND l4_dst_port IS NOT NULL
+    GROUP BY l4_dst_port
+    ORDER BY flows DESC
+    LIMIT 10
+"""
+
+PROTOCOL_QUERY = """
+    SELECT protocol, COUNT(*) AS flows
+    FROM network_flows
+    WHERE time_first > NOW() - INTERVAL '30 minutes'
+    GROUP BY protocol
+"""
+
+PROTOCOL_NAMES = {6: "TCP", 17: "UDP", 1: "ICMP"}
+
+
 @behavior_bp.route("/behavior")
+@cached()
 def behavior():
-    conn = psycopg2.connect(
-        dbname="network_db", user="postgres", password="postgres", host="localhost", port="5432"
-    )
-    query = """
-        SELECT ipv4_src_addr, ipv4_dst_addr, l4_src_port, l4_dst_port, protocol, time_first
-        FROM network_flows
-        WHERE time_first > NOW() - INTERVAL '30 minutes'
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    if df.empty:
-        flow_recurrence = {}
-        port_usage = {}
-        protocol_dist = {}
-    else:
-        # Flow Recurrence: (source IP, destination IP) pair counts
-        flow_recurrence = (df.groupby(["ipv4_src_addr", "ipv4_dst_addr"])
-                             .size()
-                             .sort_values(ascending=False)
-                             .head(10)
-                             .to_dict())
+    engine = get_engine()
+    sketch = load_window(engine, minutes=WINDOW_MINUTES)
 
+    if sketch is not None:
+        # Flow Recurrence: (source IP, destination IP) pair counts
+        flow_recurrence = {split_pair(key): count for key, count in sketch.top("pair", "flows", 10)}
         # Port Usage: Destination ports count
-        port_usage = (df['l4_dst_port']
-                      .value_counts()
-                      .head(10)
-                      .to_dict())
-
-        # Protocol Distribution (mapping TCP/UDP/ICMP)
-        protocol_dist = (df['protocol']
-                         .map({6: "TCP", 17: "UDP", 1: "ICMP"})
-                         .fillna("Other")
-                         .value_counts(normalize=True) * 100
-                         ).round(2).to_dict()
+        port_usage = {int(port): count for port, count in sketch.top("dst_port", "flows", 10)}
+        distinct = {dim: sketch.distinct(dim) for dim in ("src", "dst", "dst_port", "pair")}
+    else:
+        pairs = pd.read_sql_query(PAIRS_QUERY, engine)
+        ports = pd.read_sql_query(PORTS_QUERY, engine)
+        flow_recurrence = {(row.ipv4_src_addr, row.ipv4_dst_addr): int(row.flows)
+                           for row in pairs.itertuples(index=False)}
+        port_usage = {int(row.l4_dst_port): int(row.flows) for row in ports.itertuples(index=False)}
+        distinct = {}
+
+    # Protocol Distribution (mapping TCP/UDP/ICMP); a handful of rows either way
+    protocols = pd.read_sql_query(PROTOCOL_QUERY, engine)
+    if protocols.empty:
+        protocol_dist = {}
+    else:
+        names = protocols['protocol'].map(PROTOCOL_NAMES).fillna("Other")
+        share = protocols['flows'].groupby(names).sum()
+        protocol_dist = (share / share.sum() * 100).round(2).sort_values(ascending=False).to_dict()
 
     return render_template('behavior.html',
                            flow_recurrence=flow_recurrence,
                            port_usage=port_usage,
-                           protocol_dist=protocol_dist)
+                           protocol_dist=protocol_dist,
+                           distinct=distinct)
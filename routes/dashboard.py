@@ -1,14 +1,15 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, current_app, request
 import pandas as pd
 import pytz
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-from config import get_database_url
-
-load_dotenv()
+from sqlalchemy import text
+from db import get_engine
+from cache import cached
+from schema import ROLLUPS
+from sketches import load_window
+from utils.downsample import TimeRange, parse_time_range, choose_step, choose_source, lttb
+from utils.wire import frame_response, negotiated
 
 dashboard_bp = Blueprint('dashboard', __name__)
-engine = create_engine(get_database_url())
 
 # -------------------
 # Renders the main dashboard page
@@ -20,9 +21,7 @@ def dashboard():
 # -------------------
 # Helper: Get flow data
 # -------------------
-def get_data():
-    df = pd.read_sql("""
-        SELECT 
+DATA_COLUMNS = """
             time              AS scrape_time,
             time_first,
             time_last,
@@ -42,12 +41,56 @@ def get_data():
             ingress_if,
             egress_if,
             direction
+"""
+
+RAW_FLOWS_QUERY = f"""
+        SELECT {DATA_COLUMNS}
         FROM network_flows
-        WHERE time_first > NOW() - INTERVAL '5 minutes'
+        WHERE time_first >= :start AND time_first < :end
         ORDER BY time_first DESC
-        LIMIT 1000
-    """, engine)
+        LIMIT :limit
+"""
+
+# The largest flow of each `slot`-second slot of the range, so a long range
+# reaches Python as a bounded set of candidates that keeps every spike
+PEAK_FLOWS_QUERY = f"""
+        SELECT DISTINCT ON (slot) {DATA_COLUMNS},
+            FLOOR(EXTRACT(EPOCH FROM time_first - :start) / :slot) AS slot
+        FROM network_flows
+        WHERE time_first >= :start AND time_first < :end
+        ORDER BY slot, in_bytes DESC NULLS LAST
+"""
+
+DATA_WINDOW = pd.Timedelta(minutes=5)
+CANDIDATES_PER_POINT = 4
 
+
+def get_data(rng: TimeRange):
+    """Flows with time_first in ``rng``, newest first, at most ``rng.max_points`` of them.
+
+    Ranges with more flows than that are reduced to the largest flow per
+    slot (``step`` seconds wide if given), then thinned with LTTB on in_bytes.
+    """
+    params = {"start": rng.start.to_pydatetime(), "end": rng.end.to_pydatetime()}
+    candidates = rng.max_points * CANDIDATES_PER_POINT
+    df = None
+    if rng.step is None:
+        df = pd.read_sql(text(RAW_FLOWS_QUERY), get_engine(), params={**params, "limit": candidates + 1})
+    if df is None or len(df) > candidates:
+        slot = rng.step or rng.seconds / candidates
+        df = pd.read_sql(text(PEAK_FLOWS_QUERY), get_engine(), params={**params, "slot": slot})
+        df = df.drop(columns="slot")
+
+    if len(df) > rng.max_points:
+        df = df.sort_values("time_first", kind="stable", ignore_index=True)
+        x = pd.to_datetime(df["time_first"], utc=True).astype("int64").to_numpy()
+        df = df.iloc[lttb(x, df["in_bytes"].to_numpy(dtype=float, na_value=0.0), rng.max_points)]
+    return df.sort_values("time_first", ascending=False, kind="stable", ignore_index=True)
+
+
+def data_records(df: pd.DataFrame):
+    """The original /data payload: one object per row, timestamps as local-time strings."""
+    df = df.copy()
     dubai_tz = pytz.timezone("Asia/Dubai")
     # normalize all timestamp columns to strings in local TZ
     for col in ["scrape_time", "time_first", "time_last"]:
@@ -56,21 +99,25 @@ def get_data():
               .dt.tz_convert(dubai_tz)
               .astype(str)
         )
-
-    return df
+    # convert NaNs to nulls for JSON
+    return df.where(pd.notnull(df), None).to_dict(orient="records")
 
 # -------------------
 # API: Return flow data
+# ?start=&end= (ISO 8601 or Unix seconds; default the last 5 minutes),
+# ?max_points= (default 1000), ?step= (seconds per slot for long ranges),
+# ?format=records|columns|arrow (or by Accept header; see utils/wire.py)
 # -------------------
 @dashboard_bp.route("/data")
+@cached(vary=negotiated)
 def data():
     try:
-        df = get_data()
-        # convert NaNs to nulls for JSON
-        payload = df.where(pd.notnull(df), None).to_dict(orient="records")
-        return jsonify(payload)
+        df = get_data(parse_time_range(request.args, DATA_WINDOW))
+        return frame_response(df, data_records)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        app.logger.exception("Error in /data")
+        current_app.logger.exception("Error in /data")
         return jsonify({"error": str(e)}), 500
 
 
@@ -82,23 +129,27 @@ This API aggregates flow data into 5 key metrics:
 4. Flow Count Per Minute
 5. Top Talkers (by source IP and total bytes sent)
 
+Top talkers come from the ingest sketches (sketches.py) when there are any
+for the window, and from an exact GROUP BY over network_flows otherwise.
  """
 
 
 @dashboard_bp.route("/metrics")
+@cached()
 def metrics():
     try:
+        # Per-minute rollup (see schema.ROLLUPS); the unmaterialized tail is read live
         query = """
             SELECT
-                date_trunc('minute', time_first) AT TIME ZONE 'Asia/Dubai' AS minute,
-                SUM(in_bytes) AS total_bytes,
-                SUM(in_pkts) AS total_packets,
-                COUNT(*) AS flow_count,
-                AVG(avg_throughput_bps) AS avg_throughput
-            FROM network_flows
-            WHERE time_first > NOW() - interval '30 minutes'
-            GROUP BY minute
-            ORDER BY minute ASC;
+                bucket AT TIME ZONE 'Asia/Dubai' AS minute,
+                SUM(bytes) AS total_bytes,
+                SUM(packets) AS total_packets,
+                SUM(flows) AS flow_count,
+                SUM(throughput_sum) / NULLIF(SUM(throughput_count), 0) AS avg_throughput
+            FROM flows_1m
+            WHERE bucket >= time_bucket('1 minute', NOW() - interval '30 minutes')
+            GROUP BY bucket
+            ORDER BY bucket ASC;
         """
 
         talkers_query = """
@@ -110,8 +161,13 @@ def metrics():
             LIMIT 10;
         """
 
-        df_metrics = pd.read_sql(query, engine)
-        df_talkers = pd.read_sql(talkers_query, engine)
+        df_metrics = pd.read_sql(query, get_engine())
+        sketch = load_window(get_engine(), minutes=30)
+        if sketch is not None:
+            df_talkers = pd.DataFrame(sketch.top("src", "bytes", 10),
+                                      columns=["ipv4_src_addr", "total_bytes"])
+        else:
+            df_talkers = pd.read_sql(talkers_query, get_engine())
 
         df_metrics["minute"] = pd.to_datetime(df_metrics["minute"]).dt.strftime("%Y-%m-%dT%H:%M:%S")
 
@@ -126,40 +182,58 @@ def metrics():
 
 
 # -------------------
-# API: Bytes by direction (last 15 minutes, 30s buckets)
+# Helper: bytes per bucket and `column` from the rollups
 # -------------------
-@dashboard_bp.route("/bytes_by_direction")
-def bytes_by_direction():
-    q = """
+BYTES_WINDOW = pd.Timedelta(minutes=15)
+# rollup view -> bucket width in seconds
+ROLLUP_SECONDS = {view: pd.Timedelta(spec[0]).total_seconds() for view, spec in ROLLUPS.items()}
+
+BUCKETED_BYTES_QUERY = """
     SELECT
-      time_bucket('30 seconds', time_first) AT TIME ZONE 'Asia/Dubai' AS ts,
-      direction,
-      SUM(in_bytes) AS bytes
-    FROM network_flows
-    WHERE time_first > NOW() - INTERVAL '15 minutes'
-    GROUP BY 1,2
-    ORDER BY 1;
+      time_bucket(make_interval(secs => :step), bucket) AT TIME ZONE 'Asia/Dubai' AS ts,
+      {column},
+      SUM(bytes) AS bytes
+    FROM {view}
+    WHERE bucket >= time_bucket(make_interval(secs => :step), CAST(:start AS TIMESTAMPTZ))
+      AND bucket < :end
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+"""
+
+
+def bucketed_bytes(column: str):
+    """Bytes per ``column`` over ``start``..``end`` (default the last 15 minutes).
+
+    The bucket width is ``step`` when that fits ``max_points`` buckets, or
+    else the smallest round width that does. It is read from the coarsest
+    rollup whose buckets divide it, so a week costs about what 15 minutes did.
     """
-    df = pd.read_sql(q, engine)
+    try:
+        rng = parse_time_range(request.args, BYTES_WINDOW)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    step = choose_step(rng.seconds, rng.max_points, rng.step)
+    view = choose_source(step, ROLLUP_SECONDS)
+    q = text(BUCKETED_BYTES_QUERY.format(column=column, view=view))
+    df = pd.read_sql(q, get_engine(), params={"step": step, "start": rng.start.to_pydatetime(),
+                                              "end": rng.end.to_pydatetime()})
     df["ts"] = pd.to_datetime(df["ts"]).dt.strftime("%Y-%m-%dT%H:%M:%S")
     return jsonify(df.to_dict(orient="records"))
 
 
 # -------------------
-# API: Bytes by interface (last 15 minutes, 30s buckets)
+# API: Bytes by direction (last 15 minutes, 30s buckets, unless asked otherwise)
+# -------------------
+@dashboard_bp.route("/bytes_by_direction")
+@cached()
+def bytes_by_direction():
+    return bucketed_bytes("direction")
+
+
+# -------------------
+# API: Bytes by interface (last 15 minutes, 30s buckets, unless asked otherwise)
 # -------------------
 @dashboard_bp.route("/bytes_by_interface")
+@cached()
 def bytes_by_interface():
-    q = """
-    SELECT
-      time_bucket('30 seconds', time_first) AT TIME ZONE 'Asia/Dubai' AS ts,
-      ingress_if,
-      SUM(in_bytes) AS bytes
-    FROM network_flows
-    WHERE time_first > NOW() - INTERVAL '15 minutes'
-    GROUP BY 1,2
-    ORDER BY 1,2;
-    """
-    df = pd.read_sql(q, engine)
-    df["ts"] = pd.to_datetime(df["ts"]).dt.strftime("%Y-%m-%dT%H:%M:%S")
-    return jsonify(df.to_dict(orient="records"))
+    return bucketed_bytes("ingress_if")
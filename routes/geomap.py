@@ -1,61 +1,76 @@
 from flask import Blueprint, render_template, jsonify
-import geoip2.database
 import pandas as pd
-import os
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-from config import get_database_url
-
-load_dotenv()
+from sqlalchemy import text
+from config import get_resource_config
+from db import get_engine
+from cache import cached
+from resources import geoip_reader
+from utils.geo import GeoLocator
 
 geomap_bp = Blueprint('geomap', __name__)
 
+# Lookups are kept across requests; the same sources show up in every window
+locator = GeoLocator(get_resource_config()['geoip_cache_entries'])
+TOP_IPS_PER_LOCATION = 5
+
+# One row per source address in the last 5 minutes, not one per flow
+SOURCES_QUERY = text("""
+    SELECT ipv4_src_addr AS ip,
+           COUNT(*) AS flows,
+           COALESCE(SUM(in_bytes), 0) AS bytes,
+           MIN(time_first) AS first_seen,
+           MAX(time_first) AS last_seen
+    FROM network_flows
+    WHERE time_first > NOW() - INTERVAL '5 minutes'
+    GROUP BY ipv4_src_addr
+""")
+
 
 @geomap_bp.route('/geomap')
 def geomap_page():
     return render_template('geomap.html')
 
-# --- invoking database engine ---
-engine = create_engine(get_database_url())
 
-# --- invoking GeoIP reader ---
-reader = geoip2.database.Reader(os.path.join('data', 'GeoLite2-City.mmdb'))
+@geomap_bp.route('/api/geomap_data')
+@cached()
+def geomap_data():
+    with geoip_reader() as reader:
+        if reader is None:
+            return jsonify({'error': 'GeoIP database not available'}), 503
 
+        sources = pd.read_sql(SOURCES_QUERY, get_engine(), parse_dates=['first_seen', 'last_seen'])
+        locations = locator.locate(reader, sources['ip'])
+    return jsonify(aggregate_by_location(sources, locations))
 
 
-@geomap_bp.route('/api/geomap_data')
-def geomap_data():
-    # Pulling the last 5 minutes of flows
-    df = pd.read_sql(
-        """
-        SELECT ipv4_src_addr, time_first
-        FROM network_flows
-        WHERE time_first > NOW() - INTERVAL '5 minutes'
-        """,
-        engine,
-        parse_dates=['time_first']
-    )
-
-    # Lookup lat/lon for each IP
-    def lookup(ip):
-        try:
-            rec = reader.city(ip)
-            return {'lat': rec.location.latitude, 'lon': rec.location.longitude}
-        except Exception:
-            return {'lat': None, 'lon': None}
-
-    df['geo'] = df['ipv4_src_addr'].apply(lookup)
-
-    # Converting to a plain list of dicts for jsonify
-    records = []
-    for idx, row in df.iterrows():
-        geo = row['geo']
-        if geo['lat'] is not None and geo['lon'] is not None:
-            records.append({
-                'ip': row['ipv4_src_addr'],
-                'time': row['time_first'].isoformat(),
-                'lat': geo['lat'],
-                'lon': geo['lon']
-            })
-
-    return jsonify(records)
\ No newline at end of file
+def aggregate_by_location(sources: pd.DataFrame, locations: pd.DataFrame) -> dict:
+    """Per-location flow/byte/address counts with the busiest source addresses."""
+    df = sources.join(locations, on='ip')
+    resolved = df.dropna(subset=['lat', 'lon']).sort_values('flows', ascending=False)
+
+    grouped = resolved.groupby(['lat', 'lon'], sort=False)
+    by_location = grouped.agg(
+        city=('city', 'first'), country=('country', 'first'),
+        flows=('flows', 'sum'), bytes=('bytes', 'sum'), ips=('ip', 'size'),
+        first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'),
+    ).reset_index().sort_values('flows', ascending=False)
+    top = (resolved.groupby(['lat', 'lon'], sort=False).head(TOP_IPS_PER_LOCATION)
+                   .groupby(['lat', 'lon'], sort=False)[['ip', 'flows']]
+                   .apply(lambda g: [{'ip': ip, 'flows': int(n)} for ip, n in zip(g['ip'], g['flows'])]))
+
+    locations_out = []
+    for row in by_location.itertuples(index=False):
+        locations_out.append({
+            'lat': row.lat, 'lon': row.lon,
+            'city': row.city if pd.notna(row.city) else None,
+            'country': row.country if pd.notna(row.country) else None,
+            'flows': int(row.flows), 'bytes': int(row.bytes), 'ips': int(row.ips),
+            'first_seen': row.first_seen.isoformat(), 'last_seen': row.last_seen.isoformat(),
+            'top_ips': top.get((row.lat, row.lon), []),
+        })
+    return {
+        'locations': locations_out,
+        'flows': int(sources['flows'].sum()),
+        'ips': len(sources),
+        'unresolved_ips': int(len(df) - len(resolved)),
+    }
@@ -0,0 +1,31 @@
+from flask import Blueprint, jsonify
+
+from db import pool_status
+from cache import result_cache
+from resources import registry
+from routes.geomap import locator
+
+health_bp = Blueprint('health', __name__)
+
+# -------------------
+# Connection pool occupancy and counters
+# -------------------
+@health_bp.route("/health/db")
+def db_health():
+    return jsonify(pool_status())
+
+# -------------------
+# Dashboard result cache counters
+# -------------------
+@health_bp.route("/health/cache")
+def cache_health():
+    return jsonify({**result_cache.stats, "entries": len(result_cache)})
+
+# -------------------
+# Lazily loaded files (model, GeoIP database): load counts and times,
+# plus the GeoIP lookup cache in front of the database
+# -------------------
+@health_bp.route("/health/resources")
+def resources_health():
+    return jsonify({**registry.stats(),
+                    "geoip_lookups": {**locator.stats, "entries": len(locator)}})
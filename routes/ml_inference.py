@@ -1,122 +1,128 @@
-import os
-import joblib
-import numpy as np
-import pandas as pd
-from flask import Blueprint, jsonify, render_template
-from sqlalchemy import create_engine
-import xgboost as xgb
-import sys
-import socket
-import struct
-from dotenv import load_dotenv
-from config import get_database_url
-
-from utils.encoders import LabelEncoderExt
+import base64
+import json
+from typing import Optional
 
-load_dotenv()
+import pandas as pd
+from flask import Blueprint, jsonify, render_template, request
+from db import get_engine
+from cache import cached
 
-sys.modules['__main__'].LabelEncoderExt = LabelEncoderExt
+from scoring import MALICIOUS, BENIGN
+from utils.wire import frame_response, negotiated
 
 ml_bp = Blueprint('ml_bp', __name__)
 
-# === Paths ===
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-ENCODERS_PATH = os.path.join(BASE_DIR, "models", "ip_encoders_11.pkl")
-MODEL_PATH = os.path.join(BASE_DIR, "models", "xgb_nids_model_11.json")
-
-# === Load IP Encoders ===
-encoders = joblib.load(ENCODERS_PATH)
-
-# === Load XGBoost Model Properly ===
-model = xgb.Booster()
-model.load_model(MODEL_PATH)
-
-# === Connect to TimescaleDB ===
-engine = create_engine(get_database_url())
-
-# === List of features expected ===
-FEATURES = [
-    "IPV4_SRC_ADDR", "IPV4_DST_ADDR", "L4_SRC_PORT", "L4_DST_PORT",
-    "PROTOCOL", "TCP_FLAGS", "IN_BYTES", "IN_PKTS",
-    "FLOW_DURATION_MILLISECONDS", "SRC_TO_DST_SECOND_BYTES", "SRC_TO_DST_AVG_THROUGHPUT"
+DEFAULT_ROWS = 100
+MAX_ROWS = 1_000
+LABELS = (MALICIOUS, BENIGN)
+
+# Page order, newest first. Every delta row of a flow shares its time_first,
+# so the scrape time, commit time and flow key break ties. NULLs are mapped
+# below any real value so that rows compare as a whole.
+CURSOR_COLUMNS = [
+    ("time_first",    "time_first",                         "TIMESTAMPTZ"),
+    ("time",          "COALESCE(time, '-infinity')",        "TIMESTAMPTZ"),
+    ("ingested_at",   "COALESCE(ingested_at, '-infinity')", "TIMESTAMPTZ"),
+    ("ipv4_src_addr", "COALESCE(ipv4_src_addr, '')",        "TEXT"),
+    ("ipv4_dst_addr", "COALESCE(ipv4_dst_addr, '')",        "TEXT"),
+    ("l4_src_port",   "COALESCE(l4_src_port, -1)",          "INTEGER"),
+    ("l4_dst_port",   "COALESCE(l4_dst_port, -1)",          "INTEGER"),
+    ("protocol",      "COALESCE(protocol, -1)",             "INTEGER"),
 ]
-
-# === Preprocessing helpers ===
-def ip_to_int(ip_str):
+NULL_KEYS = {"TIMESTAMPTZ": "-infinity", "TEXT": "", "INTEGER": -1}
+SORT_KEY = ", ".join(expr for _, expr, _ in CURSOR_COLUMNS)
+
+
+def prediction_records(df: pd.DataFrame):
+    """The original payload: one object per row, time_first as an ISO string."""
+    df = df.copy()
+    df["time_first"] = pd.to_datetime(df["time_first"]).map(lambda t: t.isoformat())
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+
+def encode_cursor(row: pd.Series) -> str:
+    """The sort key of ``row`` as an opaque, URL-safe ``?before=`` value."""
+    values = []
+    for column, _, sql_type in CURSOR_COLUMNS:
+        value = row[column]
+        if pd.isna(value):
+            value = NULL_KEYS[sql_type]
+        elif sql_type == "TIMESTAMPTZ":
+            value = pd.Timestamp(value).isoformat()
+        elif sql_type == "INTEGER":
+            value = int(value)
+        values.append(value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(value: str) -> Optional[list]:
+    """The sort key in an :func:`encode_cursor` value, or None if it isn't one."""
     try:
-        return struct.unpack("!I", socket.inet_aton(ip_str))[0]
-    except Exception:
-        return 0
-
-def preprocess_row(row):
-    """Preprocesses a single flow row to match model expectations."""
-    src_ip = ip_to_int(row["ipv4_src_addr"])
-    dst_ip = ip_to_int(row["ipv4_dst_addr"])
-    features = [
-        src_ip,
-        dst_ip,
-        row["l4_src_port"],
-        row["l4_dst_port"],
-        row["protocol"],
-        row["tcp_flags"],
-        row["in_bytes"],
-        row["in_pkts"],
-        row["flow_duration_ms"],
-        row["bytes_per_second"],
-        row["avg_throughput_bps"],
-    ]
-    return features
-
-
+        values = json.loads(base64.urlsafe_b64decode(value.encode()))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) and len(values) == len(CURSOR_COLUMNS) else None
+
+
+# === Route: scored flows, newest first ===
+# Flows are scored once at ingest (scoring.FlowScorer), so this is a plain
+# keyset-paged read: pass meta.next_before (columns and arrow formats, see
+# utils/wire.py) back as ?before= for the next page, and ?label=Malicious|Benign
+# to filter. A bare ISO timestamp in ?before= still pages by time_first alone,
+# which can skip rows sharing the boundary's time_first.
 @ml_bp.route("/flows_with_predictions", methods=["GET"])
+@cached(vary=negotiated)
 def flows_with_predictions():
+    limit = min(max(request.args.get("limit", DEFAULT_ROWS, type=int), 1), MAX_ROWS)
+    label = request.args.get("label")
+    before = request.args.get("before")
+
+    conditions, params = [], {"limit": limit}
+    if label:
+        if label not in LABELS:
+            return jsonify({"error": f"label must be one of {', '.join(LABELS)}"}), 400
+        conditions.append("ml_label = %(label)s")
+        params["label"] = label
+    if before:
+        cursor = decode_cursor(before)
+        if cursor is not None:
+            bounds = []
+            for i, (_, _, sql_type) in enumerate(CURSOR_COLUMNS):
+                params[f"before_{i}"] = cursor[i]
+                bounds.append(f"CAST(%(before_{i})s AS {sql_type})")
+            # The bare time_first bound lets the planner use the time_first index
+            conditions.append(f"time_first <= %(before_0)s AND ({SORT_KEY}) < ({', '.join(bounds)})")
+        else:
+            try:
+                params["before"] = pd.Timestamp(before).isoformat()
+            except ValueError:
+                return jsonify({"error": "before must be a next_before cursor or an ISO timestamp"}), 400
+            conditions.append("time_first < %(before)s")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ", ".join(f"{expr} DESC" for _, expr, _ in CURSOR_COLUMNS)
+
     try:
-        query = """
+        query = f"""
         SELECT ipv4_src_addr, ipv4_dst_addr, l4_src_port, l4_dst_port,
                protocol, tcp_flags, in_bytes, in_pkts,
                flow_duration_ms, bytes_per_second, avg_throughput_bps,
-               time
+               time, time_first, ingested_at,
+               ml_label AS prediction, ml_probability AS probability, model_version
         FROM network_flows
-        ORDER BY time DESC
-        LIMIT 100;
+        {where}
+        ORDER BY {order}
+        LIMIT %(limit)s;
         """
-        df = pd.read_sql(query, engine)
-
-        if df.empty:
-            return jsonify([])
-
-        # Preprocess features for ML model
-        X_list = df.apply(preprocess_row, axis=1).tolist()
-
-        # Raw feature column names (from database)
-        raw_columns = [
-            "ipv4_src_addr", "ipv4_dst_addr", "l4_src_port", "l4_dst_port",
-            "protocol", "tcp_flags", "in_bytes", "in_pkts",
-            "flow_duration_ms", "bytes_per_second", "avg_throughput_bps"
-        ]
-
-        # Rename columns to match the model's training feature names exactly
-        model_features = [
-            "IPV4_SRC_ADDR", "IPV4_DST_ADDR", "L4_SRC_PORT", "L4_DST_PORT",
-            "PROTOCOL", "TCP_FLAGS", "IN_BYTES", "IN_PKTS",
-            "FLOW_DURATION_MILLISECONDS", "SRC_TO_DST_SECOND_BYTES", "SRC_TO_DST_AVG_THROUGHPUT"
-        ]
-
-        X_df = pd.DataFrame(X_list, columns=raw_columns)
-        X_df.columns = model_features  # Rename to match training data
-
-        dmatrix = xgb.DMatrix(X_df, feature_names=model_features)
-        preds = model.predict(dmatrix)
-
-        df["prediction"] = ["Malicious" if p >= 0.5 else "Benign" for p in preds]
-        df = df.replace({float('nan'): None})
-
-        records = df.to_dict(orient="records")
-        return jsonify(records)
+        df = pd.read_sql(query, get_engine(), params=params)
+        cursor = encode_cursor(df.iloc[-1]) if len(df) else None
+        return frame_response(df.drop(columns=["ingested_at"]), prediction_records,
+                              meta={"next_before": cursor})
 
     except Exception as e:
+        # Not a 200, so the cache doesn't keep it
         print("Error in /flows_with_predictions:", e)
-        return jsonify([])
+        return jsonify({"error": str(e)}), 500
 
 
 # === Route: ML Predictions Page ===
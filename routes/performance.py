@@ -1,61 +1,89 @@
 from flask import Blueprint, render_template
-import psycopg2
-import numpy as np
+from sqlalchemy import text
+
+from db import get_engine
+from cache import cached
 
 performance_bp = Blueprint('performance', __name__)
 
-@performance_bp.route("/performance")
-def performance():
-    conn = psycopg2.connect(
-        dbname="network_db", user="postgres", password="postgres", host="localhost", port="5432"
-    )
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT time_first, in_bytes, in_pkts, flow_duration_ms, tcp_flags
+HISTOGRAM_BINS = 50
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Flows of the last 30 minutes; a missing or zero duration counts as 1 ms
+RECENT_FLOWS = """
+    WITH f AS (
+        SELECT COALESCE(NULLIF(flow_duration_ms, 0), 1) AS duration,
+               COALESCE(in_bytes, 0) AS bytes,
+               COALESCE(in_pkts, 0) AS pkts,
+               COALESCE(tcp_flags, 0) AS tcp_flags
         FROM network_flows
         WHERE time_first > NOW() - INTERVAL '30 minutes'
-    """)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    flows = []
-    for row in rows:
-        flows.append({
-            "time_first": row[0],
-            "in_bytes": row[1] or 0,
-            "in_pkts": row[2] or 0,
-            "flow_duration_ms": row[3] or 1,
-            "tcp_flags": row[4] or 0
-        })
-
-    durations = [flow['flow_duration_ms'] for flow in flows if flow['flow_duration_ms'] is not None]
-    bytes_per_second_list = [(flow['in_bytes'] / (flow['flow_duration_ms'] / 1000.0)) if flow['flow_duration_ms'] > 0 else 0 for flow in flows]
-    packets_per_second_list = [(flow['in_pkts'] / (flow['flow_duration_ms'] / 1000.0)) if flow['flow_duration_ms'] > 0 else 0 for flow in flows]
-
-    avg_duration = np.mean(durations) if durations else 0
-    min_duration = np.min(durations) if durations else 0
-    max_duration = np.max(durations) if durations else 0
-    stddev_duration = np.std(durations) if durations else 0
-    tiny_flows_percentage = (sum(1 for d in durations if d < 100) / len(durations)) * 100 if durations else 0
-
-    tcp_flag_counts = {}
-    for flow in flows:
-        flag = flow['tcp_flags']
-        tcp_flag_counts[flag] = tcp_flag_counts.get(flag, 0) + 1
-
-    zero_byte_flows = sum(1 for flow in flows if flow['in_bytes'] == 0)
-    one_packet_flows = sum(1 for flow in flows if flow['in_pkts'] == 1)
+    )
+"""
+
+SUMMARY_QUERY = text(RECENT_FLOWS + """
+    SELECT COUNT(*) AS flows,
+           AVG(duration) AS avg_duration,
+           MIN(duration) AS min_duration,
+           MAX(duration) AS max_duration,
+           STDDEV_POP(duration) AS stddev_duration,
+           100.0 * AVG((duration < 100)::int) AS tiny_flows_percentage,
+           COUNT(*) FILTER (WHERE bytes = 0) AS zero_byte_flows,
+           COUNT(*) FILTER (WHERE pkts = 1) AS one_packet_flows,
+           PERCENTILE_CONT(CAST(:percentiles AS float8[])) WITHIN GROUP (ORDER BY duration) AS duration_pct,
+           PERCENTILE_CONT(CAST(:percentiles AS float8[])) WITHIN GROUP (ORDER BY bytes * 1000.0 / duration) AS bps_pct,
+           PERCENTILE_CONT(CAST(:percentiles AS float8[])) WITHIN GROUP (ORDER BY pkts * 1000.0 / duration) AS pps_pct
+    FROM f
+""")
+
+# Equal-width duration bins from 0 to the window's longest flow
+HISTOGRAM_QUERY = text(RECENT_FLOWS + """
+    , bounds AS (SELECT MAX(duration) + 1 AS hi FROM f)
+    SELECT width_bucket(duration, 0, bounds.hi, :bins) AS bin,
+           MIN(bounds.hi) AS hi,
+           COUNT(*) AS flows
+    FROM f, bounds
+    GROUP BY bin
+    ORDER BY bin
+""")
+
+TCP_FLAGS_QUERY = text(RECENT_FLOWS + """
+    SELECT tcp_flags, COUNT(*) AS flows
+    FROM f
+    GROUP BY tcp_flags
+    ORDER BY flows DESC
+""")
+
+
+@performance_bp.route("/performance")
+@cached()
+def performance():
+    with get_engine().connect() as conn:
+        summary = conn.execute(SUMMARY_QUERY, {"percentiles": list(PERCENTILES)}).mappings().one()
+        bins = conn.execute(HISTOGRAM_QUERY, {"bins": HISTOGRAM_BINS}).fetchall()
+        flags = conn.execute(TCP_FLAGS_QUERY).fetchall()
+
+    def pct(name):
+        return dict(zip(("p50", "p90", "p99"), summary[name] or (0, 0, 0)))
+
+    # Fixed number of bins whatever the flow count: counts plus bin edges
+    width = float(bins[0].hi) / HISTOGRAM_BINS if bins else 1.0
+    counts = [0] * HISTOGRAM_BINS
+    for row in bins:
+        counts[min(row.bin, HISTOGRAM_BINS) - 1] += row.flows
+    histogram = {"start": [i * width for i in range(HISTOGRAM_BINS)], "width": width, "counts": counts}
 
     return render_template('performance.html',
-                           avg_duration=avg_duration,
-                           min_duration=min_duration,
-                           max_duration=max_duration,
-                           stddev_duration=stddev_duration,
-                           tiny_flows_percentage=tiny_flows_percentage,
-                           tcp_flag_counts=tcp_flag_counts,
-                           durations=durations,
-                           bytes_per_second_list=bytes_per_second_list,
-                           packets_per_second_list=packets_per_second_list,
-                           zero_byte_flows=zero_byte_flows,
-                           one_packet_flows=one_packet_flows)
+                           flows=summary["flows"],
+                           avg_duration=float(summary["avg_duration"] or 0),
+                           min_duration=summary["min_duration"] or 0,
+                           max_duration=summary["max_duration"] or 0,
+                           stddev_duration=float(summary["stddev_duration"] or 0),
+                           tiny_flows_percentage=float(summary["tiny_flows_percentage"] or 0),
+                           duration_percentiles=pct("duration_pct"),
+                           bytes_per_second_percentiles=pct("bps_pct"),
+                           packets_per_second_percentiles=pct("pps_pct"),
+                           tcp_flag_counts={row.tcp_flags: row.flows for row in flags},
+                           duration_histogram=histogram,
+                           zero_byte_flows=summary["zero_byte_flows"],
+                           one_packet_flows=summary["one_packet_flows"])
@@ -0,0 +1,40 @@
+from flask import Blueprint, jsonify, request
+
+from db import get_engine
+from cache import cached
+from sketches import DIMENSIONS, WEIGHTS, load_window
+
+sketch_bp = Blueprint('sketches', __name__)
+
+MAX_MINUTES = 360
+MAX_KEYS = 100
+
+
+# -------------------
+# API: heavy hitters of one dimension (src, dst, dst_port, pair) over the
+# last `minutes`, from the ingest sketches. With `key`, the estimate for that
+# key instead. Estimates only ever overcount (see sketches.FlowSketch.top).
+# -------------------
+@sketch_bp.route("/api/sketches/<dimension>")
+@cached()
+def heavy_hitters(dimension):
+    weight = request.args.get("weight", "flows")
+    if dimension not in DIMENSIONS or weight not in WEIGHTS:
+        return jsonify({"error": f"dimension must be one of {list(DIMENSIONS)}, "
+                                 f"weight one of {list(WEIGHTS)}"}), 400
+    minutes = min(max(request.args.get("minutes", 30, type=int), 1), MAX_MINUTES)
+    n = min(max(request.args.get("n", 10, type=int), 1), MAX_KEYS)
+    key = request.args.get("key")
+
+    sketch = load_window(get_engine(), minutes, request.args.get("flow_monitor") or None)
+    if sketch is None:
+        return jsonify({"error": "no sketches for this window"}), 404
+
+    payload = {"dimension": dimension, "weight": weight, "minutes": minutes,
+               "rows": sketch.rows, "distinct": sketch.distinct(dimension)}
+    if key is not None:
+        payload["key"] = key
+        payload["estimate"] = sketch.estimate(dimension, key, weight)
+    else:
+        payload["top"] = [{"key": k, weight: count} for k, count in sketch.top(dimension, weight, n)]
+    return jsonify(payload)
@@ -1,46 +1,68 @@
-from flask import Blueprint, render_template
-import psycopg2
-import pandas as pd
+from flask import Blueprint, render_template, request
+import numpy as np
+from sqlalchemy import text
+
+from db import get_engine
+from cache import cached
 
 temporal_bp = Blueprint('temporal', __name__)
 
+WINDOWS = (7, 30, 90)
+MAX_DAYS = 365
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+HOURS = list(range(24))
+
+# 7x24 cells from the hourly rollup: at most days x 24 buckets per group
+# are read, never the raw flows
+HEATMAP_QUERY = """
+    SELECT (EXTRACT(ISODOW FROM bucket AT TIME ZONE 'UTC') - 1)::int AS day,
+           EXTRACT(HOUR FROM bucket AT TIME ZONE 'UTC')::int AS hour,
+           SUM(flows) AS flows
+    FROM flows_1h
+    WHERE bucket >= time_bucket('1 hour', NOW() - make_interval(days => :days))
+    {filters}
+    GROUP BY day, hour
+"""
+
+OPTIONS_QUERY = text("""
+    SELECT DISTINCT direction, application_name
+    FROM flows_1h
+    WHERE bucket >= time_bucket('1 hour', NOW() - make_interval(days => :days))
+""")
+
+
 @temporal_bp.route("/temporal")
+@cached()
 def temporal():
-    conn = psycopg2.connect(
-        dbname="network_db", user="postgres", password="postgres", host="localhost", port="5432"
-    )
-    query = """
-        SELECT time_first
-        FROM network_flows
-        WHERE time_first > NOW() - INTERVAL '7 days'
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    if df.empty:
-        flows_by_hour = {}
-        flows_by_day = {}
-        heatmap_data = []
-    else:
-        df['time_first'] = pd.to_datetime(df['time_first'])
-        df['hour'] = df['time_first'].dt.hour
-        df['day_of_week'] = df['time_first'].dt.dayofweek
-
-        # Flows by Hour
-        flows_by_hour = df['hour'].value_counts().sort_index().to_dict()
-
-        # Flows by Day
-        flows_by_day = df['day_of_week'].value_counts().sort_index().to_dict()
-
-        # Heatmap Data
-        heatmap_df = df.groupby(['day_of_week', 'hour']).size().unstack(fill_value=0)
-        heatmap_data = heatmap_df.values.tolist()
-        heatmap_days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-        heatmap_hours = list(range(24))
+    days = min(max(request.args.get("days", WINDOWS[0], type=int), 1), MAX_DAYS)
+    direction = request.args.get("direction") or None
+    application = request.args.get("application") or None
+
+    filters, params = "", {"days": days}
+    if direction:
+        filters += " AND direction = :direction"
+        params["direction"] = direction
+    if application:
+        filters += " AND application_name = :application"
+        params["application"] = application
+
+    with get_engine().connect() as conn:
+        cells = conn.execute(text(HEATMAP_QUERY.format(filters=filters)), params).fetchall()
+        options = conn.execute(OPTIONS_QUERY, {"days": days}).fetchall()
+
+    heatmap = np.zeros((len(DAYS), len(HOURS)), dtype=np.int64)
+    for row in cells:
+        heatmap[row.day, row.hour] = row.flows
 
     return render_template('temporal.html',
-                           flows_by_hour=flows_by_hour,
-                           flows_by_day=flows_by_day,
-                           heatmap_data=heatmap_data,
-                           heatmap_days=heatmap_days,
-                           heatmap_hours=heatmap_hours)
+                           flows_by_hour=dict(zip(HOURS, heatmap.sum(axis=0).tolist())),
+                           flows_by_day=dict(zip(DAYS, heatmap.sum(axis=1).tolist())),
+                           heatmap_data=heatmap.tolist(),
+                           heatmap_days=DAYS,
+                           heatmap_hours=HOURS,
+                           days=days,
+                           windows=WINDOWS,
+                           direction=direction,
+                           application=application,
+                           directions=sorted({r.direction for r in options if r.direction}),
+                           applications=sorted({r.application_name for r in options if r.application_name}))
@@ -0,0 +1,298 @@
+from dataclasses import dataclass
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+load_dotenv()
+
+MIGRATION_LOCK_ID = 7_401_132   # pg_advisory_lock key, so two processes don't migrate at once
+
+
+@dataclass(frozen=True)
+class Migration:
+    name: str
+    statements: List[str]
+    # False for statements PostgreSQL refuses to run in a transaction block
+    # (such as CALL refresh_continuous_aggregate); they are then run one by
+    # one with autocommit, so they must be safe to repeat after a failure
+    transactional: bool = True
+
+
+# ======================================
+# network_flows
+# ======================================
+# Every dashboard query filters on time_first, so that is the partitioning
+# column; `time` (the scrape time, = time_last) would leave the planner
+# unable to exclude chunks for those filters.
+CHUNK_INTERVAL  = "1 day"
+COMPRESS_AFTER  = "7 days"
+RETAIN_FOR      = "90 days"
+
+FLOWS_TABLE = """
+    CREATE TABLE IF NOT EXISTS network_flows (
+        ipv4_src_addr      TEXT,
+        ipv4_dst_addr      TEXT,
+        l4_src_port        INTEGER,
+        l4_dst_port        INTEGER,
+        protocol           INTEGER,
+        tcp_flags          INTEGER,
+        in_bytes           BIGINT,
+        in_pkts            BIGINT,
+        flow_duration_ms   DOUBLE PRECISION,
+        bytes_per_second   DOUBLE PRECISION,
+        avg_throughput_bps DOUBLE PRECISION,
+        application_name   TEXT,
+        ingress_if         INTEGER,
+        egress_if          INTEGER,
+        direction          TEXT,
+        flow_monitor       TEXT,
+        time               TIMESTAMPTZ,
+        time_first         TIMESTAMPTZ NOT NULL,
+        time_last          TIMESTAMPTZ
+    )
+"""
+
+# Converts an existing plain table in place; refuses to guess with one that
+# is already a hypertable on another column, since that needs a rebuild.
+FLOWS_HYPERTABLE = f"""
+    DO $$
+    DECLARE
+        partitioned_on TEXT;
+    BEGIN
+        SELECT column_name INTO partitioned_on
+        FROM timescaledb_information.dimensions
+        WHERE hypertable_name = 'network_flows' AND dimension_number = 1;
+
+        IF partitioned_on IS NULL THEN
+            PERFORM create_hypertable('network_flows', 'time_first',
+                                      chunk_time_interval => INTERVAL '{CHUNK_INTERVAL}',
+                                      migrate_data => TRUE);
+        ELSIF partitioned_on <> 'time_first' THEN
+            RAISE EXCEPTION 'network_flows is partitioned on %, expected time_first; '
+                            'copy it into a table partitioned on time_first first',
+                            partitioned_on;
+        END IF;
+    END
+    $$
+"""
+
+FLOWS_MIGRATIONS = [
+    Migration("0001_network_flows_hypertable", [
+        "CREATE EXTENSION IF NOT EXISTS timescaledb",
+        FLOWS_TABLE,
+        FLOWS_HYPERTABLE,
+    ]),
+    Migration("0002_network_flows_indexes", [
+        # Top talkers / geomap / per-host drilldowns
+        "CREATE INDEX IF NOT EXISTS network_flows_src_time_idx "
+        "ON network_flows (ipv4_src_addr, time_first DESC)",
+        # Application breakdowns
+        "CREATE INDEX IF NOT EXISTS network_flows_app_time_idx "
+        "ON network_flows (application_name, time_first DESC)",
+    ]),
+    Migration("0003_network_flows_compression", [
+        """
+        ALTER TABLE network_flows SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'flow_monitor',
+            timescaledb.compress_orderby   = 'time_first DESC'
+        )
+        """,
+        f"SELECT add_compression_policy('network_flows', INTERVAL '{COMPRESS_AFTER}', "
+        f"if_not_exists => TRUE)",
+    ]),
+    Migration("0004_network_flows_retention", [
+        f"SELECT add_retention_policy('network_flows', INTERVAL '{RETAIN_FOR}', "
+        f"if_not_exists => TRUE)",
+    ]),
+    # Written once at ingest by scoring.FlowScorer
+    Migration("0005_network_flows_predictions", [
+        """
+        ALTER TABLE network_flows
+            ADD COLUMN IF NOT EXISTS ml_probability REAL,
+            ADD COLUMN IF NOT EXISTS ml_label       TEXT,
+            ADD COLUMN IF NOT EXISTS model_version  TEXT
+        """,
+        "CREATE INDEX IF NOT EXISTS network_flows_label_time_idx "
+        "ON network_flows (ml_label, time_first DESC)",
+    ]),
+    # Commit time of the COPY that wrote each row (the column is left out of
+    # the COPY so the default fills it), sent in the batch NOTIFY so the
+    # detector reads back exactly that batch. The default is set separately
+    # so existing, possibly compressed, rows aren't rewritten; they stay NULL.
+    Migration("0006_network_flows_ingested_at", [
+        "ALTER TABLE network_flows ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ",
+        "ALTER TABLE network_flows ALTER COLUMN ingested_at SET DEFAULT now()",
+        "CREATE INDEX IF NOT EXISTS network_flows_ingested_idx "
+        "ON network_flows (ingested_at DESC)",
+    ]),
+]
+
+
+# ======================================
+# Rollups
+# ======================================
+# view -> (bucket width, refresh window start, policy schedule)
+#
+# Delta rows for long-lived flows keep the flow's original time_first, so
+# they can land well behind the materialization watermark. The refresh
+# window reaches back far enough to pick those up; anything newer than the
+# watermark is aggregated from raw rows at query time (real-time aggregates).
+ROLLUPS = {
+    "flows_30s": ("30 seconds", "3 hours", "30 seconds"),
+    "flows_1m":  ("1 minute",   "3 hours", "1 minute"),
+    "flows_5m":  ("5 minutes",  "6 hours", "5 minutes"),
+    # /temporal heatmap. The window reaches back to just inside raw retention
+    # so existing history is materialized by the first run (later runs only
+    # redo invalidated ranges); buckets stay after their raw chunks are dropped
+    "flows_1h":  ("1 hour",     "89 days", "30 minutes"),
+}
+
+
+def rollup_statements(view: str, width: str, start_offset: str, schedule: str) -> List[str]:
+    """Continuous aggregate of network_flows by bucket, direction, interface and application.
+
+    Only sums and counts are stored, so any coarser grouping (and averages,
+    as ``throughput_sum / throughput_count``) can be rebuilt from the view.
+    """
+    return [
+        f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+        WITH (timescaledb.continuous) AS
+        SELECT
+            time_bucket('{width}', time_first) AS bucket,
+            direction,
+            ingress_if,
+            application_name,
+            SUM(in_bytes)                 AS bytes,
+            SUM(in_pkts)                  AS packets,
+            COUNT(*)                      AS flows,
+            SUM(avg_throughput_bps)       AS throughput_sum,
+            COUNT(avg_throughput_bps)     AS throughput_count
+        FROM network_flows
+        GROUP BY bucket, direction, ingress_if, application_name
+        WITH NO DATA
+        """,
+        f"ALTER MATERIALIZED VIEW {view} SET (timescaledb.materialized_only = false)",
+        f"""
+        SELECT add_continuous_aggregate_policy('{view}',
+            start_offset      => INTERVAL '{start_offset}',
+            end_offset        => INTERVAL '{width}',
+            schedule_interval => INTERVAL '{schedule}',
+            if_not_exists     => TRUE)
+        """,
+    ]
+
+
+ROLLUP_MIGRATIONS = [
+    Migration(f"{101 + i:04d}_rollup_{view}", rollup_statements(view, *spec))
+    for i, (view, spec) in enumerate(ROLLUPS.items())
+] + [
+    # The views are created WITH NO DATA and their policies only refresh
+    # inside start_offset, so history older than that reads as gaps (chart
+    # endpoints send week-long ranges to flows_5m). Materialize all of it once.
+    Migration("0105_rollup_backfill", [
+        f"CALL refresh_continuous_aggregate('{view}', NULL, now() - INTERVAL '{width}')"
+        for view, (width, _, _) in ROLLUPS.items()
+    ], transactional=False),
+]
+
+
+# ======================================
+# Sketches
+# ======================================
+# One summary per minute of ingest and flow monitor, merged into by every
+# COPY in that minute (sketches.write_sketches); a window merges the rows
+# inside it.
+SKETCH_CHUNK_INTERVAL = "1 day"
+SKETCH_RETAIN_FOR     = "2 days"   # windows are at most routes.sketches.MAX_MINUTES long
+
+SKETCH_MIGRATIONS = [
+    Migration("0201_flow_sketches", [
+        """
+        CREATE TABLE IF NOT EXISTS flow_sketches (
+            bucket       TIMESTAMPTZ NOT NULL,
+            flow_monitor TEXT        NOT NULL,
+            rows         INTEGER     NOT NULL,
+            sketch       BYTEA       NOT NULL
+        )
+        """,
+        f"SELECT create_hypertable('flow_sketches', 'bucket', "
+        f"chunk_time_interval => INTERVAL '{SKETCH_CHUNK_INTERVAL}', if_not_exists => TRUE)",
+        # One row per ingest minute and monitor, merged into by sketches.write_sketches
+        "CREATE UNIQUE INDEX IF NOT EXISTS flow_sketches_monitor_bucket_key "
+        "ON flow_sketches (flow_monitor, bucket DESC)",
+        f"SELECT add_retention_policy('flow_sketches', INTERVAL '{SKETCH_RETAIN_FOR}', "
+        f"if_not_exists => TRUE)",
+    ]),
+]
+
+MIGRATIONS: List[Migration] = FLOWS_MIGRATIONS + ROLLUP_MIGRATIONS + SKETCH_MIGRATIONS
+
+
+# ======================================
+# Runner
+# ======================================
+def migrate(engine: Engine, migrations: List[Migration]=MIGRATIONS) -> List[str]:
+    """Apply every migration not yet recorded in ``schema_migrations``, in list order.
+
+    Each migration runs in its own transaction together with its
+    bookkeeping row, so a failure leaves it unapplied. Non-transactional
+    ones run with autocommit on a second connection and are recorded once
+    every statement has succeeded. Returns the names of the migrations
+    applied by this call.
+    """
+    applied = []
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    name       TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """))
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        conn.commit()
+        try:
+            done = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+            conn.commit()
+            for migration in migrations:
+                if migration.name in done:
+                    continue
+                if not migration.transactional:
+                    _run_autocommit(engine, migration.statements)
+                with conn.begin():
+                    # The pool's statement_timeout is meant for dashboard queries
+                    conn.execute(text("SET LOCAL statement_timeout = 0"))
+                    if migration.transactional:
+                        for statement in migration.statements:
+                            conn.exec_driver_sql(statement)
+                    conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"),
+                                 {"name": migration.name})
+                print(f"Applied migration {migration.name}")
+                applied.append(migration.name)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+    return applied
+
+
+def _run_autocommit(engine: Engine, statements: List[str]):
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("SET statement_timeout = 0")
+        try:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+        finally:
+            # Back to the pool's default before the connection is reused
+            conn.exec_driver_sql("RESET statement_timeout")
+
+
+if __name__ == "__main__":
+    from db import get_engine
+
+    names = migrate(get_engine())
+    print(f"{len(names)} migration(s) applied" if names else "Schema is up to date")
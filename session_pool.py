@@ -0,0 +1,129 @@
+import time
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from netmiko import ConnectHandler
+
+MAX_SESSIONS_PER_DEVICE = 1     # routers tolerate few concurrent vty sessions
+HEALTH_CHECK_AFTER_S    = 30.0  # probe sessions idle longer than this
+MAX_IDLE_S              = 600.0
+MAX_LIFETIME_S          = 3600.0
+
+
+@dataclass
+class Session:
+    """A pooled netmiko connection plus its bookkeeping."""
+    conn: Any
+    created: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def device_key(params: Dict[str, Any]) -> Tuple:
+    return (params.get("host"), params.get("port"), params.get("username"))
+
+
+class SessionPool:
+    """Keeps SSH sessions open across polls instead of logging in every time.
+
+    Sessions are checked out with :meth:`session`. Idle sessions are probed
+    with ``is_alive()`` before reuse, recycled after ``max_idle``/``max_lifetime``,
+    and discarded when the caller raises, so the next poll reconnects cleanly.
+    At most ``max_per_device`` sessions are open to any one device; further
+    callers wait for one to be returned.
+    """
+
+    def __init__(self, max_per_device: int=MAX_SESSIONS_PER_DEVICE,
+                 health_check_after: float=HEALTH_CHECK_AFTER_S,
+                 max_idle: float=MAX_IDLE_S,
+                 max_lifetime: float=MAX_LIFETIME_S,
+                 connect: Callable[..., Any]=ConnectHandler):
+        self.max_per_device = max_per_device
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._connect = connect
+        self._idle: Dict[Tuple, List[Session]] = {}
+        self._open: Dict[Tuple, int] = {}
+        self._cond = threading.Condition()
+        self.stats = {"connects": 0, "reuses": 0, "discards": 0}
+
+    @contextmanager
+    def session(self, params: Dict[str, Any], timeout: float=None) -> Iterator[Any]:
+        """Check out a live connection to the device described by ``params``."""
+        key = device_key(params)
+        sess = self._checkout(key, params, timeout)
+        try:
+            yield sess.conn
+        except Exception:
+            self._discard(key, sess)
+            raise
+        else:
+            sess.last_used = time.monotonic()
+            with self._cond:
+                self._idle.setdefault(key, []).append(sess)
+                self._cond.notify_all()
+
+    def close_all(self):
+        with self._cond:
+            sessions = [(k, s) for k, idle in self._idle.items() for s in idle]
+            self._idle.clear()
+        for key, sess in sessions:
+            self._discard(key, sess)
+
+    def _checkout(self, key: Tuple, params: Dict[str, Any], timeout: float) -> Session:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                idle = self._idle.get(key)
+                if idle:
+                    sess = idle.pop()
+                elif self._open.get(key, 0) < self.max_per_device:
+                    # Reserve the slot before connecting outside the lock
+                    self._open[key] = self._open.get(key, 0) + 1
+                    sess = None
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No free SSH session for {key[0]}")
+                    self._cond.wait(remaining)
+                    continue
+
+            if sess is None:
+                try:
+                    conn = self._connect(**params)
+                except Exception:
+                    self._release_slot(key)
+                    raise
+                self.stats["connects"] += 1
+                return Session(conn)
+
+            if self._usable(sess):
+                self.stats["reuses"] += 1
+                return sess
+            self._discard(key, sess)
+
+    def _usable(self, sess: Session) -> bool:
+        now = time.monotonic()
+        if now - sess.created > self.max_lifetime or now - sess.last_used > self.max_idle:
+            return False
+        if now - sess.last_used > self.health_check_after:
+            try:
+                return sess.conn.is_alive()
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, key: Tuple, sess: Session):
+        self.stats["discards"] += 1
+        try:
+            sess.conn.disconnect()
+        except Exception:
+            pass
+        self._release_slot(key)
+
+    def _release_slot(self, key: Tuple):
+        with self._cond:
+            self._open[key] = max(0, self._open.get(key, 0) - 1)
+            self._cond.notify_all()
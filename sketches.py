@@ -0,0 +1,231 @@
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from psycopg2 import Binary
+from sqlalchemy import text
+
+from config import get_sketch_config
+from utils.sketches import CountMinSketch, HyperLogLog, SpaceSaving, from_arrays, hash_keys, to_arrays
+
+# dimension -> flow columns making up its key (joined with PAIR_SEPARATOR)
+DIMENSIONS = {
+    "src":      ["ipv4_src_addr"],
+    "dst":      ["ipv4_dst_addr"],
+    "dst_port": ["l4_dst_port"],
+    "pair":     ["ipv4_src_addr", "ipv4_dst_addr"],
+}
+# weight -> what each flow row adds to its key
+WEIGHTS = ("flows", "bytes")
+PAIR_SEPARATOR = "|"
+
+# One row per minute of ingest (the writing transaction's now()) and flow
+# monitor. Every batch committed in that minute is merged into it.
+BUCKET_SQL = "time_bucket('1 minute', now())"
+SELECT_SQL = f"""
+    SELECT sketch FROM flow_sketches
+    WHERE flow_monitor = %s AND bucket = {BUCKET_SQL}
+    FOR UPDATE
+"""
+INSERT_SQL = f"""
+    INSERT INTO flow_sketches (bucket, flow_monitor, rows, sketch)
+    VALUES ({BUCKET_SQL}, %s, %s, %s)
+    ON CONFLICT (flow_monitor, bucket) DO NOTHING
+"""
+UPDATE_SQL = f"""
+    UPDATE flow_sketches SET rows = %s, sketch = %s
+    WHERE flow_monitor = %s AND bucket = {BUCKET_SQL}
+"""
+WINDOW_QUERY = """
+    SELECT sketch
+    FROM flow_sketches
+    WHERE bucket >= time_bucket('1 minute', NOW() - make_interval(mins => :minutes))
+      AND (CAST(:flow_monitor AS TEXT) IS NULL OR flow_monitor = :flow_monitor)
+"""
+
+
+def dimension_keys(df: pd.DataFrame, dimension: str) -> pd.Series:
+    """String keys of ``dimension`` for each row of ``df``; rows missing a part are dropped."""
+    parts = []
+    for col in DIMENSIONS[dimension]:
+        values = df[col]
+        if col == "l4_dst_port":
+            values = pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        parts.append(values.astype("string"))
+    keys = parts[0]
+    for part in parts[1:]:
+        keys = keys + PAIR_SEPARATOR + part
+    return keys.dropna().astype(object)
+
+
+class FlowSketch:
+    """Per-dimension summaries of a set of flows, mergeable with any other.
+
+    For each dimension in :data:`DIMENSIONS` it keeps, per weight in
+    :data:`WEIGHTS`, a Count-Min sketch (point estimates for any key) and a
+    Space-Saving summary (the heavy hitters), plus one HyperLogLog of
+    distinct keys. Its size depends only on the parameters, not on how
+    many flows were added.
+    """
+
+    def __init__(self, cms_width: int=1024, cms_depth: int=4, top_k: int=100, hll_precision: int=12):
+        self.params = (cms_width, cms_depth, top_k, hll_precision)
+        self.rows = 0
+        self.cms = {(d, w): CountMinSketch(cms_width, cms_depth) for d in DIMENSIONS for w in WEIGHTS}
+        self.top_k = {(d, w): SpaceSaving(top_k) for d in DIMENSIONS for w in WEIGHTS}
+        self.hll = {d: HyperLogLog(hll_precision) for d in DIMENSIONS}
+        self._ranked: Dict[Tuple[str, str], List[Tuple[str, int]]] = {}
+
+    @classmethod
+    def from_config(cls) -> "FlowSketch":
+        cfg = get_sketch_config()
+        return cls(cfg['cms_width'], cfg['cms_depth'], cfg['top_k'], cfg['hll_precision'])
+
+    def add(self, df: pd.DataFrame):
+        self.rows += len(df)
+        self._ranked.clear()
+        weights = {"flows": pd.Series(1, index=df.index, dtype=np.int64),
+                   "bytes": pd.to_numeric(df["in_bytes"], errors="coerce").fillna(0).astype(np.int64)}
+        for d in DIMENSIONS:
+            keys = dimension_keys(df, d)
+            if keys.empty:
+                continue
+            hashes = hash_keys(keys.to_numpy())
+            self.hll[d].add(hashes)
+            for w in WEIGHTS:
+                values = weights[w].loc[keys.index].to_numpy()
+                self.cms[d, w].add(hashes, values)
+                self.top_k[d, w].add(keys.to_numpy(), values)
+
+    def merge(self, other: "FlowSketch") -> "FlowSketch":
+        return FlowSketch.merge_all([self, other])
+
+    @classmethod
+    def merge_all(cls, sketches: List["FlowSketch"]) -> "FlowSketch":
+        """One sketch of everything ``sketches`` summarize (merged in one pass, not pairwise)."""
+        params = sketches[0].params
+        for s in sketches:
+            if s.params != params:
+                raise ValueError(f"Can't merge sketches with parameters {params} and {s.params}")
+        merged = cls(*params)
+        merged.rows = sum(s.rows for s in sketches)
+        merged.cms = {k: CountMinSketch.merge_all([s.cms[k] for s in sketches]) for k in merged.cms}
+        merged.top_k = {k: SpaceSaving.merge_all([s.top_k[k] for s in sketches]) for k in merged.top_k}
+        merged.hll = {k: HyperLogLog.merge_all([s.hll[k] for s in sketches]) for k in merged.hll}
+        return merged
+
+    def top(self, dimension: str, weight: str="flows", n: int=10) -> List[Tuple[str, int]]:
+        """The ``n`` heaviest keys of ``dimension`` as ``(key, estimate)``, heaviest first.
+
+        Both summaries only overestimate, so each estimate is the smaller of
+        the Space-Saving count and the Count-Min estimate. The ranking of all
+        ``top_k`` keys is computed once and reused until the next :meth:`add`.
+        """
+        ranked = self._ranked.get((dimension, weight))
+        if ranked is None:
+            heavy = self.top_k[dimension, weight].top(self.params[2])
+            cms = self.cms[dimension, weight].estimate(hash_keys([key for key, _, _ in heavy]))
+            ranked = sorted(((key, min(count, int(c))) for (key, count, _), c in zip(heavy, cms)),
+                            key=lambda kv: -kv[1])
+            self._ranked[dimension, weight] = ranked
+        return ranked[:n]
+
+    def estimate(self, dimension: str, key: str, weight: str="flows") -> int:
+        return int(self.cms[dimension, weight].estimate(hash_keys([key]))[0])
+
+    def distinct(self, dimension: str) -> int:
+        return self.hll[dimension].count()
+
+    def to_bytes(self) -> bytes:
+        arrays = {"params": np.array(self.params, dtype=np.int64), "rows": np.int64(self.rows)}
+        for (d, w), s in self.cms.items():
+            arrays.update(to_arrays(f"{d}.{w}.", s))
+        for (d, w), s in self.top_k.items():
+            arrays.update(to_arrays(f"{d}.{w}.", s))
+        for d, s in self.hll.items():
+            arrays.update(to_arrays(f"{d}.", s))
+        buf = io.BytesIO()
+        np.savez_compressed(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FlowSketch":
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            arrays = dict(npz)
+        sketch = cls(*(int(p) for p in arrays["params"]))
+        sketch.rows = int(arrays["rows"])
+        for d in DIMENSIONS:
+            for w in WEIGHTS:
+                sketch.cms[d, w] = from_arrays(f"{d}.{w}.", _only(arrays, f"{d}.{w}.cms"))
+                sketch.top_k[d, w] = from_arrays(f"{d}.{w}.", _only(arrays, f"{d}.{w}.ss_"))
+            sketch.hll[d] = from_arrays(f"{d}.", _only(arrays, f"{d}.hll"))
+        return sketch
+
+
+def _only(arrays: Dict[str, np.ndarray], prefix: str) -> Dict[str, np.ndarray]:
+    return {name: value for name, value in arrays.items() if name.startswith(prefix)}
+
+
+def split_pair(key: str) -> Tuple[str, str]:
+    src, _, dst = key.partition(PAIR_SEPARATOR)
+    return src, dst
+
+
+# ======================================
+# Storage (flow_sketches, see schema.SKETCH_MIGRATIONS)
+# ======================================
+def build_sketches(df: pd.DataFrame) -> Dict[str, FlowSketch]:
+    """One sketch of ``df`` per flow monitor ('' for rows without one)."""
+    monitors = df["flow_monitor"].fillna("") if "flow_monitor" in df else pd.Series("", index=df.index)
+    sketches = {}
+    for monitor, part in df.groupby(monitors, sort=False):
+        sketches[monitor] = FlowSketch.from_config()
+        sketches[monitor].add(part)
+    return sketches
+
+
+def write_sketches(cur, sketches: Dict[str, FlowSketch]) -> int:
+    """Merge ``sketches`` (see :func:`build_sketches`) into the current minute's rows.
+
+    Each flow monitor has at most one row per minute, so a window costs the
+    same to read however many batches were committed in it. The row is
+    locked while it is merged; a stored sketch with other parameters than
+    the new one is replaced. Runs on the caller's cursor, so the sketches
+    commit or roll back with the flows they summarize. Returns the number
+    of rows inserted or updated.
+    """
+    for monitor, sketch in sketches.items():
+        while True:
+            cur.execute(SELECT_SQL, (monitor,))
+            row = cur.fetchone()
+            if row is not None:
+                stored = FlowSketch.from_bytes(bytes(row[0]))
+                if stored.params == sketch.params:
+                    sketch = stored.merge(sketch)
+                cur.execute(UPDATE_SQL, (sketch.rows, Binary(sketch.to_bytes()), monitor))
+                break
+            cur.execute(INSERT_SQL, (monitor, sketch.rows, Binary(sketch.to_bytes())))
+            if cur.rowcount:
+                break
+            # Another writer inserted the row since the SELECT; merge into theirs
+    return len(sketches)
+
+
+def load_window(engine, minutes: int=30, flow_monitor: Optional[str]=None) -> Optional[FlowSketch]:
+    """Merge the stored sketches of the last ``minutes`` (optionally one flow monitor).
+
+    Returns None when sketches are disabled or none were written in the
+    window, so callers can fall back to an exact query. A window is the
+    flows ingested in it, not the flows that started in it. Sketches written
+    with other parameters than the current ones are skipped.
+    """
+    if not get_sketch_config()['enabled']:
+        return None
+    with engine.connect() as conn:
+        blobs = [row[0] for row in conn.execute(text(WINDOW_QUERY),
+                                                {"minutes": minutes, "flow_monitor": flow_monitor})]
+    expected = FlowSketch.from_config().params
+    parts = [part for part in map(FlowSketch.from_bytes, map(bytes, blobs)) if part.params == expected]
+    return FlowSketch.merge_all(parts) if parts else None
+
@@ -15,29 +15,39 @@ const refreshBtn  = document.getElementById('refresh-btn');
 const countSpan   = document.getElementById('count-value');
 const lastFetched = document.getElementById('last-fetched');
 
+// Marker area grows with the flow count, within limits
+function radiusFor(flows) {
+  return Math.min(30, 5 + 3 * Math.log2(1 + flows));
+}
+
+function popupFor(loc) {
+  const place = [loc.city, loc.country].filter(Boolean).join(', ') || `${loc.lat}, ${loc.lon}`;
+  const top = loc.top_ips.map(t => `${t.ip} (${t.flows})`).join('<br>');
+  return `<strong>${place}</strong><br>` +
+         `${loc.flows} flows from ${loc.ips} source IP(s), ${loc.bytes.toLocaleString()} bytes<br>` +
+         `${new Date(loc.first_seen).toLocaleTimeString()} – ${new Date(loc.last_seen).toLocaleTimeString()}<br>` +
+         `<em>Top sources</em><br>${top}`;
+}
+
 // Function to load data and update the map
 async function loadData() {
   try {
-    const res   = await fetch('/api/geomap_data');
-    const flows = await res.json();
+    const res  = await fetch('/api/geomap_data');
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.error || res.statusText);
 
     // Clear old markers
     markers.clearLayers();
 
-    // Add new markers
-    flows.forEach(f => {
-      if (f.lat && f.lon) {
-        const m = L.circleMarker([f.lat, f.lon], { radius: 6 });
-        m.bindPopup(
-          `<strong>${f.ip}</strong><br>` +
-          `${new Date(f.time).toLocaleString()}`
-        );
-        markers.addLayer(m);
-      }
+    // One marker per location, sized by its flow count
+    data.locations.forEach(loc => {
+      const m = L.circleMarker([loc.lat, loc.lon], { radius: radiusFor(loc.flows) });
+      m.bindPopup(popupFor(loc));
+      markers.addLayer(m);
     });
 
     // Update counts and timestamp
-    countSpan.textContent   = flows.length;
+    countSpan.textContent   = `${data.flows} (${data.ips} IPs, ${data.locations.length} locations)`;
     lastFetched.textContent = new Date().toLocaleString();
   } catch (err) {
     console.error('Error loading data:', err);
@@ -4,10 +4,38 @@
 document.getElementById('btn-general')  .addEventListener('click', loadGeneral);
 document.getElementById('btn-direction').addEventListener('click', loadByDirection);
 document.getElementById('btn-interface').addEventListener('click', loadByInterface);
+document.getElementById('range-select') .addEventListener('change', () => currentMode());
+
+// Mode shown in bytesChart, re-run when the range changes
+let currentMode = loadGeneral;
 
 // On page load, show General
 loadGeneral();
 
+// ─────────────────────────────────────────────────────────────────────────────
+//  Helper: query parameters for the selected range. "Live" keeps each
+//  endpoint's default window; otherwise start/end cover the last N minutes
+//  (end rounded down to 30s so repeated requests share the server cache) and
+//  max_points is the chart's width in pixels, so the server never sends more
+//  points than can be drawn.
+// ─────────────────────────────────────────────────────────────────────────────
+function rangeParams() {
+  const params  = new URLSearchParams();
+  const minutes = Number(document.getElementById('range-select').value);
+  if (!minutes) return params;
+  const end   = Math.floor(Date.now() / 30000) * 30;
+  const width = document.getElementById('bytesChart').clientWidth || 1000;
+  params.set('start', end - minutes * 60);
+  params.set('end', end);
+  params.set('max_points', Math.max(100, Math.round(width)));
+  return params;
+}
+
+// Ranges over a day need the date on the time axis
+function longRange() {
+  return Number(document.getElementById('range-select').value) > 1440;
+}
+
 // ─────────────────────────────────────────────────────────────────────────────
 //  Helper: build checkbox toggles for each trace
 // ─────────────────────────────────────────────────────────────────────────────
@@ -40,16 +68,20 @@ function generateToggles(names) {
 //    also clear any toggles
 // ─────────────────────────────────────────────────────────────────────────────
 async function loadGeneral() {
+  currentMode = loadGeneral;
   // clear toggles row
   document.getElementById('trace-toggles').innerHTML = '';
 
   try {
-    const res  = await fetch('/data');
-    const data = await res.json();
+    // Column arrays instead of one object per flow; timestamps are Unix ms
+    const params = rangeParams();
+    params.set('format', 'columns');
+    const res  = await fetch('/data?' + params);
+    const { rows, columns: c } = await res.json();
 
-    const times      = data.map(d => new Date(d.time_first));
-    const bytes      = data.map(d => d.in_bytes ?? 0);
-    const throughput = data.map(d => d.avg_throughput_bps ?? 0);
+    const times      = c.time_first.map(ms => new Date(ms));
+    const bytes      = c.in_bytes.map(v => v ?? 0);
+    const throughput = c.avg_throughput_bps.map(v => v ?? 0);
 
     // Bytes/sec plot
     Plotly.newPlot('bytesChart', [{
@@ -57,7 +89,7 @@ async function loadGeneral() {
       y: bytes,
       mode: 'lines+markers',
       name: 'In Bytes',
-    }], layout());
+    }], layout(longRange()));
 
     // Throughput plot
     Plotly.newPlot('throughputChart', [{
@@ -65,30 +97,30 @@ async function loadGeneral() {
       y: throughput,
       mode: 'lines+markers',
       name: 'Throughput (bps)',
-    }], layout());
+    }], layout(longRange()));
 
     // Fill Latest Flows table
     const tbody = document.getElementById("flowTableBody");
     tbody.innerHTML = "";
-    data.slice(0, 10).forEach(d => {
-      const displayTime = new Date(d.time_first).toLocaleString('en-GB', {
+    for (let i = 0; i < Math.min(rows, 10); i++) {
+      const displayTime = times[i].toLocaleString('en-GB', {
         day: '2-digit', month: 'short', hour: '2-digit', minute: '2-digit', hour12: false
       });
       const row = document.createElement("tr");
       row.innerHTML = `
         <td>${displayTime}</td>
-        <td>${d.ipv4_src_addr ?? '—'}</td>
-        <td>${d.ipv4_dst_addr ?? '—'}</td>
-        <td>${d.l4_src_port ?? '—'}</td>
-        <td>${d.l4_dst_port ?? '—'}</td>
-        <td>${d.protocol ?? '—'}</td>
-        <td>${d.tcp_flags ?? '—'}</td>
-        <td>${d.in_bytes ?? '—'}</td>
-        <td>${d.in_pkts ?? '—'}</td>
-        <td>${d.flow_duration_ms ?? '—'}</td>
+        <td>${c.ipv4_src_addr[i] ?? '—'}</td>
+        <td>${c.ipv4_dst_addr[i] ?? '—'}</td>
+        <td>${c.l4_src_port[i] ?? '—'}</td>
+        <td>${c.l4_dst_port[i] ?? '—'}</td>
+        <td>${c.protocol[i] ?? '—'}</td>
+        <td>${c.tcp_flags[i] ?? '—'}</td>
+        <td>${c.in_bytes[i] ?? '—'}</td>
+        <td>${c.in_pkts[i] ?? '—'}</td>
+        <td>${c.flow_duration_ms[i] ?? '—'}</td>
       `;
       tbody.appendChild(row);
-    });
+    }
 
   } catch (err) {
     console.error("Error loading general data:", err);
@@ -99,8 +131,9 @@ async function loadGeneral() {
 // 2) By Direction mode: fetch /bytes_by_direction, update bytesChart + toggles
 // ─────────────────────────────────────────────────────────────────────────────
 async function loadByDirection() {
+  currentMode = loadByDirection;
   try {
-    const res  = await fetch('/bytes_by_direction');
+    const res  = await fetch('/bytes_by_direction?' + rangeParams());
     const data = await res.json();
 
     const dirs = Array.from(new Set(data.map(d => d.direction)));
@@ -114,7 +147,7 @@ async function loadByDirection() {
       };
     });
 
-    Plotly.newPlot('bytesChart', traces, layout());
+    Plotly.newPlot('bytesChart', traces, layout(longRange()));
     // build checkboxes
     generateToggles(dirs);
 
@@ -127,8 +160,9 @@ async function loadByDirection() {
 // 3) By Interface mode: fetch /bytes_by_interface, update bytesChart + toggles
 // ─────────────────────────────────────────────────────────────────────────────
 async function loadByInterface() {
+  currentMode = loadByInterface;
   try {
-    const res  = await fetch('/bytes_by_interface');
+    const res  = await fetch('/bytes_by_interface?' + rangeParams());
     const data = await res.json();
 
     const ifs = Array.from(new Set(data.map(d => d.ingress_if)));
@@ -142,7 +176,7 @@ async function loadByInterface() {
       };
     });
 
-    Plotly.newPlot('bytesChart', traces, layout());
+    Plotly.newPlot('bytesChart', traces, layout(longRange()));
     // build checkboxes
     generateToggles(ifs.map(i => `IF ${i}`));
 
@@ -198,12 +232,12 @@ async function fetchMetrics() {
 // ===============================
 // Layout configuration shared across all plots (unchanged)
 // ===============================
-function layout() {
+function layout(long = false) {
   return {
     xaxis: {
-      tickformat: "%H:%M",
+      tickformat: long ? "%d %b %H:%M" : "%H:%M",
       tickangle: -45,
-      title: "Time (HH:MM)",
+      title: long ? "Time (DD Mon HH:MM)" : "Time (HH:MM)",
       type: "date"
     },
     margin: { t: 30 },
@@ -218,6 +252,6 @@ function layout() {
 // ===============================
 fetchMetrics();
 setInterval(() => {
-  loadGeneral();   // reload general bytes + table
+  currentMode();   // reload the bytes chart in its current mode (+ table)
   fetchMetrics();  // reload metrics charts
 }, 60000);
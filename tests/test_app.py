@@ -0,0 +1,22 @@
+import threading
+
+import app
+
+
+def test_listeners_start_once_per_process_on_first_request(monkeypatch):
+    started = []
+    monkeypatch.setattr(app, "start_invalidation_listener", lambda: started.append("cache"))
+    monkeypatch.setattr(app, "start_alert_listener", lambda: started.append("alerts"))
+    monkeypatch.setattr(app, "_listeners_pid", None)
+    # Importing the app starts nothing
+    assert not {"cache-invalidation", "alert-relay"} & {t.name for t in threading.enumerate()}
+
+    client = app.app.test_client()
+    client.get("/no-such-page")
+    client.get("/no-such-page")
+    assert started == ["cache", "alerts"]
+
+    # A forked worker has another pid and starts its own
+    monkeypatch.setattr(app, "_listeners_pid", -1)
+    client.get("/no-such-page")
+    assert started == ["cache", "alerts"] * 2
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+xgb = pytest.importorskip("xgboost")
+
+import scoring
+from utils.compiled_model import CompiledModel
+
+
+def training_data(rows: int=2_000, features: int=6, seed: int=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, features)).astype(np.float32)
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] > 0) ^ (rng.random(rows) < 0.05)).astype(int)
+    # Missing values during training give the trees both default directions
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+
+def with_nans(X: np.ndarray, seed: int=1) -> np.ndarray:
+    X = X.copy()
+    rng = np.random.default_rng(seed)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[:5] = np.nan                             # rows with no values at all
+    return X
+
+
+@pytest.fixture(scope="module")
+def booster_path(tmp_path_factory):
+    X, y = training_data()
+    booster = xgb.train({"objective": "binary:logistic", "max_depth": 5, "eta": 0.3},
+                        xgb.DMatrix(X, label=y), num_boost_round=30)
+    path = tmp_path_factory.mktemp("model") / "model.json"
+    booster.save_model(str(path))
+    return str(path)
+
+
+def test_compiled_matches_booster_with_nans(booster_path):
+    booster = xgb.Booster()
+    booster.load_model(booster_path)
+    compiled = CompiledModel.from_xgboost_json(booster_path)
+    X = with_nans(training_data(seed=2)[0])
+    np.testing.assert_allclose(compiled.inplace_predict(X), booster.inplace_predict(X),
+                               rtol=1e-5, atol=1e-6)
+
+
+def test_save_load_round_trip(booster_path, tmp_path):
+    compiled = CompiledModel.from_xgboost_json(booster_path)
+    path = str(tmp_path / "model.npz")
+    compiled.save(path)
+    loaded = CompiledModel.load(path)
+    assert (loaded.num_trees, loaded.depth, loaded.base_margin) == \
+        (compiled.num_trees, compiled.depth, compiled.base_margin)
+    X = with_nans(training_data(seed=3)[0])
+    np.testing.assert_array_equal(loaded.inplace_predict(X), compiled.inplace_predict(X))
+    assert isinstance(scoring.load_model(path), CompiledModel)
+
+
+def test_load_model_compiles_supported_json(booster_path):
+    assert isinstance(scoring.load_model(booster_path, compiled=True), CompiledModel)
+    assert isinstance(scoring.load_model(booster_path), xgb.Booster)
+
+
+def test_load_model_falls_back_for_multiclass(tmp_path):
+    X, y = training_data()
+    booster = xgb.train({"objective": "multi:softprob", "num_class": 3, "max_depth": 3},
+                        xgb.DMatrix(X, label=y + (X[:, 3] > 1)), num_boost_round=3)
+    path = str(tmp_path / "multiclass.json")
+    booster.save_model(path)
+    with pytest.raises(ValueError):
+        CompiledModel.from_xgboost_json(path)
+    assert isinstance(scoring.load_model(path, compiled=True), xgb.Booster)
+
+
+def test_load_model_falls_back_for_categorical_splits(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"proto": pd.Categorical(rng.choice(["tcp", "udp", "icmp"], 500)),
+                       "bytes": rng.normal(size=500)})
+    y = ((df["proto"] == "udp") | (df["bytes"] > 1)).astype(int)
+    booster = xgb.train({"objective": "binary:logistic", "max_depth": 3, "max_cat_to_onehot": 1},
+                        xgb.DMatrix(df, label=y, enable_categorical=True), num_boost_round=3)
+    path = str(tmp_path / "categorical.json")
+    booster.save_model(path)
+    with pytest.raises(ValueError, match="Categorical"):
+        CompiledModel.from_xgboost_json(path)
+    assert isinstance(scoring.load_model(path, compiled=True), xgb.Booster)
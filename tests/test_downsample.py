@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.downsample import MAX_POINTS_LIMIT, NICE_STEPS, choose_step, lttb, parse_time_range
+
+HOUR = pd.Timedelta(hours=1)
+
+
+def test_parse_time_range_defaults():
+    tr = parse_time_range({"end": "2024-01-01T12:00:00"}, default_span=HOUR)
+    assert tr.end == pd.Timestamp("2024-01-01T12:00:00", tz="UTC")
+    assert tr.seconds == 3600
+    assert tr.step is None
+
+
+def test_parse_time_range_unix_seconds_and_clamped_points():
+    tr = parse_time_range({"start": "1704067200", "end": "1704070800", "max_points": "1"}, HOUR)
+    assert tr.start == pd.Timestamp("2024-01-01", tz="UTC")
+    assert tr.max_points == 2
+    tr = parse_time_range({"start": "1704067200", "end": "1704070800", "max_points": "10000000"}, HOUR)
+    assert tr.max_points == MAX_POINTS_LIMIT
+
+
+@pytest.mark.parametrize("args", [
+    {"start": "2024-01-01T12:00", "end": "2024-01-01T11:00"},
+    {"start": "2024-01-01", "end": "2024-03-01"},
+    {"end": "yesterday-ish"},
+    {"end": "nan"},
+    {"step": "0"},
+    {"step": "-60"},
+    {"step": "nan"},
+    {"step": "inf"},
+    {"step": "-inf"},
+    {"step": "a minute"},
+    {"max_points": "many"},
+])
+def test_parse_time_range_rejects(args):
+    with pytest.raises(ValueError):
+        parse_time_range(args, default_span=HOUR)
+
+
+def test_choose_step_picks_smallest_nice_width_that_fits():
+    assert choose_step(3600, 1000) == NICE_STEPS[0]
+    assert choose_step(86400, 100) == 900
+    # Past the largest nice width: whole multiples of it
+    assert choose_step(31 * 86400, 10) == 4 * 86400
+
+
+def test_choose_step_honours_requested_step_within_budget():
+    assert choose_step(3600, 1000, step=45) == 60          # rounded up to a multiple of 30
+    assert choose_step(3600, 1000, step=600) == 600
+    assert choose_step(86400, 100, step=60) == 900         # 60s would be 1440 points
+
+
+def test_lttb_keeps_ends_and_threshold_points():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    idx = lttb(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == 999
+    assert (np.diff(idx) > 0).all()
+
+
+def test_lttb_keeps_spikes():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[[123, 321]] = [50, -50]
+    y[200] = np.nan                       # treated as 0, never selected for being NaN
+    idx = lttb(x, y, 20)
+    assert {123, 321} <= set(idx.tolist())
+
+
+def test_lttb_small_inputs():
+    x = np.arange(5, dtype=float)
+    assert lttb(x, x, 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb(x, x, 2).tolist() == [0, 4]
+    assert lttb(np.empty(0), np.empty(0), 10).tolist() == []
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_caches
+from enrichment import IF_MAP, DUBAI_TZ, compute_direction, decode_hex_flags, enrich_flows
+from flow_parser import parse_flow_cache
+
+TODAY = "2024-01-01"
+
+
+def rowwise(df: pd.DataFrame, monitor: str) -> pd.DataFrame:
+    """Steps 7-11 exactly as the scraper loop used to run them."""
+    df["in_bytes"] = pd.to_numeric(df["in_bytes"], errors="coerce")
+    df["in_pkts"]  = pd.to_numeric(df["in_pkts"],  errors="coerce")
+    df["tcp_flags"] = df["tcp_flags"].apply(
+        lambda x: int(x,16) if isinstance(x,str) and x.startswith("0x") else pd.NA
+    )
+
+    first = pd.to_datetime(TODAY + " " + df["time_first"])
+    last  = pd.to_datetime(TODAY + " " + df["time_last"])
+    last  = last.where(last>=first, last + pd.Timedelta(days=1))
+    df["time_first"]       = first.dt.tz_localize("UTC").dt.tz_convert(DUBAI_TZ)
+    df["time_last"]        = last.dt.tz_localize("UTC").dt.tz_convert(DUBAI_TZ)
+    df["flow_duration_ms"] = (last - first).dt.total_seconds() * 1000
+
+    df["dur_s"] = df["flow_duration_ms"] / 1000.0
+    zero_dur    = df["flow_duration_ms"] == 0
+    df.loc[zero_dur, ["bytes_per_second","avg_throughput_bps"]] = 0.0
+    nonzero     = ~zero_dur
+    df.loc[nonzero, "bytes_per_second"]   = df.loc[nonzero, "in_bytes"]    / df.loc[nonzero, "dur_s"]
+    df.loc[nonzero, "avg_throughput_bps"] = df.loc[nonzero, "in_bytes"] * 8  / df.loc[nonzero, "dur_s"]
+    df.drop(columns=["dur_s"], inplace=True)
+
+    df["time"] = df["time_last"]
+
+    df["ingress_if"] = df["intf_input"].map(IF_MAP).fillna(0).astype(int)
+    df["egress_if"]  = df["intf_output"].map(IF_MAP).fillna(0).astype(int)
+    df["direction"]  = df.apply(lambda r: compute_direction(r.ingress_if, r.egress_if), axis=1)
+    df["flow_monitor"] = monitor
+    return df
+
+
+def sample(n: int) -> pd.DataFrame:
+    main_raw, flag_raw = make_caches(n)
+    df = parse_flow_cache(main_raw).rename(columns={"bytes": "in_bytes", "pkts": "in_pkts"})
+    # Raw hex strings, as they arrive when the flag monitor isn't pre-decoded
+    df["tcp_flags"] = parse_flow_cache(flag_raw)["tcp_flags"].map("0x{:02X}".format)
+    df.loc[::7, "tcp_flags"] = None
+    df.loc[::11, "time_last"] = df.loc[::11, "time_first"]   # zero-duration flows
+    return df
+
+
+def assert_same_as_rowwise(df: pd.DataFrame):
+    expected = rowwise(df.copy(), "FLOW-MONITOR")
+    actual = enrich_flows(df.copy(), "FLOW-MONITOR", today=TODAY)
+    for frame in (expected, actual):
+        frame["tcp_flags"] = pd.to_numeric(frame["tcp_flags"].astype(object), errors="coerce")
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
+
+def test_enrich_flows_matches_rowwise():
+    assert_same_as_rowwise(sample(1_000))
+
+
+def test_enrich_flows_edge_cases_match_rowwise():
+    df = pd.DataFrame({
+        "in_bytes":    ["1000", "500", "x", "8000", "42"],
+        "in_pkts":     ["10", "5", "1", None, "1"],
+        "tcp_flags":   ["0x1B", None, "1B", "", "0x02"],
+        "time_first":  ["10:00:00.000", "12:30:00.500", "23:59:58.000", "08:00:00.000", "00:00:00.000"],
+        "time_last":   ["10:00:04.000", "12:30:00.500", "00:00:02.000", "08:00:01.000", "00:00:00.000"],
+        "intf_input":  ["Gi1", "Gi9", None, "Gi3", "Null"],
+        "intf_output": ["Gi3", "Gi2", "Gi1", "Tu0", "Gi1"],
+    })
+    assert_same_as_rowwise(df)
+
+
+def test_zero_duration_flows_have_zero_rates():
+    df = enrich_flows(sample(100), "FLOW-MONITOR", today=TODAY)
+    zero = df["flow_duration_ms"] == 0
+    assert zero.any()
+    assert (df.loc[zero, ["bytes_per_second", "avg_throughput_bps"]] == 0.0).all().all()
+
+
+def test_time_last_past_midnight_is_next_day():
+    df = pd.DataFrame({"in_bytes": ["4000"], "in_pkts": ["4"], "tcp_flags": ["0x10"],
+                       "time_first": ["23:59:58.000"], "time_last": ["00:00:02.000"],
+                       "intf_input": ["Gi1"], "intf_output": ["Gi3"]})
+    row = enrich_flows(df, "FLOW-MONITOR", today=TODAY).iloc[0]
+    assert row["flow_duration_ms"] == 4000
+    assert row["time_last"] - row["time_first"] == pd.Timedelta(seconds=4)
+    assert row["bytes_per_second"] == 1000
+
+
+def test_unknown_interfaces_map_to_zero():
+    df = pd.DataFrame({"in_bytes": ["1", "1"], "in_pkts": ["1", "1"], "tcp_flags": [None, None],
+                       "time_first": ["10:00:00.000"] * 2, "time_last": ["10:00:01.000"] * 2,
+                       "intf_input": ["Gi9", None], "intf_output": ["Gi1", "Tu0"]})
+    df = enrich_flows(df, "FLOW-MONITOR", today=TODAY)
+    assert df["ingress_if"].tolist() == [0, 0]
+    assert df["egress_if"].tolist() == [1, 0]
+    assert df["direction"].tolist() == ["local-origin", "dropped"]
+
+
+@pytest.mark.parametrize("flags, expected", [
+    (["0x1B", "0x00", "0xff"], [27, 0, 255]),
+    ([None, np.nan, ""], [None, None, None]),
+    (["0x", "0xZZ", "1B", "27"], [None, None, None, None]),
+])
+def test_decode_hex_flags(flags, expected):
+    decoded = decode_hex_flags(pd.Series(flags, dtype=object))
+    assert [None if pd.isna(v) else v for v in decoded] == expected
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from flow_key import flow_keys, hash_join
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["ipv4_src_addr", "ipv4_dst_addr", "l4_src_port", "l4_dst_port", "protocol"])
+
+
+LEFT = frame([("10.0.0.1", "10.0.0.2", 1234, 80, 6),
+              ("10.0.0.3", "10.0.0.4", 53, 53, 17)])
+
+
+def test_hash_join_matches_last_occurrence():
+    right = frame([("10.0.0.3", "10.0.0.4", 53, 53, 17),
+                   ("10.0.0.1", "10.0.0.2", 1234, 80, 6),
+                   ("10.0.0.3", "10.0.0.4", 53, 53, 17)])
+    assert hash_join(flow_keys(LEFT), flow_keys(right)).tolist() == [1, 2]
+
+
+def test_hash_join_empty_right():
+    match = hash_join(flow_keys(LEFT), flow_keys(frame([])))
+    assert match.tolist() == [-1, -1]
+
+
+def test_hash_join_no_valid_right_keys():
+    right = frame([("10.0.0.1", "10.0.0.2", None, 80, 6),
+                   ("10.0.0.3", "10.0.0.4", 53, 53, np.nan)])
+    assert hash_join(flow_keys(LEFT), flow_keys(right)).tolist() == [-1, -1]
+
+
+def test_hash_join_invalid_left_keys_never_match():
+    right = frame([("10.0.0.1", "10.0.0.2", None, 80, 6)])
+    left = frame([("10.0.0.1", "10.0.0.2", None, 80, 6)])
+    assert hash_join(flow_keys(left), flow_keys(right)).tolist() == [-1]
@@ -0,0 +1,61 @@
+import pandas as pd
+import psycopg2
+import pytest
+
+from flow_writer import CopyWriter
+
+
+class FakeWriter(CopyWriter):
+    """A CopyWriter whose COPY fails for poison rows, or for everything while ``down``."""
+
+    def __init__(self, **kwargs):
+        super().__init__(engine=None, max_delay=0, **kwargs)
+        self.copied = []
+        self.down = False
+
+    def copy_frame(self, df: pd.DataFrame):
+        if self.down:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        if (df["in_bytes"] < 0).any():
+            raise psycopg2.DataError("value out of range")
+        self.copied.append(df)
+
+
+def frame(*in_bytes):
+    return pd.DataFrame({"in_bytes": list(in_bytes)})
+
+
+def test_poison_frame_is_dead_lettered_and_later_frames_still_write():
+    dead = []
+    writer = FakeWriter(max_attempts=3, dead_letter=lambda df, attempts: dead.append((df, attempts)) or "dead/x.pkl")
+    writer.max_delay = 5.0                # buffer both frames into one batch
+    writer.write(frame(1, 2))
+    writer.write(frame(-1))
+    with pytest.raises(psycopg2.DataError):
+        writer.flush()
+    assert [list(df["in_bytes"]) for df in writer.copied] == [[1, 2]]
+
+    for _ in range(2):
+        with pytest.raises(psycopg2.DataError):
+            writer.flush()
+    assert len(dead) == 1 and dead[0][1] == 3
+    assert writer.flush() == 0
+
+    writer.max_delay = 0
+    writer.write(frame(3))
+    assert list(writer.copied[-1]["in_bytes"]) == [3]
+
+
+def test_outage_keeps_frames_up_to_the_row_cap():
+    writer = FakeWriter(max_buffered_rows=4)
+    writer.down = True
+    for n in range(4):
+        with pytest.raises(psycopg2.OperationalError):
+            writer.write(frame(n, n))
+    # Transient failures don't count as attempts; only the newest 4 rows are kept
+    assert [list(df["in_bytes"]) for df, attempts in writer._frames] == [[2, 2], [3, 3]]
+    assert all(attempts == 0 for _, attempts in writer._frames)
+
+    writer.down = False
+    assert writer.flush() == 4
+    assert writer._rows == 0
@@ -0,0 +1,86 @@
+import threading
+from types import SimpleNamespace
+
+from resources import Resource
+from utils.geo import GeoLocator
+
+
+class FakeReader:
+    """A GeoIP reader whose lookups fail once it is closed, like geoip2's."""
+
+    def __init__(self, version: int, started: threading.Event=None, proceed: threading.Event=None):
+        self.version = version
+        self.closed = False
+        self.started = started
+        self.proceed = proceed
+
+    def city(self, ip):
+        if self.started is not None:
+            self.started.set()
+            self.proceed.wait(5)
+        if self.closed:
+            raise ValueError("Attempt to read from a closed MaxMind DB.")
+        return SimpleNamespace(location=SimpleNamespace(latitude=1.0, longitude=2.0),
+                               city=SimpleNamespace(name=f"v{self.version}"),
+                               country=SimpleNamespace(iso_code="AE"))
+
+    def close(self):
+        self.closed = True
+
+
+def make_resource(readers):
+    loads = iter(readers)
+    return Resource("geoip", lambda: next(loads), close=lambda r: r.close(), check_interval=3600)
+
+
+def test_reload_during_lookup_keeps_the_leased_reader_open():
+    started, proceed = threading.Event(), threading.Event()
+    first, second = FakeReader(1, started, proceed), FakeReader(2)
+    resource = make_resource([first, second])
+    locator = GeoLocator()
+    result = {}
+
+    def request():
+        with resource.lease() as reader:
+            result["locations"] = locator.locate(reader, ["10.0.0.1"])
+
+    worker = threading.Thread(target=request)
+    worker.start()
+    assert started.wait(5)
+    # Another request picks up a new file while the lookup is still running
+    assert resource.reload() is second
+    assert not first.closed
+    proceed.set()
+    worker.join(5)
+
+    assert result["locations"].loc["10.0.0.1", "city"] == "v1"
+    assert first.closed
+    assert not second.closed
+
+
+def test_unleased_replaced_object_is_closed_on_reload():
+    first, second = FakeReader(1), FakeReader(2)
+    resource = make_resource([first, second])
+    assert resource.get() is first
+    resource.reload()
+    assert first.closed and not second.closed
+
+
+def test_closed_once_after_the_last_of_several_leases():
+    first, second = FakeReader(1), FakeReader(2)
+    resource = make_resource([first, second])
+    with resource.lease() as a:
+        with resource.lease() as b:
+            assert a is b is first
+            resource.reload()
+        assert not first.closed
+    assert first.closed
+    with resource.lease() as c:
+        assert c is second
+
+
+def test_lease_of_a_failed_load_is_none():
+    resource = Resource("missing", lambda: 1 / 0, close=lambda r: None)
+    with resource.lease() as value:
+        assert value is None
+
@@ -0,0 +1,158 @@
+"""XGBoost trees compiled to flat NumPy arrays, scored without xgboost.
+
+Every node of every tree becomes one slot in a handful of arrays (feature,
+threshold, left/right/default child, value), so a batch is scored by
+walking all trees for all rows at once, one level per step. Leaves point
+to themselves, so rows that reach a leaf early simply stay there.
+
+Reads the JSON model format XGBoost writes (``booster.save_model('x.json')``),
+so compiling needs no xgboost either. Only gbtree binary:logistic models
+with numerical splits are supported; anything else raises ValueError.
+
+    python -m utils.compiled_model models/xgb_nids_model_11.json models/xgb_nids_model_11.npz
+"""
+import json
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+EVAL_BATCH_ROWS = 1024   # rows x trees node indices per step stay cache-sized
+
+
+class CompiledModel:
+    ARRAYS = ("feature", "threshold", "left", "right", "default", "value", "roots")
+
+    def __init__(self, feature, threshold, left, right, default, value, roots,
+                 base_margin: float, depth: int, feature_names: Optional[List[str]]=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.default = np.ascontiguousarray(default, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float32)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.depth = int(depth)
+        self.feature_names = feature_names
+        # evaluation layout: children[2 * node + go_right]
+        self._children = np.stack([self.left, self.right], axis=1).ravel()
+        self._default_right = self.default == self.right
+
+    @property
+    def num_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    # --- building ---
+    @classmethod
+    def from_xgboost_json(cls, path_or_model) -> "CompiledModel":
+        """Compile a model saved by ``Booster.save_model`` in JSON format (path or parsed dict)."""
+        if isinstance(path_or_model, dict):
+            model = path_or_model
+        else:
+            with open(path_or_model) as fh:
+                model = json.load(fh)
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        booster = learner["gradient_booster"]
+        params = learner["learner_model_param"]
+        if objective != "binary:logistic" or booster["name"] != "gbtree":
+            raise ValueError(f"Only gbtree binary:logistic models can be compiled, not {booster['name']} {objective}")
+        if int(params.get("num_class", 0)) > 1 or int(params.get("num_target", 1)) > 1:
+            raise ValueError("Multi-class and multi-target models can't be compiled")
+
+        trees = booster["model"]["trees"]
+        feature, threshold, left, right, default, value, roots = ([] for _ in range(7))
+        depth, offset = 0, 0
+        for tree in trees:
+            if any(tree.get("split_type", [])):
+                raise ValueError("Categorical splits can't be compiled")
+            lc = np.asarray(tree["left_children"], dtype=np.int64)
+            rc = np.asarray(tree["right_children"], dtype=np.int64)
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            leaf = lc == -1
+            slots = np.arange(len(lc)) + offset
+
+            # leaves keep their value in split_conditions and point to themselves
+            feature.append(np.where(leaf, 0, tree["split_indices"]))
+            threshold.append(np.where(leaf, 0, cond))
+            value.append(np.where(leaf, cond, 0))
+            left.append(np.where(leaf, slots, lc + offset))
+            right.append(np.where(leaf, slots, rc + offset))
+            default.append(np.where(np.asarray(tree["default_left"], dtype=bool), left[-1], right[-1]))
+            roots.append(offset)
+            depth = max(depth, _tree_depth(lc, rc))
+            offset += len(lc)
+
+        # base_score is stored in probability space, e.g. "5E-1" or "[5E-1]"
+        base_score = float(str(params["base_score"]).strip("[]"))
+        base_margin = float(np.log(base_score / (1 - base_score)))
+        cat = (lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype))
+        return cls(cat(feature, np.int32), cat(threshold, np.float32), cat(left, np.int32),
+                   cat(right, np.int32), cat(default, np.int32), cat(value, np.float32),
+                   np.asarray(roots, dtype=np.int32), base_margin, depth,
+                   learner.get("feature_names") or None)
+
+    # --- serialization ---
+    def save(self, path: str):
+        extra = {"base_margin": np.float64(self.base_margin), "depth": np.int32(self.depth)}
+        if self.feature_names:
+            extra["feature_names"] = np.asarray(self.feature_names)
+        np.savez(path, **{name: getattr(self, name) for name in self.ARRAYS}, **extra)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledModel":
+        with np.load(path) as npz:
+            names = list(npz["feature_names"]) if "feature_names" in npz.files else None
+            return cls(*(npz[name] for name in cls.ARRAYS), float(npz["base_margin"]),
+                       int(npz["depth"]), names)
+
+    # --- scoring ---
+    def predict_margin(self, X: np.ndarray, batch_rows: int=EVAL_BATCH_ROWS) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), batch_rows):
+            out[start:start + batch_rows] = self._margin(X[start:start + batch_rows])
+        return out
+
+    def inplace_predict(self, X: np.ndarray) -> np.ndarray:
+        """Probabilities, like ``Booster.inplace_predict`` (so utils.features.predict_batches works)."""
+        return (1.0 / (1.0 + np.exp(-self.predict_margin(X).astype(np.float64)))).astype(np.float32)
+
+    def _margin(self, X: np.ndarray) -> np.ndarray:
+        # X is read through one flat gather per level: row offset + node feature
+        flat = X.ravel()
+        row_offset = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        has_nan = bool(np.isnan(flat).any())
+        nodes = np.broadcast_to(self.roots, (len(X), self.num_trees))
+        for _ in range(self.depth):
+            x = flat.take(row_offset + self.feature.take(nodes))
+            go_right = x >= self.threshold.take(nodes)    # NaN compares False: goes left
+            if has_nan:
+                go_right |= np.isnan(x) & self._default_right.take(nodes)
+            nodes = self._children.take(2 * nodes + go_right)
+        return self.base_margin + self.value.take(nodes).sum(axis=1, dtype=np.float32)
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Number of splits on the longest root-to-leaf path."""
+    depth, level = 0, np.array([0])
+    while True:
+        level = level[left[level] != -1]
+        if not len(level):
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m utils.compiled_model MODEL.json OUT.npz")
+    compiled = CompiledModel.from_xgboost_json(sys.argv[1])
+    compiled.save(sys.argv[2])
+    print(f"{compiled.num_trees} trees, {len(compiled.value)} nodes, depth {compiled.depth}, "
+          f"{compiled.nbytes / 2**10:.0f} KiB -> {sys.argv[2]}")
@@ -0,0 +1,124 @@
+"""Point budgets for chart endpoints: time ranges, bucket widths and LTTB.
+
+Chart endpoints take ``start``, ``end``, ``step`` and ``max_points`` (see
+:func:`parse_time_range`). Bucketed series pick a bucket width from the
+range with :func:`choose_step`. Series of raw points are thinned with
+:func:`lttb`.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 1000
+MAX_POINTS_LIMIT = 10_000
+MAX_RANGE = pd.Timedelta(days=31)
+
+# Bucket widths offered when the range decides (seconds): round numbers on a clock
+NICE_STEPS = (30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+
+
+@dataclass(frozen=True)
+class TimeRange:
+    start: pd.Timestamp
+    end: pd.Timestamp
+    max_points: int
+    step: Optional[float]   # seconds, when the caller asked for one
+
+    @property
+    def seconds(self) -> float:
+        return (self.end - self.start).total_seconds()
+
+
+def _parse_time(value: str) -> pd.Timestamp:
+    """ISO 8601 (naive means UTC) or Unix seconds."""
+    try:
+        ts = pd.Timestamp(float(value), unit="s")
+    except ValueError:
+        ts = pd.Timestamp(value)
+    if pd.isna(ts):
+        raise ValueError(f"not a time: {value!r}")
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def parse_time_range(args: Mapping[str, str], default_span: pd.Timedelta,
+                     default_max_points: int=DEFAULT_MAX_POINTS) -> TimeRange:
+    """Read ``start``/``end``/``step``/``max_points`` from query ``args``.
+
+    ``end`` defaults to now and ``start`` to ``end - default_span``.
+    ``max_points`` is clamped to 2..MAX_POINTS_LIMIT. Raises ValueError for
+    values that don't parse, an empty range, one longer than MAX_RANGE, or
+    a ``step`` that isn't a finite positive number.
+    """
+    end = _parse_time(args["end"]) if args.get("end") else pd.Timestamp.now(tz="UTC")
+    start = _parse_time(args["start"]) if args.get("start") else end - default_span
+    if start >= end:
+        raise ValueError("start must be before end")
+    if end - start > MAX_RANGE:
+        raise ValueError(f"range is longer than {MAX_RANGE.days} days")
+    max_points = min(max(int(args.get("max_points") or default_max_points), 2), MAX_POINTS_LIMIT)
+    step = float(args["step"]) if args.get("step") else None
+    if step is not None and not (math.isfinite(step) and step > 0):
+        raise ValueError("step must be a positive number of seconds")
+    return TimeRange(start, end, max_points, step)
+
+
+def choose_step(seconds: float, max_points: int, step: Optional[float]=None,
+                nice_steps: Sequence[int]=NICE_STEPS) -> int:
+    """Bucket width (seconds) for ``seconds`` of data in at most ``max_points`` buckets.
+
+    A requested ``step`` is rounded up to a multiple of the finest width. It
+    is honoured unless it would exceed the budget; in that case, and when no
+    step was asked for, the smallest width in ``nice_steps`` that fits is used.
+    """
+    needed = seconds / max_points
+    if step is not None:
+        step = math.ceil(step / nice_steps[0]) * nice_steps[0]
+        if step >= needed:
+            return int(step)
+    for width in nice_steps:
+        if width >= needed:
+            return width
+    return math.ceil(needed / nice_steps[-1]) * nice_steps[-1]
+
+
+def choose_source(step: int, sources: Dict[str, float]) -> str:
+    """The coarsest of ``sources`` (name -> bucket seconds) whose width divides ``step``."""
+    fitting = [(width, name) for name, width in sources.items() if step % width == 0]
+    if not fitting:
+        raise ValueError(f"no source bucket divides a {step}s step")
+    return max(fitting)[1]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of ``threshold`` points that keep the shape of ``(x, y)`` (Largest-Triangle-Three-Buckets).
+
+    ``x`` must be sorted ascending. The first and last points are always
+    kept. Each of the ``threshold - 2`` buckets in between contributes the
+    point forming the largest triangle with the previously kept point and
+    the mean of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1], dtype=np.intp)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    # bucket i covers [edges[i], edges[i + 1]) of the points between the ends
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    out = np.empty(threshold, dtype=np.intp)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
@@ -1,15 +1,118 @@
+import os
+import sys
+from typing import Dict, Iterable
 
-from sklearn.preprocessing import LabelEncoder
+import numpy as np
+import pandas as pd
+
+from flow_key import ipv4_to_uint32
 
 class LabelEncoderExt:
     def __init__(self):
+        from sklearn.preprocessing import LabelEncoder   # only training needs sklearn
         self.le = LabelEncoder()
     def fit(self, data):
         self.le = self.le.fit(list(data) + ['Unknown'])
         self.classes_ = self.le.classes_
         return self
     def transform(self, data):
-        arr = []
-        for x in data:
-            arr.append(x if x in self.classes_ else 'Unknown')
-        return self.le.transform(arr)
\ No newline at end of file
+        # classes_ is sorted, so a class's position is its LabelEncoder code;
+        # one hash lookup for the whole column instead of `x in classes_` per row
+        codes = pd.Index(self.classes_).get_indexer(np.asarray(list(data), dtype=object))
+        unknown = np.searchsorted(self.classes_, 'Unknown')
+        return np.where(codes >= 0, codes, unknown)
+
+
+class IPEncoder:
+    """Maps IPv4 addresses to integer codes, the same way in training and serving.
+
+    Addresses are held as uint32 in a hash index, so :meth:`transform` is
+    one vectorized lookup for a whole column. Addresses never seen in
+    training get ``unknown_code``, as do 0.0.0.0 and anything that isn't a
+    dotted quad (both parse to 0, which is never given a code of its own).
+    :meth:`partial_fit` adds new addresses with new codes and never changes
+    existing ones, so it can be called on every training chunk.
+    """
+
+    UNKNOWN = 0
+
+    def __init__(self, addresses: np.ndarray=None, codes: np.ndarray=None,
+                 unknown_code: int=UNKNOWN):
+        self.addresses = np.asarray([] if addresses is None else addresses, dtype=np.uint32)
+        self.codes = (np.arange(1, len(self.addresses) + 1, dtype=np.int32) if codes is None
+                      else np.asarray(codes, dtype=np.int32))
+        self.unknown_code = int(unknown_code)
+        self._index = pd.Index(self.addresses)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def fit(self, addrs: Iterable) -> "IPEncoder":
+        self.__init__()
+        return self.partial_fit(addrs)
+
+    def partial_fit(self, addrs: Iterable) -> "IPEncoder":
+        values = np.unique(ipv4_to_uint32(addrs))
+        new = values[(self._index.get_indexer(values) < 0) & (values != 0)]
+        if len(new):
+            start = max(int(self.codes.max(initial=self.unknown_code)), self.unknown_code) + 1
+            self.addresses = np.concatenate([self.addresses, new])
+            self.codes = np.concatenate([self.codes, np.arange(start, start + len(new), dtype=np.int32)])
+            self._index = pd.Index(self.addresses)
+        return self
+
+    def transform(self, addrs: Iterable) -> np.ndarray:
+        return self.transform_uint32(ipv4_to_uint32(addrs))
+
+    def transform_uint32(self, values: np.ndarray) -> np.ndarray:
+        """Codes for addresses already packed as uint32 (e.g. the parser's ``_u32`` columns)."""
+        pos = self._index.get_indexer(np.asarray(values, dtype=np.uint32))
+        return np.where(pos >= 0, self.codes[pos], self.unknown_code).astype(np.int32)
+
+    @classmethod
+    def from_label_encoder(cls, encoder: LabelEncoderExt) -> "IPEncoder":
+        """Same codes as a fitted LabelEncoderExt, for models trained with one.
+
+        Classes that aren't IPv4 dotted quads (and 0.0.0.0) can't be
+        represented and fall into the unknown bucket.
+        """
+        values = ipv4_to_uint32(np.asarray(encoder.classes_, dtype=object))
+        valid = values != 0
+        unknown = int(np.searchsorted(encoder.classes_, 'Unknown'))
+        return cls(values[valid], np.flatnonzero(valid), unknown)
+
+    # --- serialization: two small integer arrays per encoder ---
+    def to_arrays(self, prefix: str='') -> Dict[str, np.ndarray]:
+        return {f"{prefix}addresses": self.addresses, f"{prefix}codes": self.codes,
+                f"{prefix}unknown": np.int32(self.unknown_code)}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str='') -> "IPEncoder":
+        return cls(arrays[f"{prefix}addresses"], arrays[f"{prefix}codes"],
+                   int(arrays[f"{prefix}unknown"]))
+
+
+def save_ip_encoders(path: str, encoders: Dict[str, IPEncoder]):
+    """Write e.g. ``{'src': ..., 'dst': ...}`` to one compressed .npz file."""
+    arrays = {}
+    for name, encoder in encoders.items():
+        arrays.update(encoder.to_arrays(f"{name}_"))
+    np.savez_compressed(path, **arrays)
+
+
+def load_ip_encoders(path: str) -> Dict[str, IPEncoder]:
+    """Read encoders saved by save_ip_encoders, or convert a legacy joblib
+    pickle of LabelEncoderExt objects (``ip_encoders_11.pkl``)."""
+    if os.path.splitext(path)[1] == '.npz':
+        with np.load(path) as arrays:
+            names = {k[:-len('_addresses')] for k in arrays.files if k.endswith('_addresses')}
+            return {name: IPEncoder.from_arrays(arrays, f"{name}_") for name in names}
+
+    import joblib
+
+    # The training script pickled its own __main__.LabelEncoderExt
+    main = sys.modules['__main__']
+    if not hasattr(main, 'LabelEncoderExt'):
+        main.LabelEncoderExt = LabelEncoderExt
+    legacy = joblib.load(path)
+    return {name: IPEncoder.from_label_encoder(le) for name, le in legacy.items()}
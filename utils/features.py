@@ -0,0 +1,60 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from flow_key import ipv4_to_uint32
+
+# network_flows column -> feature name the model was trained with, in model order
+FEATURE_COLUMNS = {
+    "ipv4_src_addr":      "IPV4_SRC_ADDR",
+    "ipv4_dst_addr":      "IPV4_DST_ADDR",
+    "l4_src_port":        "L4_SRC_PORT",
+    "l4_dst_port":        "L4_DST_PORT",
+    "protocol":           "PROTOCOL",
+    "tcp_flags":          "TCP_FLAGS",
+    "in_bytes":           "IN_BYTES",
+    "in_pkts":            "IN_PKTS",
+    "flow_duration_ms":   "FLOW_DURATION_MILLISECONDS",
+    "bytes_per_second":   "SRC_TO_DST_SECOND_BYTES",
+    "avg_throughput_bps": "SRC_TO_DST_AVG_THROUGHPUT",
+}
+MODEL_FEATURES = list(FEATURE_COLUMNS.values())
+IP_COLUMNS = ("ipv4_src_addr", "ipv4_dst_addr")
+# Key of each address column in the encoder files written by training
+ENCODER_KEYS = {"ipv4_src_addr": "src", "ipv4_dst_addr": "dst"}
+
+PREDICT_BATCH_ROWS = 65_536
+
+
+def build_feature_matrix(df: pd.DataFrame, encoders: Optional[Dict]=None) -> np.ndarray:
+    """Model input for every row of ``df`` as one C-contiguous float32 matrix.
+
+    Columns follow MODEL_FEATURES. Addresses are packed to uint32 in one
+    vectorized pass (the ``<col>_u32`` copy is used when the frame still has
+    it) and, given the training ``encoders`` (utils.encoders.IPEncoder by
+    ``src``/``dst``), replaced by their codes. Missing or non-numeric values
+    become NaN, which XGBoost treats as missing.
+    """
+    X = np.empty((len(df), len(FEATURE_COLUMNS)), dtype=np.float32)
+    for j, column in enumerate(FEATURE_COLUMNS):
+        if column in IP_COLUMNS:
+            packed = df.get(column + "_u32")
+            packed = ipv4_to_uint32(df[column]) if packed is None else np.asarray(packed)
+            X[:, j] = packed if encoders is None else encoders[ENCODER_KEYS[column]].transform_uint32(packed)
+        else:
+            X[:, j] = pd.to_numeric(df[column], errors="coerce").to_numpy(
+                dtype=np.float32, na_value=np.nan)
+    return X
+
+
+def predict_batches(booster, X: np.ndarray, batch_rows: int=PREDICT_BATCH_ROWS) -> np.ndarray:
+    """``booster.inplace_predict`` over ``X`` in row slices, without building DMatrix objects.
+
+    Works with an ``xgboost.Booster`` or a utils.compiled_model.CompiledModel.
+    """
+    out = np.empty(len(X), dtype=np.float32)
+    for start in range(0, len(X), batch_rows):
+        stop = start + batch_rows
+        out[start:stop] = booster.inplace_predict(X[start:stop])
+    return out
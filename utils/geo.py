@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+# ip -> (lat, lon, city, country); all None for addresses the database doesn't know
+Location = Tuple[Optional[float], Optional[float], Optional[str], Optional[str]]
+UNKNOWN: Location = (None, None, None, None)
+LOCATION_COLUMNS = ["lat", "lon", "city", "country"]
+
+
+class GeoLocator:
+    """GeoIP lookups for distinct addresses, behind a bounded LRU cache.
+
+    The cache lives as long as the process and is emptied whenever a
+    different reader is passed in (a hot-reloaded GeoLite2 file), so
+    answers never mix two database versions.
+    """
+
+    def __init__(self, max_entries: int=65_536):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Location]" = OrderedDict()
+        self._reader = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "resets": 0}
+
+    def locate(self, reader, ips: Iterable[str]) -> pd.DataFrame:
+        """One row per distinct address in ``ips``, indexed by address."""
+        ips = pd.unique(pd.Series(list(ips), dtype=object))
+        found = {}
+        with self._lock:
+            if reader is not self._reader:
+                self._cache.clear()
+                self._reader = reader
+                self.stats["resets"] += 1
+            for ip in ips:
+                location = self._cache.get(ip)
+                if location is not None:
+                    self._cache.move_to_end(ip)
+                    self.stats["hits"] += 1
+                    found[ip] = location
+        missing = [ip for ip in ips if ip not in found]
+
+        resolved = {ip: _lookup(reader, ip) for ip in missing}
+        with self._lock:
+            self.stats["misses"] += len(resolved)
+            if reader is self._reader:
+                for ip, location in resolved.items():
+                    self._cache[ip] = location
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                    self.stats["evictions"] += 1
+        found.update(resolved)
+        return pd.DataFrame(list(found.values()), columns=LOCATION_COLUMNS,
+                            index=pd.Index(list(found), dtype=object))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+def _lookup(reader, ip: str) -> Location:
+    try:
+        rec = reader.city(ip)
+    except Exception:
+        return UNKNOWN
+    if rec.location.latitude is None or rec.location.longitude is None:
+        return UNKNOWN
+    return (rec.location.latitude, rec.location.longitude, rec.city.name, rec.country.iso_code)
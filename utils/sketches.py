@@ -0,0 +1,175 @@
+"""Mergeable streaming summaries: Count-Min, Space-Saving top-k, HyperLogLog.
+
+Each one takes whole batches of keys as NumPy / pandas arrays, and two
+instances with the same parameters merge into one that summarizes both
+streams. That means per-minute, per-device summaries can be combined into any
+window. Keys are hashed with ``pandas.util.hash_array``, which gives the same
+result in every process.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def hash_keys(keys) -> np.ndarray:
+    """Stable 64-bit hashes of ``keys`` (any array-like; compared as strings)."""
+    return pd.util.hash_array(np.asarray(keys, dtype=object).astype(str).astype(object))
+
+
+class CountMinSketch:
+    """``depth`` x ``width`` counters; estimates never undercount.
+
+    With width w and depth d, an estimate exceeds the true count by more
+    than ``e / w`` of the total weight with probability at most ``exp(-d)``.
+    """
+
+    def __init__(self, width: int=1024, depth: int=4, counts: np.ndarray=None):
+        self.width, self.depth = width, depth
+        self.counts = np.zeros((depth, width), dtype=np.int64) if counts is None else counts
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        # double hashing: column_i = h1 + i * h2 (mod width)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1 + rows * h2) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, hashes: np.ndarray, weights: np.ndarray):
+        cols = self._columns(hashes)
+        for i in range(self.depth):
+            self.counts[i] += np.bincount(cols[i], weights=weights, minlength=self.width).astype(np.int64)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        cols = self._columns(hashes)
+        return self.counts[np.arange(self.depth)[:, None], cols].min(axis=0)
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        return CountMinSketch.merge_all([self, other])
+
+    @classmethod
+    def merge_all(cls, sketches: List["CountMinSketch"]) -> "CountMinSketch":
+        first = sketches[0]
+        if any((s.width, s.depth) != (first.width, first.depth) for s in sketches):
+            raise ValueError("Count-Min sketches of different shapes can't be merged")
+        return cls(first.width, first.depth, np.sum([s.counts for s in sketches], axis=0))
+
+
+class SpaceSaving:
+    """Top-``k`` heavy hitters with per-key overestimation bounds.
+
+    Counts are upper bounds and ``count - error`` lower bounds. Any key
+    heavier than ``total / k`` is guaranteed to be present. Merging follows
+    Agarwal et al., "Mergeable Summaries": a key missing from a full summary
+    is credited with that summary's smallest count, as count and as error.
+    ``counts`` is kept sorted heaviest first, with ``errors`` in the same order.
+    """
+
+    def __init__(self, k: int=100, counts: pd.Series=None, errors: pd.Series=None):
+        self.k = k
+        self.counts = pd.Series(dtype=np.int64) if counts is None else counts
+        self.errors = pd.Series(dtype=np.int64) if errors is None else errors
+
+    @property
+    def floor(self) -> int:
+        """Upper bound on the count of any key not in the summary."""
+        return int(self.counts.iloc[-1]) if len(self.counts) >= self.k else 0
+
+    def add(self, keys, weights: np.ndarray):
+        batch = pd.Series(np.asarray(weights, dtype=np.int64), index=pd.Index(keys, dtype=object))
+        batch = batch.groupby(level=0, sort=False).sum()
+        # the batch is counted exactly, so it has no floor and no error
+        self.counts, self.errors = _combine(self.k, [
+            (self.counts, self.errors, self.floor),
+            (batch, pd.Series(0, index=batch.index, dtype=np.int64), 0)])
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        return SpaceSaving.merge_all([self, other])
+
+    @classmethod
+    def merge_all(cls, summaries: List["SpaceSaving"]) -> "SpaceSaving":
+        k = summaries[0].k
+        if any(s.k != k for s in summaries):
+            raise ValueError("Space-Saving summaries of different sizes can't be merged")
+        return cls(k, *_combine(k, [(s.counts, s.errors, s.floor) for s in summaries]))
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """The ``n`` heaviest keys as ``(key, count, error)``, heaviest first."""
+        return list(zip(self.counts.index[:n], self.counts.to_numpy()[:n].tolist(),
+                        self.errors.to_numpy()[:n].tolist()))
+
+
+class HyperLogLog:
+    """Distinct-count estimate from ``2 ** precision`` one-byte registers
+    (standard error about ``1.04 / sqrt(2 ** precision)``)."""
+
+    def __init__(self, precision: int=12, registers: np.ndarray=None):
+        self.precision = precision
+        m = 1 << precision
+        self.registers = np.zeros(m, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes: np.ndarray):
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        # position of the first 1-bit after the index bits; the guard bit caps it
+        rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        rank = (64 - np.floor(np.log2(rest.astype(np.float64)))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return HyperLogLog.merge_all([self, other])
+
+    @classmethod
+    def merge_all(cls, sketches: List["HyperLogLog"]) -> "HyperLogLog":
+        precision = sketches[0].precision
+        if any(s.precision != precision for s in sketches):
+            raise ValueError("HyperLogLogs of different precision can't be merged")
+        return cls(precision, np.maximum.reduce([s.registers for s in sketches]))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)   # linear counting for small cardinalities
+        return int(round(estimate))
+
+
+def _combine(k: int, parts: List[Tuple[pd.Series, pd.Series, int]]) -> Tuple[pd.Series, pd.Series]:
+    """Counts and errors of the ``k`` heaviest keys over all ``(counts, errors, floor)`` parts.
+
+    A key's total is the sum of its count in every part that has it and the
+    floor of every part that doesn't, i.e. the sum of all floors plus
+    ``count - floor`` over the parts that have it. Errors are summed the same way.
+    """
+    base = sum(floor for _, _, floor in parts)
+    counts = pd.concat([c - floor for c, _, floor in parts]).groupby(level=0, sort=False).sum() + base
+    errors = pd.concat([e - floor for _, e, floor in parts]).groupby(level=0, sort=False).sum() + base
+    top = counts.nlargest(k, keep="first").index
+    return counts[top].astype(np.int64), errors[top].astype(np.int64)
+
+
+def to_arrays(prefix: str, sketch) -> Dict[str, np.ndarray]:
+    """Flat arrays for ``np.savez``; see :func:`from_arrays`."""
+    if isinstance(sketch, CountMinSketch):
+        return {f"{prefix}cms": sketch.counts}
+    if isinstance(sketch, HyperLogLog):
+        return {f"{prefix}hll": sketch.registers}
+    return {f"{prefix}ss_keys": sketch.counts.index.to_numpy(dtype=str),
+            f"{prefix}ss_counts": sketch.counts.to_numpy(),
+            f"{prefix}ss_errors": sketch.errors.to_numpy(),
+            f"{prefix}ss_k": np.int32(sketch.k)}
+
+
+def from_arrays(prefix: str, arrays):
+    if f"{prefix}cms" in arrays:
+        counts = arrays[f"{prefix}cms"]
+        return CountMinSketch(counts.shape[1], counts.shape[0], counts.astype(np.int64))
+    if f"{prefix}hll" in arrays:
+        registers = arrays[f"{prefix}hll"]
+        return HyperLogLog(int(np.log2(len(registers))), registers.astype(np.uint8))
+    index = pd.Index(arrays[f"{prefix}ss_keys"].astype(object), dtype=object)
+    return SpaceSaving(int(arrays[f"{prefix}ss_k"]),
+                       pd.Series(arrays[f"{prefix}ss_counts"].astype(np.int64), index=index),
+                       pd.Series(arrays[f"{prefix}ss_errors"].astype(np.int64), index=index))
@@ -0,0 +1,168 @@
+"""Response encodings for DataFrame-shaped API responses.
+
+The flow APIs historically return a JSON list of row objects ("records").
+Clients can ask for something cheaper with ``?format=`` or an ``Accept``
+header. ``columns`` is one JSON array per column, with timestamps as Unix
+milliseconds. ``arrow`` is an Apache Arrow IPC stream and needs pyarrow.
+Any of them is compressed with brotli or gzip when ``Accept-Encoding``
+allows it and the body is big enough to gain from it. orjson, brotli and
+pyarrow are optional: without orjson the standard json module is used,
+without brotli only gzip is offered, and without pyarrow ``arrow`` is
+refused with 406.
+"""
+import gzip
+import importlib.util
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from flask import current_app, jsonify, request
+
+RECORDS, COLUMNS, ARROW = "records", "columns", "arrow"
+JSON_MIME = "application/json"
+COLUMNS_MIME = "application/vnd.nids.columns+json"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MIMETYPES = {RECORDS: JSON_MIME, COLUMNS: COLUMNS_MIME, ARROW: ARROW_MIME}
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5      # most of level 9's ratio at a fraction of the CPU
+BROTLI_QUALITY = 5
+
+
+# ======================================
+# Negotiation
+# ======================================
+def available_formats() -> List[str]:
+    return [RECORDS, COLUMNS] + ([ARROW] if HAS_ARROW else [])
+
+
+def available_encodings() -> List[str]:
+    return (["br"] if HAS_BROTLI else []) + ["gzip"]
+
+
+def choose_format(param: Optional[str], accept) -> str:
+    """``param`` if given (it may be invalid, see :func:`frame_response`), else
+    the best match for the ``Accept`` header, records when nothing else fits."""
+    if param:
+        return param
+    by_mime = {MIMETYPES[f]: f for f in available_formats()}
+    return by_mime[accept.best_match(list(by_mime), default=JSON_MIME)]
+
+
+def choose_encoding(accept_encoding) -> str:
+    return accept_encoding.best_match(available_encodings()) or "identity"
+
+
+def negotiated() -> Tuple[str, str]:
+    """``(format, content encoding)`` for the current request; also the cache key part."""
+    return (choose_format(request.args.get("format"), request.accept_mimetypes),
+            choose_encoding(request.accept_encodings))
+
+
+# ======================================
+# Encoders
+# ======================================
+def _column_values(series: pd.Series) -> Union[np.ndarray, list]:
+    """Values of one column as orjson / json serialize them.
+
+    Timestamps become Unix milliseconds. Missing values become None, so they
+    come out as null.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        missing = series.isna().to_numpy()
+        ms = series.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        if not missing.any():
+            return ms
+        out = ms.astype(object)
+        out[missing] = None
+        return out.tolist()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biu":
+        return series.to_numpy()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind == "f":
+        values = series.to_numpy()
+        missing = ~np.isfinite(values)
+        if not missing.any():
+            return values
+        out = values.astype(object)
+        out[missing] = None
+        return out.tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def encode_columns(df: pd.DataFrame, meta: Optional[Dict[str, Any]]=None) -> bytes:
+    """``{"rows": n, "time_unit": "ms", "columns": {name: [...]}, "meta": {...}}`` as UTF-8 JSON."""
+    doc = {"rows": len(df), "time_unit": "ms",
+           "columns": {str(name): _column_values(df[name]) for name in df.columns}}
+    if meta:
+        doc["meta"] = meta
+    if HAS_ORJSON:
+        import orjson
+        return orjson.dumps(doc, option=orjson.OPT_SERIALIZE_NUMPY)
+    doc["columns"] = {name: v.tolist() if isinstance(v, np.ndarray) else v
+                      for name, v in doc["columns"].items()}
+    return json.dumps(doc, separators=(",", ":"), default=str).encode()
+
+
+def encode_arrow(df: pd.DataFrame, meta: Optional[Dict[str, Any]]=None) -> bytes:
+    """One Arrow IPC stream; ``meta`` goes in the schema metadata under ``meta`` as JSON."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if meta:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               b"meta": json.dumps(meta, default=str).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body: bytes, encoding: str) -> Tuple[bytes, str]:
+    """``body`` compressed with ``encoding``, and the encoding actually used.
+
+    Small bodies are sent as they are, since the framing would eat the gain.
+    """
+    if encoding == "identity" or len(body) < MIN_COMPRESS_BYTES:
+        return body, "identity"
+    if encoding == "br":
+        import brotli
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+
+
+# ======================================
+# Flask glue
+# ======================================
+def frame_response(df: pd.DataFrame, records: Callable[[pd.DataFrame], Any],
+                   meta: Optional[Dict[str, Any]]=None):
+    """Respond with ``df`` in the negotiated format and encoding.
+
+    ``records`` turns ``df`` into the legacy payload, so clients that don't
+    ask for anything else get exactly what they always did. Use together
+    with ``@cached(vary=negotiated)`` so each representation is cached on
+    its own.
+    """
+    fmt, encoding = negotiated()
+    if fmt not in available_formats():
+        return jsonify({"error": f"format must be one of {', '.join(available_formats())}"}), 406
+
+    if fmt == ARROW:
+        body = encode_arrow(df, meta)
+    elif fmt == COLUMNS:
+        body = encode_columns(df, meta)
+    else:
+        body = jsonify(records(df)).get_data()
+    body, encoding = compress(body, encoding)
+
+    resp = current_app.response_class(body, mimetype=MIMETYPES[fmt])
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept, Accept-Encoding"
+    return resp